@@ -1,22 +1,56 @@
 from flask                              import Flask
 from app.models                         import db
+from app.database                       import build_engine_options, init_engine, normalize_database_uri
+from app                                import migrations
+from app.cli                            import db_cli, products_cli, outbox_cli, analytics_cli
+from app.services.product_cache         import product_cache
+from app.services.auth_service          import principal_cache
+from app.services.password_service      import passwords
+from app.services.metrics_service       import metrics
+from app.services.outbox_service        import outbox
+from app.services.idempotency_service   import idempotency
+from app.services.session_service       import sessions
+from app.services.rate_limit_service    import rate_limiter
+from app.services.compression_service   import compression
+from app.services.json_provider         import init_json
 from app.controllers.user_controller    import user_bp
 from app.controllers.account_controller import account_bp
 from app.controllers.product_controller import product_bp
 from app.controllers.cart_controller    import cart_bp
 from app.controllers.order_controller   import order_bp
+from app.controllers.metrics_controller import metrics_bp
+from app.controllers.analytics_controller import analytics_bp
 
-def create_app():
+def create_app(test_config=None, config_object='app.config.Config'):
     app = Flask(__name__)
-    
-    # Configures the SQLite database URI and disables modification tracking for performance
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
-    # Secret key for session management and security
-    app.config['SECRET_KEY'] = 'your_secret_key'
+
+    # Loads the configuration (database, pool, pragmas, secret key), every value can come from the environment
+    app.config.from_object(config_object)
+
+    # Overrides used by tests and benchmarks (e.g. a separate database URI)
+    if test_config:
+        app.config.update(test_config)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
+
+    # JSON responses are encoded with orjson when it is installed (JSON_ENCODER=std keeps the standard library)
+    init_json(app)
 
     db.init_app(app)
+    product_cache.init_app(app)
+    principal_cache.init_app(app)
+    passwords.init_app(app)
+    metrics.init_app(app)
+    outbox.init_app(app)
+    idempotency.init_app(app)
+    sessions.init_app(app)
+    rate_limiter.init_app(app)
+    compression.init_app(app)
+
+    with app.app_context():
+        init_engine(app, db.engine)
+        metrics.instrument_engine(app, db.engine)
     
     # Registers blueprints for modular controllers with specific URL prefixes
     app.register_blueprint(user_bp,     url_prefix= '/user')
@@ -24,15 +58,17 @@ def create_app():
     app.register_blueprint(product_bp,  url_prefix= '/products')
     app.register_blueprint(cart_bp,     url_prefix= '/cart')
     app.register_blueprint(order_bp,    url_prefix= '/orders')
+    app.register_blueprint(metrics_bp,  url_prefix= '/metrics')
+    app.register_blueprint(analytics_bp, url_prefix= '/analytics')
 
-   
-    # Ensures the tables are created in the database when the app context is available
-    with app.app_context():
-        db.create_all()
+    app.cli.add_command(db_cli)
+    app.cli.add_command(products_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(analytics_cli)
 
-    return app
+    # Brings the database schema up to date (set AUTO_MIGRATE=false to run `flask db upgrade` separately)
+    if app.config['AUTO_MIGRATE']:
+        with app.app_context():
+            migrations.upgrade(db.engine)
 
-# Main entry point for running the Flask application in debug mode
-if __name__ == '__main__':
-    app = create_app()
-    app.run(debug=True)
+    return app
@@ -0,0 +1,328 @@
+import asyncio
+import io
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_accept_header
+from werkzeug.routing import Map, Rule
+from app import create_app
+from app.database import async_database_uri, init_engine
+from app.services.async_services import AsyncProductService, AsyncCartService, AsyncOrderService
+from app.services.compression_service import negotiate
+from app.services.metrics_service import metrics
+from app.services.outbox_service import outbox
+from app.services.rate_limit_service import rate_limiter
+
+# Async (ASGI) serving mode: `uvicorn asgi:app`.
+#
+# The hot read endpoints (catalog pages, cart, order history) run as coroutines on an async SQLAlchemy engine,
+# so a request waiting on the database holds no thread. Every other request (writes, admin routes, streamed
+# listings, conditional requests the product cache answers with a 304) is handed to the Flask app on a
+# bounded thread pool (ASGI_THREADS), exactly as a threaded WSGI server would run it.
+
+# Async handlers: (session, user_id, params, **route arguments) -> (payload, status[, headers])
+async def products_list(session, user_id, params):
+    return await AsyncProductService.product_page(session, 'list', params.get('limit'), params.get('after'))
+
+async def products_details(session, user_id, params):
+    return await AsyncProductService.product_page(session, 'details', params.get('limit'), params.get('after'))
+
+async def cart_view(session, user_id, params):
+    return await AsyncCartService.view_cart(session, user_id)
+
+async def orders_list(session, user_id, params):
+    return await AsyncOrderService.list_orders(session, user_id, params.get('limit'), params.get('after'))
+
+async def order_detail(session, user_id, params, order_id):
+    return await AsyncOrderService.get_order(session, user_id, order_id)
+
+# Same URLs as the blueprints; the rule strings are also the metrics labels, as in the sync app
+ASYNC_ROUTES = Map([
+    Rule('/products/list', endpoint=(products_list, True), methods=['GET']),
+    Rule('/products/details', endpoint=(products_details, True), methods=['GET']),
+    Rule('/cart/view', endpoint=(cart_view, True), methods=['GET']),
+    Rule('/orders', endpoint=(orders_list, True), methods=['GET']),
+    Rule('/orders/<int:order_id>', endpoint=(order_detail, True), methods=['GET'])
+], strict_slashes=False)
+
+class AsyncApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.routes = ASYNC_ROUTES.bind('localhost')
+        self.executor = ThreadPoolExecutor(flask_app.config['ASGI_THREADS'], thread_name_prefix='asgi-wsgi')
+        self._engine = None
+        self._sessions = None
+        self._endpoints = {}   # rule -> Flask endpoint, for the rate limits
+        # Session and rate limit stores that block on I/O are called from the thread pool
+        config = flask_app.config
+        self._blocking_sessions = config['SESSION_BACKEND'] == 'sql'
+        self._blocking_limits = config['RATE_LIMIT_ENABLED'] and config['RATE_LIMIT_BACKEND'] == 'redis'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Unsupported ASGI scope {scope['type']!r}")
+
+        match = self._match(scope)
+        if match is None:
+            return await self._run_wsgi(scope, receive, send)
+        (handler, login_required), rule, arguments = match
+        return await self._run_async(scope, send, handler, login_required, rule, arguments)
+
+    @property
+    def sessions(self):
+        # Created on first use, inside the running event loop
+        if self._sessions is None:
+            self._engine = create_async_engine_for(self.flask_app)
+            from sqlalchemy.ext.asyncio import async_sessionmaker
+            self._sessions = async_sessionmaker(self._engine, expire_on_commit=False)
+        return self._sessions
+
+    def _match(self, scope):
+        if scope['method'] != 'GET':
+            return None
+        headers = dict(scope['headers'])
+        # Conditional requests are answered from the product cache, streamed listings by the sync generators
+        if b'if-none-match' in headers or b'if-modified-since' in headers or b'ndjson' in headers.get(b'accept', b''):
+            return None
+        query = scope['query_string']
+        if b'format=' in query or b'stream=' in query:
+            return None
+        try:
+            rule, arguments = self.routes.match(scope['path'], 'GET', return_rule=True)
+        except HTTPException:
+            return None
+        return rule.endpoint, rule.rule, arguments
+
+    async def _run_async(self, scope, send, handler, login_required, rule, arguments):
+        registry = self.flask_app.extensions['metrics']
+        enabled = self.flask_app.config['METRICS_ENABLED']
+        start = time.perf_counter()
+        if enabled:
+            registry.started()
+        try:
+            try:
+                payload, status, extra, wait = await self._handle(scope, handler, login_required, rule, arguments)
+            except Exception as e:
+                # Session, rate limit or database failures get the JSON 500 of the sync routes, not a dropped connection
+                print(f"Error: {e}")
+                payload, status, extra, wait = {"message": "Internal server error"}, 500, {}, None
+
+            body = self.flask_app.json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            body = self._compress(scope, body, extra)
+            elapsed = time.perf_counter() - start
+            headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+            headers.extend((name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in extra.items())
+            if wait is not None:
+                headers.append((b'retry-after', str(max(1, math.ceil(wait))).encode()))
+            if self.flask_app.config['SERVER_TIMING']:
+                headers.append((b'server-timing', f'app;dur={elapsed * 1000:.1f}'.encode()))
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': body})
+            if enabled:
+                # Statements on the async engine are not counted per request
+                registry.observe(rule, 'GET', status, elapsed, 0, 0.0)
+        finally:
+            if enabled:
+                registry.finished()
+
+    async def _handle(self, scope, handler, login_required, rule, arguments):
+        # Returns (payload, status, extra headers, seconds to wait when rate limited)
+        user_id, wait, user_session, extra = None, None, None, {}
+        if login_required:
+            user_session = await self._offload(self._blocking_sessions, self._open_session, scope)
+            user_id = user_session.get('user_id') if user_session is not None else None
+        if not login_required or user_id:
+            wait = await self._offload(self._blocking_limits, self._retry_after, scope, rule, user_id)
+        if login_required and not user_id:
+            payload, status = {"message": "Authentication required"}, 401
+        elif wait is not None:
+            payload, status = {"message": "Too many requests, please retry later"}, 429
+        else:
+            params = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+            async with self.sessions() as session:
+                try:
+                    payload, status, *rest = await handler(session, user_id, params, **arguments)
+                except Exception:
+                    await session.rollback()
+                    raise
+            extra = dict(rest[0]) if rest else {}
+
+        if user_id:
+            # Pushes the expiry of a server-side session forward when it is due, as the sync app does
+            extra.update(await self._offload(self._blocking_sessions, self._save_session, user_session))
+        return payload, status, extra, wait
+
+    def _compress(self, scope, body, headers):
+        # Same negotiation as the sync app's compression, for the bodies built here (headers are updated)
+        config = self.flask_app.config
+        if not config['COMPRESSION_ENABLED'] or len(body) < config['COMPRESSION_MIN_SIZE']:
+            return body
+        headers['Vary'] = ', '.join(filter(None, [headers.get('Vary'), 'Accept-Encoding']))
+        accept = parse_accept_header(dict(scope['headers']).get(b'accept-encoding', b'').decode('latin-1'))
+        coding = negotiate(self.flask_app, accept)
+        if coding is None:
+            return body
+        headers['Content-Encoding'] = coding
+        if 'ETag' in headers:
+            headers['ETag'] = f"{headers['ETag'][:-1]}-{coding}\""
+        return self.flask_app.extensions['compression'][coding].compress(body)
+
+    async def _offload(self, blocking, function, *args):
+        # Lookups that wait on the database or Redis run on the thread pool, the in-process ones on the loop
+        if blocking:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        return function(*args)
+
+    def _retry_after(self, scope, rule, user_id):
+        # Same buckets and limits as the sync app, looked up by the Flask endpoint of the route
+        if not self.flask_app.config['RATE_LIMIT_ENABLED']:
+            return None
+        endpoint = self._endpoints.get(rule)
+        if endpoint is None:
+            endpoint = self._endpoints[rule] = self.flask_app.url_map.bind('localhost').match(scope['path'], 'GET')[0]
+        client = scope.get('client') or ('127.0.0.1', 0)
+
+        def identify():
+            return f"user:{user_id}" if user_id else f"ip:{client[0]}"
+        return rate_limiter.retry_after(self.flask_app.extensions['rate_limiter'], endpoint, identify)
+
+    def _open_session(self, scope):
+        # Opens the session through the app's session interface, so it reads the same cookie as the sync routes
+        app = self.flask_app
+        with app.app_context():
+            return app.session_interface.open_session(app, app.request_class(wsgi_environ(scope, b'')))
+
+    def _save_session(self, user_session):
+        # Returns the Set-Cookie and Vary headers the sync app would send for this session
+        app = self.flask_app
+        response = app.response_class()
+        with app.app_context():
+            app.session_interface.save_session(app, user_session, response)
+        response.vary.add('Cookie')  # the payload is the logged-in user's
+        return {name: value for name, value in response.headers.items() if name in ('Set-Cookie', 'Vary')}
+
+    async def _run_wsgi(self, scope, receive, send):
+        body = await read_body(receive)
+        environ = wsgi_environ(scope, body)
+        loop = asyncio.get_running_loop()
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run():
+            started = []
+
+            def start_response(status, headers, exc_info=None):
+                started[:] = [int(status.split(' ', 1)[0]), [
+                    (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+                ]]
+
+            def send_start():
+                emit({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+
+            result = self.flask_app(environ, start_response)
+            try:
+                # Streamed responses call start_response lazily, so the start is sent with the first chunk
+                sent = False
+                for chunk in result:
+                    if not chunk:
+                        continue
+                    if not sent:
+                        send_start()
+                        sent = True
+                    emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if not sent:
+                    send_start()
+                emit({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        await loop.run_in_executor(self.executor, run)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                outbox.start(self.flask_app)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def aclose(self):
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = self._sessions = None
+        self.executor.shutdown(wait=True)
+        outbox.stop(self.flask_app)
+
+def create_async_engine_for(flask_app):
+    # Async engine on the same database as the Flask app, with the same pool settings and SQLite pragmas
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+    except ImportError:
+        raise RuntimeError("The greenlet and aiosqlite packages are required for the ASGI mode")
+
+    uri = async_database_uri(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+    engine = create_async_engine(uri, **flask_app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+    init_engine(flask_app, engine.sync_engine)
+    metrics.instrument_engine(flask_app, engine.sync_engine)
+    return engine
+
+def create_asgi_app(test_config=None, config_object='app.config.Config'):
+    return AsyncApp(create_app(test_config, config_object))
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+def wsgi_environ(scope, body):
+    # PEP 3333 environ for an ASGI HTTP scope
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if body:
+        environ['CONTENT_LENGTH'] = str(len(body))
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{name}"
+        if key == 'CONTENT_LENGTH':
+            continue  # the body was read in full, its length is known
+        if key in environ:
+            # Repeated headers are folded, cookies with their own separator
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
@@ -0,0 +1,78 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.models import db
+from app import migrations
+from app.services.catalog_sync_service import FORMATS, detect_format, import_catalog, export_catalog
+from app.services.outbox_service import outbox
+from app.services.analytics_service import AnalyticsService
+
+# flask db upgrade / flask db status
+db_cli = AppGroup('db', help="Database schema migrations.")
+
+@db_cli.command('upgrade')
+def upgrade_command():
+    ran = migrations.upgrade(db.engine, log=click.echo)
+    click.echo(f"{len(ran)} migration(s) applied, database is up to date.")
+
+@db_cli.command('status')
+def status_command():
+    click.echo(f"Database: {current_app.config['SQLALCHEMY_DATABASE_URI']}")
+    for version, name, applied in migrations.status(db.engine):
+        click.echo(f"  [{'x' if applied else ' '}] {name}")
+
+# flask products import FILE / flask products export [FILE]
+products_cli = AppGroup('products', help="Bulk catalog import and export.")
+
+@products_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help="Defaults to the file extension.")
+@click.option('--batch-size', type=int, help="Rows per transaction.")
+def import_command(source, fmt, batch_size):
+    fmt = detect_format(fmt, filename=source.name)
+    if fmt is None:
+        raise click.UsageError("Cannot tell the input format, pass --format csv or --format ndjson")
+
+    report = import_catalog(source, fmt, batch_size)
+    for error in report["errors"]:
+        click.echo(f"  line {error['line']}: {error['message']}", err=True)
+    click.echo(f"{report['upserted']} product(s) upserted, {report['failed']} row(s) failed, "
+               f"{report['rows_per_s']} rows/s.")
+
+@products_cli.command('export')
+@click.argument('target', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help="Defaults to the file extension, or csv.")
+def export_command(target, fmt):
+    fmt = detect_format(fmt, filename=target.name) or 'csv'
+    for chunk in export_catalog(fmt):
+        target.write(chunk)
+
+# flask outbox run / flask outbox status
+outbox_cli = AppGroup('outbox', help="Queued post-checkout jobs.")
+
+@outbox_cli.command('run')
+@click.option('--limit', type=int, default=100, help="Jobs per batch.")
+def run_command(limit):
+    # Runs due jobs in batches until none are left (jobs waiting for a retry stay queued)
+    total = 0
+    while True:
+        ran = outbox.run_pending(limit)
+        total += ran
+        if not ran:
+            break
+    click.echo(f"{total} job(s) run.")
+
+@outbox_cli.command('status')
+def outbox_status_command():
+    stats = outbox.stats()
+    click.echo(f"{stats['pending']} pending, {stats['failed']} failed, oldest pending {stats['lag_seconds']:.1f}s old.")
+
+# flask analytics rebuild
+analytics_cli = AppGroup('analytics', help="Sales reporting rollups.")
+
+@analytics_cli.command('rebuild')
+@click.option('--chunk-size', type=int, help="Orders aggregated per transaction, rounded to whole days.")
+def rebuild_command(chunk_size):
+    report = AnalyticsService.rebuild(chunk_size)
+    click.echo(f"Rollups rebuilt from {report['orders']} order(s) over {report['days']} day(s) "
+               f"in {report['chunks']} chunk(s), {report['elapsed_ms']} ms.")
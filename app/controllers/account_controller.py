@@ -1,18 +1,22 @@
-from flask import Blueprint, request, jsonify, session
-from app.services.account_service import manage_account, get_account_info
+from flask import Blueprint, request, g
+from app.services.auth_service import login_required
+from app.services.account_service import manage_account, get_account_info, revoke_sessions
 
 account_bp = Blueprint('account_bp', __name__)
 
 # View account information and change account routes
 @account_bp.route('', methods=['GET', 'POST'])
+@login_required
 def account():
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({"message": "User not logged in"}), 401
-
     if request.method == 'POST':
         data = request.get_json()
-        return manage_account(user_id, data)
+        return manage_account(g.user_id, data)
 
     # GET method
-    return get_account_info(user_id)
+    return get_account_info(g.user_id)
+
+# Log out every other session of the user (other devices and browsers)
+@account_bp.route('/sessions/revoke', methods=['POST'])
+@login_required
+def revoke_other_sessions():
+    return revoke_sessions(g.user_id)
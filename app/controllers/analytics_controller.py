@@ -0,0 +1,26 @@
+from flask import Blueprint, request, jsonify
+from app.services.auth_service import admin_required
+from app.services.analytics_service import AnalyticsService
+
+analytics_bp = Blueprint('analytics', __name__)
+
+# Revenue, orders and units per day (only admin)
+@analytics_bp.route('/revenue', methods=['GET'])
+@admin_required
+def revenue_route():
+    result, status = AnalyticsService.revenue_by_day(request.args)
+    return jsonify(result), status
+
+# Revenue per product, or top sellers with sort=units (only admin)
+@analytics_bp.route('/products', methods=['GET'])
+@admin_required
+def product_sales_route():
+    result, status = AnalyticsService.product_sales(request.args)
+    return jsonify(result), status
+
+# Products running out of stock (only admin)
+@analytics_bp.route('/low-stock', methods=['GET'])
+@admin_required
+def low_stock_route():
+    result, status = AnalyticsService.low_stock(request.args)
+    return jsonify(result), status
@@ -1,43 +1,45 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, g
+from app.services.auth_service import login_required
 from app.services.cart_service import CartService
 
 cart_bp = Blueprint('cart', __name__)
 
 # Add product to the cart route
 @cart_bp.route('/add', methods=['POST'])
+@login_required
 def add_to_cart():
-    # Check for authentication
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
-
     # Get the data of product and quantity in request
     data = request.get_json()
     product_id = data.get('product_id')
     quantity = data.get('quantity', 1)  # Default quantity to 1 if not provided
 
     # add product to the cart
-    result = CartService.add_to_cart(session['user_id'], product_id, quantity)
+    result = CartService.add_to_cart(g.user_id, product_id, quantity)
+
+    return result
+
+# Apply a batch of add/set/remove operations to the cart route
+@cart_bp.route('/bulk', methods=['POST'])
+@login_required
+def bulk_update_cart():
+    data = request.get_json()
+    result = CartService.bulk_update(g.user_id, data.get('operations'))
 
     return result
 
 # View cart route
 @cart_bp.route('/view', methods=['GET'])
+@login_required
 def view_cart():
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
-
     # view the cart
-    result = CartService.view_cart(session['user_id'])
+    result = CartService.view_cart(g.user_id)
 
     return result
 
 @cart_bp.route('/clear', methods=['DELETE'])
+@login_required
 def clear_cart():
-    # Check if the user is authenticated
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
-
     # Call the service to clear the cart
-    result = CartService.clear_cart(session['user_id'])
+    result = CartService.clear_cart(g.user_id)
 
-    return result
\ No newline at end of file
+    return result
@@ -0,0 +1,20 @@
+import hmac
+
+from flask import Blueprint, current_app, jsonify, request
+from app.services.metrics_service import metrics
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+# Prometheus scrape endpoint, protected by a bearer token (METRICS_TOKEN). Only debug and testing apps serve it
+# without one.
+@metrics_bp.route('', methods=['GET'])
+def metrics_route():
+    token = current_app.config['METRICS_TOKEN']
+    if not token and not (current_app.debug or current_app.testing):
+        return jsonify({"message": "Metrics are disabled until METRICS_TOKEN is set"}), 403
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({"message": "Authentication required"}), 401
+
+    return current_app.response_class(
+        metrics.registry.render(), mimetype='text/plain', content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,14 +1,37 @@
-from flask import Blueprint, session, jsonify
+from flask import Blueprint, request, g, jsonify
+from app.services.auth_service import login_required
+from app.services.idempotency_service import idempotent
 from app.services.order_service import OrderService
+from app.services.pagination import columnar_requested
+from app.services.streaming import stream_format
 
 
 order_bp = Blueprint('order', __name__)
 
-# Make a order route
+# Make a order route (retries sent with the same Idempotency-Key header get the first response back)
 @order_bp.route('/checkout', methods=['POST'])
+@login_required
+@idempotent
 def checkout():
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
+    result, status = OrderService.place_order(g.user_id)
+    return jsonify(result), status
 
-    result, status = OrderService.place_order(session['user_id'])
-    return jsonify(result), status
\ No newline at end of file
+# List the user's orders, newest first, one keyset page at a time (or all of them, streamed)
+@order_bp.route('', methods=['GET'])
+@login_required
+def list_orders():
+    fmt = stream_format()
+    if fmt:
+        result, status = OrderService.stream_orders(g.user_id, request.args.get('after'), fmt)
+        return (jsonify(result) if isinstance(result, dict) else result), status
+
+    result, status = OrderService.list_orders(g.user_id, request.args.get('limit'), request.args.get('after'),
+                                              columnar_requested(request.args))
+    return jsonify(result), status
+
+# Show one of the user's orders with its items
+@order_bp.route('/<int:order_id>', methods=['GET'])
+@login_required
+def get_order(order_id):
+    result, status = OrderService.get_order(g.user_id, order_id)
+    return jsonify(result), status
@@ -1,70 +1,65 @@
-from flask import Blueprint, request, jsonify, session
-from app.services.product_service import add_product, edit_product, delete_product, list_products, details_products
-from app.models import User
+from flask import Blueprint, request
+from app.services.auth_service import login_required, admin_required
+from app.services.product_service import add_product, edit_product, delete_product, list_products, details_products, cache_stats
+from app.services.catalog_sync_service import import_products, export_products
+from app.services.search_service import search_products
 
 product_bp = Blueprint('product_bp', __name__)
 
 # Add a product in database route (only admin)
 @product_bp.route('/add', methods=['POST'])
+@admin_required
 def add_product_route():
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
-    
-    user = User.query.get(session['user_id'])
-    if user is None:
-        return jsonify({"message": "User not found"}), 404
-    
-    if not user.is_admin:
-        return jsonify({"message": "Admin access required"}), 403
-
     data = request.get_json()
     return add_product(data)
 
 # Edit a existing product in database (only admin)
 @product_bp.route('/edit', methods=['PUT'])
+@admin_required
 def edit_product_route():
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
-    
-    user = User.query.get(session['user_id'])
-    if user is None:
-        return jsonify({"message": "User not found"}), 404
-    
-    if not user.is_admin:
-        return jsonify({"message": "Admin access required"}), 403
-
     data = request.get_json()
     return edit_product(data)
 
 # Delete a existing product in database (only admin)
 @product_bp.route('/delete', methods=['DELETE'])
+@admin_required
 def delete_product_route():
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
-    
-    user = User.query.get(session['user_id'])
-    if user is None:
-        return jsonify({"message": "User not found"}), 404
-    
-    if not user.is_admin:
-        return jsonify({"message": "Admin access required"}), 403
-
     data = request.get_json()
     product_id = data.get('product_id')
     return delete_product(product_id)
 
-# list all products in database 
+# Bulk upsert products from a CSV or JSON Lines body, keyed on name (only admin)
+@product_bp.route('/import', methods=['POST'])
+@admin_required
+def import_products_route():
+    return import_products()
+
+# Stream every product as CSV or JSON Lines (only admin)
+@product_bp.route('/export', methods=['GET'])
+@admin_required
+def export_products_route():
+    return export_products()
+
+# list products in database, one keyset page at a time
 @product_bp.route('/list', methods=['GET'])
+@login_required
 def list_products_route():
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
-
-    return list_products()
+    return list_products(request.args.get('limit'), request.args.get('after'))
 
-# list the details of all products in database
+# list the details of products in database, one keyset page at a time
 @product_bp.route('/details', methods=['GET'])
+@login_required
 def details_products_route():
-    if 'user_id' not in session:
-        return jsonify({"message": "Authentication required"}), 401
+    return details_products(request.args.get('limit'), request.args.get('after'))
+
+# Full-text search over product names and descriptions, best matches first
+@product_bp.route('/search', methods=['GET'])
+@login_required
+def search_products_route():
+    return search_products(request.args)
 
-    return details_products()
+# Product cache hit/miss/eviction counters (only admin)
+@product_bp.route('/cache/stats', methods=['GET'])
+@admin_required
+def cache_stats_route():
+    return cache_stats()
@@ -0,0 +1,64 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+def normalize_database_uri(uri):
+    # Heroku-style postgres:// URLs are not accepted by SQLAlchemy 1.4+
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def build_engine_options(config):
+    # Pool settings for the configured backend; explicit SQLALCHEMY_ENGINE_OPTIONS always win
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+
+    in_memory = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+    if not in_memory:
+        options.update({
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_timeout': config['DB_POOL_TIMEOUT']
+        })
+    if url.get_backend_name() != 'sqlite':
+        # Server databases drop idle connections, check them before use
+        options['pool_pre_ping'] = config['DB_POOL_PRE_PING']
+
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+# Async drivers used by the ASGI mode (app/asgi.py) for each backend
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+psycopg'
+}
+
+def async_database_uri(uri):
+    # Same database, async driver: sqlite:///app.db -> sqlite+aiosqlite:///app.db
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+def sqlite_pragmas(config):
+    pragmas = {
+        'journal_mode': config['SQLITE_JOURNAL_MODE'],
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT'],
+        'mmap_size': config['SQLITE_MMAP_SIZE']
+    }
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+def init_engine(app, engine):
+    # Applies the SQLite pragmas on every new connection the pool opens
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(app.config)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
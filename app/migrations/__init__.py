@@ -0,0 +1,67 @@
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect
+
+# Each migration is a module named m<NNNN>_<description> with an upgrade(connection) function.
+# They run in order, each in its own transaction, and are recorded in the schema_migrations table.
+_MODULE_PATTERN = re.compile(r'^m(\d{4})_\w+$')
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', String(4), primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+def available_migrations():
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        match = _MODULE_PATTERN.match(module_info.name)
+        if match:
+            migrations.append((match.group(1), module_info.name))
+    return sorted(migrations)
+
+def applied_versions(connection):
+    if not inspect(connection).has_table('schema_migrations'):
+        return set()
+    return {row.version for row in connection.execute(schema_migrations.select())}
+
+def upgrade(engine, log=None):
+    # Applies every pending migration and returns the names of the ones that ran
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        applied = applied_versions(connection)
+
+    ran = []
+    for version, name in available_migrations():
+        if version in applied:
+            continue
+        module = importlib.import_module(f"{__name__}.{name}")
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        ran.append(name)
+        if log:
+            log(f"Applied migration {name}")
+    return ran
+
+def status(engine):
+    # [(version, name, applied)] for every known migration
+    with engine.connect() as connection:
+        applied = applied_versions(connection)
+    return [(version, name, version in applied) for version, name in available_migrations()]
+
+# Helpers shared by migrations, so they can run on databases created before the migration existed
+def has_column(connection, table, column):
+    return any(existing['name'] == column for existing in inspect(connection).get_columns(table))
+
+def has_index(connection, table, columns, unique=False):
+    inspector = inspect(connection)
+    indexes = [(index['column_names'], index['unique']) for index in inspector.get_indexes(table)]
+    indexes += [(constraint['column_names'], True) for constraint in inspector.get_unique_constraints(table)]
+    return any(list(names) == list(columns) and (is_unique or not unique) for names, is_unique in indexes)
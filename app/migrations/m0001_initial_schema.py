@@ -0,0 +1,39 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table
+
+# Tables as they were first created by db.create_all()
+def upgrade(connection):
+    metadata = MetaData()
+
+    Table('users', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('username', String(80), nullable=False, unique=True),
+          Column('password', String(128), nullable=False),
+          Column('is_admin', Boolean))
+
+    Table('products', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(100), nullable=False, unique=True),
+          Column('description', String(150), nullable=False),
+          Column('price', Float, nullable=False),
+          Column('stock', Integer, nullable=False))
+
+    Table('cart', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+          Column('product_id', Integer, ForeignKey('products.id'), nullable=False),
+          Column('quantity', Integer, nullable=False))
+
+    Table('orders', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+          Column('order_date', DateTime, nullable=False),
+          Column('total', Float, nullable=False))
+
+    Table('order_items', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('order_id', Integer, ForeignKey('orders.id'), nullable=False),
+          Column('product_id', Integer, ForeignKey('products.id'), nullable=False),
+          Column('quantity', Integer, nullable=False),
+          Column('price', Float, nullable=False))
+
+    metadata.create_all(connection, checkfirst=True)
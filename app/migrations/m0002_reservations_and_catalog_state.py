@@ -0,0 +1,47 @@
+from sqlalchemy import (Column, DateTime, ForeignKey, Integer, MetaData, Table, UniqueConstraint,
+                        func, select, text)
+from app.migrations import has_column, has_index
+
+# Product versions, stock reservations, the catalog version row and one cart line per product
+def upgrade(connection):
+    if not has_column(connection, 'products', 'version'):
+        connection.execute(text("ALTER TABLE products ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+
+    metadata = MetaData()
+    Table('users', metadata, Column('id', Integer, primary_key=True))
+    Table('products', metadata, Column('id', Integer, primary_key=True))
+
+    Table('stock_reservations', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+          Column('product_id', Integer, ForeignKey('products.id'), nullable=False),
+          Column('quantity', Integer, nullable=False),
+          Column('expires_at', DateTime, nullable=False),
+          UniqueConstraint('user_id', 'product_id', name='uq_stock_reservations_user_product'))
+
+    Table('catalog_state', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('version', Integer, nullable=False),
+          Column('updated_at', DateTime, nullable=False))
+
+    metadata.tables['stock_reservations'].create(connection, checkfirst=True)
+    metadata.tables['catalog_state'].create(connection, checkfirst=True)
+
+    if not has_index(connection, 'cart', ['user_id', 'product_id'], unique=True):
+        _merge_duplicate_cart_lines(connection)
+        connection.execute(text("CREATE UNIQUE INDEX uq_cart_user_product ON cart (user_id, product_id)"))
+
+def _merge_duplicate_cart_lines(connection):
+    # Keeps the first line of each (user, product) with the summed quantity, then drops the others
+    cart = Table('cart', MetaData(), autoload_with=connection)
+    duplicates = connection.execute(
+        select(cart.c.user_id, cart.c.product_id, func.min(cart.c.id), func.sum(cart.c.quantity))
+        .group_by(cart.c.user_id, cart.c.product_id)
+        .having(func.count() > 1)
+    ).all()
+
+    for user_id, product_id, keep_id, quantity in duplicates:
+        connection.execute(cart.update().where(cart.c.id == keep_id).values(quantity=quantity))
+        connection.execute(cart.delete().where(
+            cart.c.user_id == user_id, cart.c.product_id == product_id, cart.c.id != keep_id
+        ))
@@ -0,0 +1,18 @@
+from sqlalchemy import text
+from app.migrations import has_index
+
+# Indexes for the foreign keys every hot query filters on.
+# cart (user_id, product_id) is already covered by the unique index from m0002.
+INDEXES = [
+    ('ix_cart_product_id', 'cart', ['product_id']),
+    ('ix_orders_user_id', 'orders', ['user_id']),  # superseded by ix_orders_user_date in m0004
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_order_items_product_id', 'order_items', ['product_id']),
+    ('ix_stock_reservations_product_id', 'stock_reservations', ['product_id']),
+    ('ix_stock_reservations_expires_at', 'stock_reservations', ['expires_at'])
+]
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        if not has_index(connection, table, columns):
+            connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
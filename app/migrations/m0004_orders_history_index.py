@@ -0,0 +1,8 @@
+from sqlalchemy import text
+from app.migrations import has_index
+
+# Order history pages seek on (user_id, order_date, id); the composite index replaces ix_orders_user_id
+def upgrade(connection):
+    if not has_index(connection, 'orders', ['user_id', 'order_date', 'id']):
+        connection.execute(text("CREATE INDEX ix_orders_user_date ON orders (user_id, order_date, id)"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_orders_user_id"))
@@ -0,0 +1,39 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+# Full-text index over product names and descriptions (SQLite FTS5, external content on products).
+# Triggers keep it in sync with every write: ORM add/edit/delete, bulk upserts and raw SQL alike.
+# Other databases skip it and search falls back to LIKE filters.
+STATEMENTS = [
+    """CREATE VIRTUAL TABLE products_fts USING fts5(
+        name, description, content='products', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    # Stock and price updates are frequent and don't touch the index
+    """CREATE TRIGGER products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    # Index the products that already exist
+    "INSERT INTO products_fts (products_fts) VALUES ('rebuild')"
+]
+
+def upgrade(connection):
+    if connection.dialect.name != 'sqlite' or inspect(connection).has_table('products_fts'):
+        return
+
+    try:
+        connection.exec_driver_sql("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        connection.exec_driver_sql("DROP TABLE temp.fts5_probe")
+    except OperationalError:
+        return  # SQLite built without FTS5, search uses the LIKE fallback
+
+    for statement in STATEMENTS:
+        connection.execute(text(statement))
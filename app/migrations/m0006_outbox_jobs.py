@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text
+
+# Outbox of post-commit jobs, written in the same transaction as the change that queues them
+def upgrade(connection):
+    metadata = MetaData()
+    Table('outbox_jobs', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('task', String(50), nullable=False),
+          Column('payload', Text, nullable=False),
+          Column('idempotency_key', String(100), nullable=False, unique=True),
+          Column('status', String(10), nullable=False),
+          Column('attempts', Integer, nullable=False),
+          Column('available_at', DateTime, nullable=False),
+          Column('created_at', DateTime, nullable=False),
+          Column('processed_at', DateTime),
+          Column('last_error', Text),
+          Index('ix_outbox_jobs_status_available', 'status', 'available_at'))
+
+    metadata.tables['outbox_jobs'].create(connection, checkfirst=True)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, UniqueConstraint
+
+# Stored responses of requests sent with an Idempotency-Key header, so client retries replay them
+def upgrade(connection):
+    metadata = MetaData()
+    Table('users', metadata, Column('id', Integer, primary_key=True))
+    Table('idempotency_keys', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+          Column('key', String(255), nullable=False),
+          Column('fingerprint', String(64), nullable=False),
+          Column('response_status', Integer),
+          Column('response_body', Text),
+          Column('locked_until', DateTime, nullable=False),
+          Column('expires_at', DateTime, nullable=False),
+          UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+          Index('ix_idempotency_keys_expires_at', 'expires_at'))
+
+    metadata.tables['idempotency_keys'].create(connection, checkfirst=True)
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, MetaData, Table, inspect, text
+from app.migrations import has_index
+
+# Daily sales rollups for the admin reports, backfilled from the existing orders,
+# and an index on products.stock for the low-stock report
+def upgrade(connection):
+    metadata = MetaData()
+    Table('products', metadata, Column('id', Integer, primary_key=True))
+    Table('sales_daily', metadata,
+          Column('day', Date, primary_key=True),
+          Column('orders', Integer, nullable=False),
+          Column('units', Integer, nullable=False),
+          Column('revenue', Float, nullable=False))
+    Table('product_sales_daily', metadata,
+          Column('day', Date, primary_key=True),
+          Column('product_id', Integer, ForeignKey('products.id'), primary_key=True),
+          Column('orders', Integer, nullable=False),
+          Column('units', Integer, nullable=False),
+          Column('revenue', Float, nullable=False))
+
+    inspector = inspect(connection)
+    for name in ('sales_daily', 'product_sales_daily'):
+        if not inspector.has_table(name):
+            metadata.tables[name].create(connection)
+            connection.execute(text(BACKFILL[name]))
+
+    if not has_index(connection, 'products', ['stock']):
+        connection.execute(text("CREATE INDEX ix_products_stock ON products (stock)"))
+
+BACKFILL = {
+    'sales_daily': """
+        INSERT INTO sales_daily (day, orders, units, revenue)
+        SELECT date(orders.order_date), COUNT(DISTINCT orders.id), SUM(order_items.quantity),
+               SUM(order_items.quantity * order_items.price)
+        FROM orders JOIN order_items ON order_items.order_id = orders.id
+        GROUP BY date(orders.order_date)""",
+    'product_sales_daily': """
+        INSERT INTO product_sales_daily (day, product_id, orders, units, revenue)
+        SELECT date(orders.order_date), order_items.product_id, COUNT(DISTINCT orders.id), SUM(order_items.quantity),
+               SUM(order_items.quantity * order_items.price)
+        FROM orders JOIN order_items ON order_items.order_id = orders.id
+        GROUP BY date(orders.order_date), order_items.product_id"""
+}
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text
+
+# Server-side session store, looked up by the hash of the session ID in the cookie
+def upgrade(connection):
+    metadata = MetaData()
+    Table('users', metadata, Column('id', Integer, primary_key=True))
+    Table('user_sessions', metadata,
+          Column('id', String(64), primary_key=True),
+          Column('user_id', Integer, ForeignKey('users.id')),
+          Column('data', Text, nullable=False),
+          Column('expires_at', DateTime, nullable=False),
+          Index('ix_user_sessions_user_id', 'user_id'),
+          Index('ix_user_sessions_expires_at', 'expires_at'))
+
+    metadata.tables['user_sessions'].create(connection, checkfirst=True)
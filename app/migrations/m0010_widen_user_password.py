@@ -0,0 +1,10 @@
+from sqlalchemy import inspect, text
+
+# scrypt hashes (the default PASSWORD_HASH_METHOD) are 162 characters, longer than the original VARCHAR(128).
+# SQLite does not enforce VARCHAR lengths and cannot alter a column type, so only Postgres changes.
+def upgrade(connection):
+    if connection.dialect.name != 'postgresql':
+        return
+    column = next(column for column in inspect(connection).get_columns('users') if column['name'] == 'password')
+    if (getattr(column['type'], 'length', None) or 255) < 255:
+        connection.execute(text("ALTER TABLE users ALTER COLUMN password TYPE VARCHAR(255)"))
@@ -9,7 +9,7 @@ class User(db.Model):
     __tablename__ = 'users'
     id =         db.Column(db.Integer, primary_key=True)                  # Primary key for user identification
     username =   db.Column(db.String(80), nullable=False, unique=True)    # Unique username
-    password =   db.Column(db.String(128), nullable=False)                # Password storage
+    password =   db.Column(db.String(255), nullable=False)                # Password hash (scrypt needs 162)
     is_admin =   db.Column(db.Boolean, default=False)                     # Indicates if the user is an admin
     
     # One-to-many relationship with Order and Cart models
@@ -25,23 +25,55 @@ class Product(db.Model):
     name =         db.Column(db.String(100), nullable=False, unique=True)  # Product name
     description =  db.Column(db.String(150), nullable=False)               # Product description
     price =        db.Column(db.Float, nullable=False)                     # Product price
-    stock =        db.Column(db.Integer, nullable=False)                   # Product stock quantity
+    stock =        db.Column(db.Integer, nullable=False, index=True)       # Product stock quantity (not reserved by any cart)
+    version =      db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped on every stock/product change
+
+    # Optimistic concurrency: ORM updates fail with StaleDataError if the row changed since it was loaded
+    __mapper_args__ = {"version_id_col": version}
     
     def __repr__(self):
         return f"<Product {self.name}>"
 
+# CatalogState model, a single row whose version changes on every product add/edit/delete
+class CatalogState(db.Model):
+    __tablename__ = 'catalog_state'
+    id =         db.Column(db.Integer, primary_key=True)                      # Always 1
+    version =    db.Column(db.Integer, nullable=False, default=0)             # Incremented by every catalog write
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Time of the last catalog write
+
+    def __repr__(self):
+        return f"<CatalogState v{self.version}>"
+
 # Cart model for managing user cart items
 class Cart(db.Model):
     __tablename__ = 'cart'
     id =         db.Column(db.Integer, primary_key=True)                              # Primary key for cart item identification
     user_id =    db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)     # Foreign key linking to the user
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)  # Foreign key linking to the product
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)  # Foreign key linking to the product
     quantity =   db.Column(db.Integer, nullable=False, default=1)                     # Quantity of the product in the cart
-    product =    db.relationship('Product')                                           # Relationship to the Product model
+    product =    db.relationship('Product', lazy='joined')                            # Relationship to the Product model, loaded in the same query
+
+    # A single line per user and product, repeated adds increase its quantity
+    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='uq_cart_user_product'),)
     
     def __repr__(self):
         return f"<Cart Item: {self.quantity} of {self.product.name} for User {self.user_id}>"
 
+# StockReservation model for stock held by a user's cart until checkout or expiry
+class StockReservation(db.Model):
+    __tablename__ = 'stock_reservations'
+    id =         db.Column(db.Integer, primary_key=True)                              # Primary key for reservation identification
+    user_id =    db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)     # Foreign key linking to the user
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)  # Foreign key linking to the product
+    quantity =   db.Column(db.Integer, nullable=False)                                # Quantity taken out of the product stock
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)                   # When the quantity goes back into stock
+
+    # One reservation row per user and product, extended on every add to cart
+    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='uq_stock_reservations_user_product'),)
+
+    def __repr__(self):
+        return f"<StockReservation {self.quantity} of Product {self.product_id} for User {self.user_id}>"
+
 # Order model for managing user orders
 class Order(db.Model):
     __tablename__ = 'orders'
@@ -52,6 +84,9 @@ class Order(db.Model):
 
     # One-to-many relationship with OrderItem model
     order_items = db.relationship('OrderItem', backref='order', lazy=True)
+
+    # Order history is read newest first per user
+    __table_args__ = (db.Index('ix_orders_user_date', 'user_id', 'order_date', 'id'),)
     
     def __repr__(self):
         return f"<Order {self.id} by User {self.user_id}>"
@@ -60,11 +95,84 @@ class Order(db.Model):
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
     id =         db.Column(db.Integer, primary_key=True)                              # Primary key for order item identification
-    order_id =   db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)    # Foreign key linking to the order
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)  # Foreign key linking to the product
+    order_id =   db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)    # Foreign key linking to the order
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)  # Foreign key linking to the product
     quantity =   db.Column(db.Integer, nullable=False)                                # Quantity of the product in the order
     price =      db.Column(db.Float, nullable=False)                                  # Price of the product at the time of order
     product =    db.relationship('Product')                                           # Relationship to the Product model
     
     def __repr__(self):
         return f"<OrderItem {self.quantity} of {self.product.name} in Order {self.order_id}>"
+
+# OutboxJob model for work that runs after a transaction commits (written in the same transaction)
+class OutboxJob(db.Model):
+    __tablename__ = 'outbox_jobs'
+    id =              db.Column(db.Integer, primary_key=True)                              # Primary key for job identification
+    task =            db.Column(db.String(50), nullable=False)                             # Name of the registered handler
+    payload =         db.Column(db.Text, nullable=False)                                   # JSON arguments for the handler
+    idempotency_key = db.Column(db.String(100), nullable=False, unique=True)               # One job per key, passed to the handler
+    status =          db.Column(db.String(10), nullable=False, default='pending')          # pending, done or failed
+    attempts =        db.Column(db.Integer, nullable=False, default=0)                     # Runs so far, including the current one
+    available_at =    db.Column(db.DateTime, nullable=False, default=datetime.utcnow)      # Next run (retry backoff or worker lease)
+    created_at =      db.Column(db.DateTime, nullable=False, default=datetime.utcnow)      # When the job was queued
+    processed_at =    db.Column(db.DateTime)                                               # When the job finished (done or failed)
+    last_error =      db.Column(db.Text)                                                   # Error of the last failed run
+
+    # Workers poll for due pending jobs
+    __table_args__ = (db.Index('ix_outbox_jobs_status_available', 'status', 'available_at'),)
+
+    def __repr__(self):
+        return f"<OutboxJob {self.id} {self.task} {self.status}>"
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    id =              db.Column(db.Integer, primary_key=True)                              # Primary key for key identification
+    user_id =         db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)     # Keys are scoped to the user sending them
+    key =             db.Column(db.String(255), nullable=False)                            # Idempotency-Key header value
+    fingerprint =     db.Column(db.String(64), nullable=False)                             # Hash of the request the key was first used for
+    response_status = db.Column(db.Integer)                                                # Stored response, NULL while the request runs
+    response_body =   db.Column(db.Text)
+    locked_until =    db.Column(db.DateTime, nullable=False)                               # A crashed request's key is taken over after this
+    expires_at =      db.Column(db.DateTime, nullable=False)                               # The key can be reused (and is purged) after this
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at')
+    )
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.user_id} {self.key} {self.response_status}>"
+
+# SalesDaily model, revenue per day maintained at checkout for the admin reports
+class SalesDaily(db.Model):
+    __tablename__ = 'sales_daily'
+    day =     db.Column(db.Date, primary_key=True)                    # UTC day of the orders
+    orders =  db.Column(db.Integer, nullable=False, default=0)        # Orders placed that day
+    units =   db.Column(db.Integer, nullable=False, default=0)        # Units sold that day
+    revenue = db.Column(db.Float, nullable=False, default=0.0)        # Sum of quantity * price of the items sold
+
+    def __repr__(self):
+        return f"<SalesDaily {self.day} {self.revenue}>"
+
+# ProductSalesDaily model, sales of one product on one day (top sellers and revenue per product)
+class ProductSalesDaily(db.Model):
+    __tablename__ = 'product_sales_daily'
+    day =        db.Column(db.Date, primary_key=True)                                     # UTC day of the orders
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)    # Product sold
+    orders =     db.Column(db.Integer, nullable=False, default=0)                         # Orders that included the product
+    units =      db.Column(db.Integer, nullable=False, default=0)                         # Units sold
+    revenue =    db.Column(db.Float, nullable=False, default=0.0)                         # Sum of quantity * price
+
+    def __repr__(self):
+        return f"<ProductSalesDaily {self.day} Product {self.product_id} {self.units}>"
+
+# UserSession model, server-side sessions (SESSION_BACKEND=sql); the cookie only carries the session ID
+class UserSession(db.Model):
+    __tablename__ = 'user_sessions'
+    id =         db.Column(db.String(64), primary_key=True)                          # SHA-256 of the session ID, the ID itself is never stored
+    user_id =    db.Column(db.Integer, db.ForeignKey('users.id'), index=True)        # Logged-in user, NULL for anonymous sessions
+    data =       db.Column(db.Text, nullable=False)                                  # Session contents (Flask's tagged JSON)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)                  # Idle expiry, pushed forward while the session is used
+
+    def __repr__(self):
+        return f"<UserSession User {self.user_id} {self.expires_at}>"
@@ -0,0 +1,125 @@
+import argparse
+import logging
+
+from app import create_app
+from app.models import db
+from app.services.outbox_service import outbox
+
+logger = logging.getLogger('app.server')
+
+# Production server: a gunicorn master builds the app once, which applies the migrations once, then forks
+# SERVER_WORKERS processes running SERVER_THREADS threads each. Every worker opens its own connection pool
+# and runs its own outbox threads.
+#
+#   python -m app.server --workers 4 --threads 4 --bind 0.0.0.0:8000
+#
+# `kill -HUP <master pid>` replaces the workers gracefully: in-flight requests finish, new ones go to the
+# new workers. The code is preloaded, so to deploy a new version send USR2 (starts a new master next to
+# the old one) and then QUIT to the old master.
+
+def server_options(app, args=None):
+    config = app.config
+    options = {
+        'bind': config['SERVER_BIND'],
+        'workers': config['SERVER_WORKERS'],
+        'threads': config['SERVER_THREADS'],
+        'timeout': config['SERVER_TIMEOUT'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT'],
+        'max_requests': config['SERVER_MAX_REQUESTS'],
+        # Spread the recycling so the workers don't all restart at once
+        'max_requests_jitter': config['SERVER_MAX_REQUESTS'] // 10
+    }
+    # Command line arguments win over the configuration
+    for name in ('bind', 'workers', 'threads', 'timeout', 'max_requests'):
+        value = getattr(args, name, None)
+        if value is not None:
+            options[name] = value
+    check_workers(app, options['workers'])
+
+    options.update({
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'pre_fork': pre_fork(app),
+        'post_fork': post_fork(app),
+        'worker_exit': worker_exit(app)
+    })
+    return options
+
+# State kept in process memory is not shared between the workers: sessions would only exist in the worker
+# that created them, and every worker has its own product and principal caches, rate limit buckets and metrics
+def check_workers(app, workers):
+    if workers <= 1:
+        return
+    config = app.config
+    if config['SESSION_BACKEND'] == 'memory':
+        raise SystemExit(f"SESSION_BACKEND=memory keeps the sessions in one worker, use cookie or sql "
+                         f"with {workers} workers")
+    if config['PRODUCT_CACHE_BACKEND'] == 'memory':
+        logger.warning("PRODUCT_CACHE_BACKEND=memory: a catalog write only clears the cache of the worker that "
+                       "made it, the others serve the old products for up to PRODUCT_CACHE_TTL (%ds); use redis "
+                       "to share the cache", config['PRODUCT_CACHE_TTL'])
+    if config['PRINCIPAL_CACHE_BACKEND'] == 'memory' and config['PRINCIPAL_CACHE_TTL'] > 0:
+        logger.warning("PRINCIPAL_CACHE_BACKEND=memory: a role change only clears the cache of the worker that "
+                       "made it, the others keep the old role for up to PRINCIPAL_CACHE_TTL (%ds); use redis or "
+                       "PRINCIPAL_CACHE_TTL=0", config['PRINCIPAL_CACHE_TTL'])
+    if config['RATE_LIMIT_ENABLED'] and config['RATE_LIMIT_BACKEND'] == 'memory':
+        logger.warning("RATE_LIMIT_BACKEND=memory: every limit is enforced per worker, so clients get up to "
+                       "%d times the configured rate; use redis to share the buckets", workers)
+    if config['METRICS_ENABLED']:
+        logger.warning("/metrics reports only the worker that answers the scrape, not all %d workers", workers)
+
+# gunicorn server hooks, each one bound to the preloaded app
+def pre_fork(app):
+    # Runs in the master before every fork: no outbox thread or open connection is copied into a worker
+    def hook(server, worker):
+        outbox.stop(app)
+        with app.app_context():
+            db.engine.dispose()
+    return hook
+
+def post_fork(app):
+    def hook(server, worker):
+        with app.app_context():
+            # Drops anything inherited without closing it, the worker opens its own connections
+            db.engine.dispose(close=False)
+        outbox.start(app)
+    return hook
+
+def worker_exit(app):
+    # Lets the running outbox jobs finish before the worker goes away
+    def hook(server, worker):
+        outbox.stop(app)
+    return hook
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the app on a pre-fork gunicorn server")
+    parser.add_argument('--bind', help="address to listen on (SERVER_BIND)")
+    parser.add_argument('--workers', type=int, help="worker processes (SERVER_WORKERS)")
+    parser.add_argument('--threads', type=int, help="threads per worker (SERVER_THREADS)")
+    parser.add_argument('--timeout', type=int, help="seconds before a stuck worker is replaced (SERVER_TIMEOUT)")
+    parser.add_argument('--max-requests', type=int, help="requests before a worker is recycled (SERVER_MAX_REQUESTS)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("The gunicorn package is required for the production server: pip install gunicorn")
+
+    # Built once, in the master; the workers are forked from it
+    app = create_app()
+    options = server_options(app, args)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for name, value in options.items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
-from flask import jsonify, session
-from werkzeug.security import generate_password_hash
+from flask import jsonify
 from app.models import User, db
+from app.services.auth_service import principal_cache
+from app.services.password_service import passwords, PasswordPoolBusy, busy_response
+from app.services.session_service import sessions
 
 def manage_account(user_id, data):
     if not user_id:
@@ -25,18 +27,33 @@ def manage_account(user_id, data):
         if user:
             if new_username:
                 user.username = new_username
-                session['username'] = new_username
             if new_password:
-                user.password = generate_password_hash(new_password)
+                user.password = passwords.hash(new_password)
             db.session.commit()  # Commit the changes
+            principal_cache.invalidate(user_id)  # Drop the cached username/role
+            if new_password:
+                sessions.revoke_user(user_id)  # Log out the other devices, this one stays logged in
             return jsonify({"message": "Account updated successfully!"})
         else:
             return jsonify({"message": "User not found"}), 404
+    except PasswordPoolBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         print(f"Error: {e}")
         db.session.rollback()  # Rollback if there's an error
         return jsonify({"message": "Failed to update account"}), 500
 
+def revoke_sessions(user_id):
+    try:
+        revoked = sessions.revoke_user(user_id)
+        if revoked is None:
+            return jsonify({"message": "Sessions can only be revoked with SESSION_BACKEND=memory or sql"}), 501
+        return jsonify({"message": "Other sessions ended", "revoked": revoked}), 200
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"message": "Failed to revoke sessions"}), 500
+
 def get_account_info(user_id):
     if not user_id:
         return jsonify({"message": "No user is currently logged in"}), 401
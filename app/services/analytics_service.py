@@ -0,0 +1,236 @@
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, desc, func, select
+from app.models import Order, OrderItem, Product, ProductSalesDaily, SalesDaily, db
+from app.services.pagination import parse_limit
+from app.services.sql_helpers import upsert
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366 * 5
+SORTS = ('revenue', 'units')
+
+# Admin sales reports, served from daily rollup tables: place_order adds each order to them in its own
+# transaction, `flask analytics rebuild` recomputes them from the orders. A report reads one row per day
+# (per product), whatever the number of orders.
+class AnalyticsService:
+    @staticmethod
+    def record_sale(day, lines):
+        # Adds one order to the rollups; lines are (product_id, quantity, price). The caller commits.
+        db.session.execute(_add_to(SalesDaily, ['day']), [{
+            "day": day,
+            "orders": 1,
+            "units": sum(quantity for _, quantity, _ in lines),
+            "revenue": sum(quantity * price for _, quantity, price in lines)
+        }])
+        db.session.execute(_add_to(ProductSalesDaily, ['day', 'product_id']), [{
+            "day": day,
+            "product_id": product_id,
+            "orders": 1,
+            "units": quantity,
+            "revenue": quantity * price
+        } for product_id, quantity, price in lines])
+
+    @staticmethod
+    def rebuild(chunk_size=None):
+        # Recomputes the rollups one range of whole days (about chunk_size orders) at a time. Each range is
+        # deleted and re-aggregated with a set-based INSERT ... SELECT ... GROUP BY in one transaction, so
+        # reports see either the old or the new numbers of a day, never a partial one, and a failure leaves
+        # every day consistent. Checkouts of a day being rebuilt wait on its rows and are counted once.
+        chunk_size = chunk_size or current_app.config['ANALYTICS_REBUILD_CHUNK_SIZE']
+        start = time.perf_counter()
+        day = func.date(Order.order_date)
+        counts = db.session.execute(select(day, func.count()).group_by(day).order_by(day)).all()
+        db.session.rollback()
+
+        ranges = _day_ranges(counts, chunk_size)
+        for first, end in ranges:
+            try:
+                _rebuild_days(first, end)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        chunks = len(ranges)
+
+        return {
+            "orders": db.session.scalar(select(func.coalesce(func.sum(SalesDaily.orders), 0))),
+            "days": db.session.scalar(select(func.count()).select_from(SalesDaily)),
+            "chunks": chunks,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    @staticmethod
+    def revenue_by_day(params):
+        try:
+            first, last = _date_range(params)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            rows = db.session.execute(
+                select(SalesDaily.day, SalesDaily.orders, SalesDaily.units, SalesDaily.revenue)
+                .where(SalesDaily.day >= first, SalesDaily.day <= last)
+                .order_by(SalesDaily.day)
+            ).all()
+            days = [{"day": row.day.isoformat(), "orders": row.orders, "units": row.units,
+                     "revenue": round(row.revenue, 2)} for row in rows]
+            return {
+                "from": first.isoformat(),
+                "to": last.isoformat(),
+                "days": days,
+                "total": {
+                    "orders": sum(day["orders"] for day in days),
+                    "units": sum(day["units"] for day in days),
+                    "revenue": round(sum(row.revenue for row in rows), 2)
+                }
+            }, 200
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve revenue"}, 500
+
+    @staticmethod
+    def product_sales(params):
+        # Revenue per product, or top sellers with sort=units
+        sort = params.get('sort', 'revenue')
+        if sort not in SORTS:
+            return {"message": f"sort must be one of {', '.join(SORTS)}"}, 400
+        try:
+            first, last = _date_range(params)
+            limit = parse_limit(params.get('limit'), default=20)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            totals = select(
+                ProductSalesDaily.product_id,
+                func.sum(ProductSalesDaily.orders).label('orders'),
+                func.sum(ProductSalesDaily.units).label('units'),
+                func.sum(ProductSalesDaily.revenue).label('revenue')
+            ).where(ProductSalesDaily.day >= first, ProductSalesDaily.day <= last) \
+             .group_by(ProductSalesDaily.product_id) \
+             .order_by(desc(sort), ProductSalesDaily.product_id) \
+             .limit(limit) \
+             .subquery()
+            rows = db.session.execute(
+                select(totals, Product.name)
+                .outerjoin(Product, Product.id == totals.c.product_id)
+                .order_by(desc(totals.c[sort]), totals.c.product_id)
+            ).all()
+            return {
+                "from": first.isoformat(),
+                "to": last.isoformat(),
+                "sort": sort,
+                "items": [{"product_id": row.product_id, "name": row.name, "orders": row.orders,
+                           "units": row.units, "revenue": round(row.revenue, 2)} for row in rows]
+            }, 200
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve product sales"}, 500
+
+    @staticmethod
+    def low_stock(params):
+        # Products at or below the threshold, lowest stock first, with their sales over the last week
+        try:
+            threshold = int(params.get('threshold', current_app.config['ANALYTICS_LOW_STOCK_THRESHOLD']))
+            limit = parse_limit(params.get('limit'))
+        except (TypeError, ValueError):
+            return {"message": "Invalid threshold or limit"}, 400
+
+        try:
+            products = db.session.execute(
+                select(Product.id, Product.name, Product.stock)
+                .where(Product.stock <= threshold)
+                .order_by(Product.stock, Product.id)
+                .limit(limit)
+            ).all()
+
+            since = datetime.utcnow().date() - timedelta(days=6)
+            sold = dict(db.session.execute(
+                select(ProductSalesDaily.product_id, func.sum(ProductSalesDaily.units))
+                .where(ProductSalesDaily.day >= since,
+                       ProductSalesDaily.product_id.in_([product.id for product in products]))
+                .group_by(ProductSalesDaily.product_id)
+            ).all()) if products else {}
+
+            items = []
+            for product in products:
+                units = sold.get(product.id, 0)
+                items.append({
+                    "product_id": product.id,
+                    "name": product.name,
+                    "stock": product.stock,
+                    "sold_last_7_days": units,
+                    # At last week's pace; None when it did not sell
+                    "days_of_stock": round(product.stock / (units / 7), 1) if units else None
+                })
+            return {"threshold": threshold, "items": items}, 200
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve low stock products"}, 500
+
+def _add_to(model, keys):
+    # INSERT that adds the counters to an existing row for the same keys
+    table = model.__table__.c
+    return upsert(model, keys, {
+        name: (lambda column: lambda excluded: table[column] + excluded[column])(name)
+        for name in ('orders', 'units', 'revenue')
+    })
+
+def _day_ranges(counts, chunk_size):
+    # [first, end) day ranges of about chunk_size orders each, from (day, orders) in day order. The first and
+    # last ranges are open-ended, so rollup days with no orders left in them are cleared too.
+    ends, pending = [], 0
+    for day, orders in counts:
+        pending += orders
+        if pending >= chunk_size:
+            ends.append(date.fromisoformat(str(day)) + timedelta(days=1))
+            pending = 0
+    if ends and not pending:
+        ends.pop()  # the last full range is also the open-ended one
+    return list(zip([None] + ends, ends + [None]))
+
+def _rebuild_days(first, end):
+    in_range = []
+    for model in (ProductSalesDaily, SalesDaily):
+        conditions = []
+        if first is not None:
+            conditions.append(model.day >= first)
+        if end is not None:
+            conditions.append(model.day < end)
+        db.session.execute(delete(model).where(*conditions))
+    if first is not None:
+        in_range.append(Order.order_date >= datetime.combine(first, datetime.min.time()))
+    if end is not None:
+        in_range.append(Order.order_date < datetime.combine(end, datetime.min.time()))
+
+    db.session.execute(_add_to(SalesDaily, ['day']).from_select(
+        ['day', 'orders', 'units', 'revenue'], _aggregate(in_range)))
+    db.session.execute(_add_to(ProductSalesDaily, ['day', 'product_id']).from_select(
+        ['day', 'product_id', 'orders', 'units', 'revenue'], _aggregate(in_range, by_product=True)))
+
+def _aggregate(conditions, by_product=False):
+    day = func.date(Order.order_date)
+    keys = [day, OrderItem.product_id] if by_product else [day]
+    return select(
+        *keys,
+        func.count(func.distinct(Order.id)),
+        func.sum(OrderItem.quantity),
+        func.sum(OrderItem.quantity * OrderItem.price)
+    ).join(OrderItem, OrderItem.order_id == Order.id) \
+     .where(*conditions) \
+     .group_by(*keys)
+
+def _date_range(params):
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD, both inclusive; the last DEFAULT_DAYS days by default
+    try:
+        last = date.fromisoformat(params['to']) if params.get('to') else datetime.utcnow().date()
+        first = date.fromisoformat(params['from']) if params.get('from') else last - timedelta(days=DEFAULT_DAYS - 1)
+    except ValueError:
+        raise ValueError("Dates must be formatted as YYYY-MM-DD")
+    if first > last:
+        raise ValueError("from must not be after to")
+    if (last - first).days >= MAX_DAYS:
+        raise ValueError(f"The range cannot exceed {MAX_DAYS} days")
+    return first, last
@@ -0,0 +1,88 @@
+from sqlalchemy import select
+from werkzeug.http import http_date, quote_etag
+from app.models import CatalogState, Product
+from app.services.cart_service import CartService
+from app.services.order_service import OrderService
+from app.services.pagination import parse_limit, decode_cursor, encode_cursor, envelope, build_page
+from app.services.product_service import list_item, details_item
+from app.services.product_service import catalog_state, catalog_last_modified, page_etag, stock_etag
+
+# Coroutine versions of the read paths served by the ASGI mode (app/asgi.py). They run the same statements
+# and build the same payloads as the sync services, on an AsyncSession, and return (payload, status) or
+# (payload, status, headers).
+class AsyncProductService:
+    KINDS = {'list': list_item, 'details': details_item}
+
+    @staticmethod
+    async def product_page(session, kind, limit=None, after=None):
+        try:
+            limit = parse_limit(limit)
+            cursor = decode_cursor(after)
+            last_id = int(cursor[0]) if cursor else None
+        except (TypeError, ValueError):
+            return {"message": "Invalid pagination parameters"}, 400
+
+        try:
+            # One keyset query for the page, fields and stock together (the sync app's cache is not shared)
+            query = select(Product.id, Product.name, Product.description, Product.price, Product.stock) \
+                .order_by(Product.id) \
+                .limit(limit + 1)
+            if last_id is not None:
+                query = query.where(Product.id > last_id)
+            rows = (await session.execute(query)).all()
+            if not rows and last_id is None:
+                return {"message": "No products available"}, 404
+
+            page, has_more = rows[:limit], len(rows) > limit
+            serialize = AsyncProductService.KINDS[kind]
+            items = [serialize(row._mapping, row.stock) for row in page]
+
+            # Same validators as the sync pages, so a conditional request (served by the sync app) gets its 304
+            state = catalog_state(await session.get(CatalogState, 1))
+            etag = page_etag(kind, state, last_id, limit)
+            headers = {}
+            if kind == 'list':
+                etag = stock_etag(etag, [row.stock for row in page])
+            elif catalog_last_modified(state):
+                headers['Last-Modified'] = http_date(catalog_last_modified(state))
+            headers['ETag'] = quote_etag(etag)
+            return envelope(items, limit, encode_cursor(page[-1].id) if has_more else None), 200, headers
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve products"}, 500
+
+class AsyncCartService:
+    @staticmethod
+    async def view_cart(session, user_id):
+        try:
+            cart_items = (await session.execute(CartService._cart_lines(user_id))).all()
+            return CartService._cart_summary(cart_items)
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve cart items"}, 500
+
+class AsyncOrderService:
+    @staticmethod
+    async def list_orders(session, user_id, limit=None, after=None):
+        try:
+            limit = parse_limit(limit)
+            cursor = OrderService._decode_cursor(after)
+        except (TypeError, ValueError):
+            return {"message": "Invalid pagination parameters"}, 400
+
+        try:
+            rows = (await session.execute(OrderService._order_summaries(user_id, cursor, limit + 1))).all()
+            return build_page(rows, limit, OrderService._order_summary,
+                              lambda order: (order.order_date.isoformat(), order.id)), 200
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve orders"}, 500
+
+    @staticmethod
+    async def get_order(session, user_id, order_id):
+        try:
+            rows = (await session.execute(OrderService._order_lines(user_id, order_id))).all()
+            return OrderService._order_detail(rows)
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve order"}, 500
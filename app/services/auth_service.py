@@ -0,0 +1,71 @@
+from functools import wraps
+
+from flask import current_app, g, jsonify, session
+from app.models import User, db
+from app.services.cache import LRUCache, RedisCache
+
+# Short-lived cache of who a user is (username, role), so admin checks don't hit the database on every request.
+# Entries are dropped as soon as manage_account changes the user; PRINCIPAL_CACHE_TTL=0 disables caching.
+# With several processes use PRINCIPAL_CACHE_BACKEND=redis, the drop then reaches all of them.
+class PrincipalCache:
+    def init_app(self, app):
+        app.config.setdefault('PRINCIPAL_CACHE_BACKEND', 'memory')
+        app.config.setdefault('PRINCIPAL_CACHE_TTL', 60)
+        app.config.setdefault('PRINCIPAL_CACHE_MAXSIZE', 10000)
+        app.config.setdefault('PRINCIPAL_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        if app.config['PRINCIPAL_CACHE_BACKEND'] == 'redis':
+            backend = RedisCache.from_url(
+                app.config['PRINCIPAL_CACHE_REDIS_URL'], prefix='principals:', ttl=app.config['PRINCIPAL_CACHE_TTL']
+            )
+        else:
+            backend = LRUCache(maxsize=app.config['PRINCIPAL_CACHE_MAXSIZE'], ttl=app.config['PRINCIPAL_CACHE_TTL'])
+        app.extensions['principal_cache'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions['principal_cache']
+
+    def get(self, user_id):
+        key = f"user:{user_id}"
+        if self.backend.ttl > 0:
+            principal = self.backend.get(key)
+            if principal is not None:
+                return principal
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        principal = {"id": user.id, "username": user.username, "is_admin": bool(user.is_admin)}
+        if self.backend.ttl > 0:
+            self.backend.set(key, principal)
+        return principal
+
+    def invalidate(self, user_id):
+        self.backend.delete(f"user:{user_id}")
+
+principal_cache = PrincipalCache()
+
+# Rejects anonymous requests and exposes the logged-in user ID as g.user_id
+def login_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({"message": "Authentication required"}), 401
+        g.user_id = user_id
+        return view(*args, **kwargs)
+    return wrapper
+
+# Only lets admins through, the role comes from the principal cache
+def admin_required(view):
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        principal = principal_cache.get(g.user_id)
+        if principal is None:
+            return jsonify({"message": "User not found"}), 404
+        if not principal["is_admin"]:
+            return jsonify({"message": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# In-process LRU cache with a TTL per entry and a bounded number of entries
+class LRUCache:
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._counters = {}            # counters are never evicted
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                elif entry[0] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    found[key] = entry[1]
+        return found
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+# Shared cache backed by any redis-py compatible client, so several processes see the same entries.
+# Values are stored as JSON; expiry and eviction are left to the server (maxmemory-policy).
+class RedisCache:
+    def __init__(self, client, prefix='cache:', ttl=300):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for the redis cache backend")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([self.prefix + key for key in keys])
+        found = {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        pipe = self.client.pipeline()
+        for key, value in mapping.items():
+            pipe.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+        pipe.execute()
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def incr(self, key):
+        return int(self.client.incr(self.prefix + key))
+
+    def counter(self, key):
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "redis", "hits": self.hits, "misses": self.misses}
@@ -1,6 +1,11 @@
-from app.models import Cart, Product, db
+from sqlalchemy import and_, select
+from app.models import Cart, Product, StockReservation, db
+from app.services.reservation_service import ReservationService, RESERVED, NOT_FOUND, INSUFFICIENT_STOCK, CONFLICT
+from app.services.sql_helpers import upsert
 from flask import session, jsonify
 
+cart_table = Cart.__table__
+
 class CartService:
     @staticmethod
     def add_to_cart(user_id, product_id, quantity):
@@ -8,58 +13,183 @@ class CartService:
         if not product_id or quantity <= 0:
             return {"message": "Product ID and valid quantity are required"}, 400
 
-        # Retrieve the product from the database by ID
-        product = Product.query.get(product_id)
-        if not product:
-            # Return error if the product is not found
-            return {"message": "Product not found"}, 404
+        try:
+            # Give expired reservations back to stock before taking more
+            ReservationService.sweep_if_due()
 
-        # Check if there is enough stock for the requested quantity
-        if product.stock < quantity:
-            return {"message": "Not enough stock available"}, 400
+            # Atomically move the quantity from the product stock into the user's reservation
+            status = ReservationService.reserve(user_id, product_id, quantity)
+            if status != RESERVED:
+                db.session.rollback()
+            if status == NOT_FOUND:
+                # Return error if the product is not found
+                return {"message": "Product not found"}, 404
+            if status == INSUFFICIENT_STOCK:
+                # Check if there is enough stock for the requested quantity
+                return {"message": "Not enough stock available"}, 400
+            if status == CONFLICT:
+                return {"message": "Product stock is changing too quickly, please retry"}, 409
 
-        try:
-            # Create a new cart item with the given product and quantity
-            cart_item = Cart(user_id=user_id, product_id=product.id, quantity=quantity)
-            db.session.add(cart_item)
-            db.session.commit()  # Commit the cart item to the database
+            # Create the cart line, or add to its quantity if the product is already in the cart
+            db.session.execute(
+                upsert(Cart, ['user_id', 'product_id'], {
+                    'quantity': lambda excluded: cart_table.c.quantity + excluded.quantity
+                }).values(user_id=user_id, product_id=product_id, quantity=quantity)
+            )
+            db.session.commit()  # Commit the reservation and cart item together
             return {"message": "Product added to cart successfully!"}, 201
         except Exception as e:
             print(f"Error: {e}")
+            db.session.rollback()
             # Handle any errors that occur during the process
             return {"message": "Failed to add product to cart"}, 500
 
+    @staticmethod
+    def bulk_update(user_id, operations):
+        # Applies a batch of add/set/remove operations to the cart in a single transaction
+        if not isinstance(operations, list) or not operations:
+            return {"message": "A non-empty list of operations is required"}, 400
+
+        for index, operation in enumerate(operations):
+            error = CartService._validate_operation(operation)
+            if error:
+                return {"message": f"Operation {index}: {error}"}, 400
+
+        try:
+            ReservationService.sweep_if_due()
+
+            # One query validates every product and reads the current cart line and reservation
+            product_ids = sorted({operation['product_id'] for operation in operations})
+            rows = db.session.query(
+                Product.id,
+                Product.stock,
+                Cart.quantity.label('cart_quantity'),
+                StockReservation.quantity.label('reserved')
+            ).outerjoin(Cart, and_(Cart.product_id == Product.id, Cart.user_id == user_id)) \
+             .outerjoin(StockReservation, and_(StockReservation.product_id == Product.id,
+                                               StockReservation.user_id == user_id)) \
+             .filter(Product.id.in_(product_ids)) \
+             .all()
+
+            missing = sorted(set(product_ids) - {row.id for row in rows})
+            if missing:
+                return {"message": "Product not found", "product_ids": missing}, 404
+
+            # Replay the operations in order to get the final quantity of every line
+            targets = {row.id: row.cart_quantity or 0 for row in rows}
+            for operation in operations:
+                product_id = operation['product_id']
+                if operation['op'] == 'add':
+                    targets[product_id] += operation['quantity']
+                elif operation['op'] == 'set':
+                    targets[product_id] = operation['quantity']
+                else:
+                    targets[product_id] = 0
+
+            stock = {row.id: row.stock for row in rows}
+            reserved = {row.id: row.reserved or 0 for row in rows}
+            oversold = ReservationService.oversell_report(
+                {product_id: quantity for product_id, quantity in targets.items() if quantity > 0},
+                stock, reserved
+            )
+            if oversold:
+                return {"message": "Not enough stock available", "oversold": oversold}, 400
+
+            # Reservations follow the cart: take or give back the difference from the product stock
+            if not ReservationService.take_stock({
+                product_id: targets[product_id] - reserved[product_id]
+                for product_id in targets if targets[product_id] != reserved[product_id]
+            }):
+                db.session.rollback()
+                return {"message": "Product stock is changing too quickly, please retry"}, 409
+            ReservationService.hold(user_id, targets)
+
+            kept = [{"user_id": user_id, "product_id": product_id, "quantity": quantity}
+                    for product_id, quantity in targets.items() if quantity > 0]
+            removed = [product_id for product_id, quantity in targets.items() if quantity <= 0]
+            if kept:
+                db.session.execute(upsert(Cart, ['user_id', 'product_id'], {
+                    'quantity': lambda excluded: excluded.quantity
+                }), kept)
+            if removed:
+                Cart.query.filter(Cart.user_id == user_id, Cart.product_id.in_(removed)) \
+                    .delete(synchronize_session=False)
+            db.session.commit()
+
+            items = [{"product_id": product_id, "quantity": quantity}
+                     for product_id, quantity in sorted(targets.items()) if quantity > 0]
+            return {"message": "Cart updated successfully!", "items": items}, 200
+        except Exception as e:
+            print(f"Error: {e}")
+            db.session.rollback()
+            return {"message": "Failed to update cart"}, 500
+
+    @staticmethod
+    def _validate_operation(operation):
+        if not isinstance(operation, dict) or operation.get('op') not in ('add', 'set', 'remove'):
+            return "op must be one of add, set or remove"
+
+        product_id = operation.get('product_id')
+        if not isinstance(product_id, int) or isinstance(product_id, bool) or product_id <= 0:
+            return "a valid product_id is required"
+
+        if operation['op'] == 'remove':
+            return None
+        quantity = operation.get('quantity')
+        if not isinstance(quantity, int) or isinstance(quantity, bool):
+            return "quantity must be an integer"
+        if operation['op'] == 'add' and quantity <= 0:
+            return "quantity must be greater than 0"
+        if operation['op'] == 'set' and quantity < 0:
+            return "quantity cannot be negative"
+        return None
+
     @staticmethod
     def view_cart(user_id):
         try:
-            # Retrieve all cart items for the given user from the database
-            cart_items = Cart.query.filter_by(user_id=user_id).all()
-            if not cart_items:
-                # Return message if the cart is empty
-                return {"message": "Cart is empty"}, 404
-
-            # Create a list of items in the cart with product details and total price
-            cart_list = [{
-                "product_name": item.product.name,
-                "quantity": item.quantity,
-                "price_per_item": item.product.price,
-                "total_price": item.quantity * item.product.price
-            } for item in cart_items]
-
-            return {"items": cart_list}, 200
+            cart_items = db.session.execute(CartService._cart_lines(user_id)).all()
+            return CartService._cart_summary(cart_items)
         except Exception as e:
             print(f"Error: {e}")
             # Handle errors during cart retrieval
             return {"message": "Failed to retrieve cart items"}, 500
+
+    @staticmethod
+    def _cart_lines(user_id):
+        # Retrieve the cart lines and their product columns with one joined query
+        return select(Cart.product_id, Cart.quantity, Product.name, Product.price) \
+            .join(Product, Cart.product_id == Product.id) \
+            .where(Cart.user_id == user_id) \
+            .order_by(Cart.id)
+
+    @staticmethod
+    def _cart_summary(cart_items):
+        if not cart_items:
+            # Return message if the cart is empty
+            return {"message": "Cart is empty"}, 404
+
+        # Create a list of items in the cart with product details and total price
+        cart_list = [{
+            "product_id": item.product_id,
+            "product_name": item.name,
+            "quantity": item.quantity,
+            "price_per_item": item.price,
+            "total_price": item.quantity * item.price
+        } for item in cart_items]
+        subtotal = round(sum(item["total_price"] for item in cart_list), 2)
+
+        return {"items": cart_list, "subtotal": subtotal}, 200
         
     @staticmethod
     def clear_cart(user_id):
         try:
-            # Delete all cart items for the given user from the database
+            # Delete all cart items for the given user and give their reserved stock back
+            ReservationService.release_for_user(user_id)
             Cart.query.filter_by(user_id=user_id).delete()
             db.session.commit()  # Commit the deletion to the database
             return {"message": "Cart cleared successfully!"}, 200
         except Exception as e:
             print(f"Error: {e}")
+            db.session.rollback()
             # Handle any errors that occur during the deletion process
             return {"message": "Failed to clear cart"}, 500
\ No newline at end of file
@@ -0,0 +1,173 @@
+import csv
+import io
+import json
+import time
+
+from flask import current_app, jsonify, request, stream_with_context
+from sqlalchemy import func, select
+from app.models import Product, db
+from app.services.sql_helpers import upsert
+from app.services.product_cache import product_cache
+from app.services.product_service import validate_product, bump_catalog_version
+from app.services.streaming import NDJSON_MIMETYPE, iter_chunks, json_lines
+
+# Bulk catalog sync: CSV or JSON Lines in, CSV or JSON Lines out, one row per product keyed on its name
+FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = ('id', 'name', 'description', 'price', 'stock')
+_MIMETYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/json-lines': 'ndjson'
+}
+
+def detect_format(fmt=None, mimetype=None, filename=None):
+    # Explicit format first, then the content type (HTTP) or the file extension (CLI)
+    if fmt:
+        return fmt if fmt in FORMATS else None
+    if mimetype in _MIMETYPES:
+        return _MIMETYPES[mimetype]
+    if filename:
+        if filename.endswith('.csv'):
+            return 'csv'
+        if filename.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+    return None
+
+def read_rows(text, fmt):
+    # Yields (line number, row dict or None, parse error) without loading the whole input
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Empty CSV cells mean "not provided", like a missing JSON key
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ('', None)}, None
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, row, None
+
+def import_catalog(text, fmt, batch_size=None):
+    # Validates every row with the add/edit rules and upserts valid rows on name, one transaction per batch
+    batch_size = batch_size or current_app.config['PRODUCT_IMPORT_BATCH_SIZE']
+    max_errors = current_app.config['PRODUCT_IMPORT_MAX_ERRORS']
+    report = {"processed": 0, "upserted": 0, "failed": 0, "errors": []}
+    start = time.perf_counter()
+
+    def fail(line_number, name, message):
+        report["failed"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"line": line_number, "name": name, "message": message})
+
+    batch = {}  # name -> (line number, values); a name repeated in a batch keeps its last row
+    for line_number, row, error in read_rows(text, fmt):
+        report["processed"] += 1
+        if error is None:
+            values, error = validate_product(row)
+        if error:
+            fail(line_number, row.get('name') if isinstance(row, dict) else None, error)
+            continue
+
+        batch[values['name']] = (line_number, values)
+        if len(batch) >= batch_size:
+            _flush(batch, report, fail)
+            batch = {}
+    if batch:
+        _flush(batch, report, fail)
+
+    if report["upserted"]:
+        # New names change the catalog pages, so start a new page generation
+        product_cache.invalidate_catalog()
+
+    elapsed = time.perf_counter() - start
+    report["elapsed_ms"] = round(elapsed * 1000, 1)
+    report["rows_per_s"] = round(report["processed"] / elapsed, 1) if elapsed else 0.0
+    return report
+
+def _flush(batch, report, fail):
+    products = Product.__table__.c
+    statement = upsert(Product, ['name'], {
+        # An empty description keeps the current one
+        'description': lambda excluded: func.coalesce(func.nullif(excluded.description, ''), products.description),
+        'price': lambda excluded: excluded.price,
+        'stock': lambda excluded: excluded.stock,
+        'version': lambda excluded: products.version + 1
+    })
+    rows = [{
+        "name": values["name"],
+        "description": values["description"] or '',
+        "price": values["price"],
+        "stock": values["stock"],
+        "version": 0
+    } for _, values in batch.values()]
+
+    try:
+        db.session.execute(statement, rows)
+        bump_catalog_version()
+        db.session.commit()
+    except Exception as e:
+        print(f"Error: {e}")
+        db.session.rollback()  # Only this batch is lost, earlier batches are already committed
+        for line_number, values in batch.values():
+            fail(line_number, values["name"], "Failed to import batch")
+        return
+
+    report["upserted"] += len(rows)
+    product_ids = db.session.scalars(select(Product.id).where(Product.name.in_(list(batch)))).all()
+    product_cache.invalidate_products(product_ids)
+
+def export_catalog(fmt):
+    # Streams the catalog in primary key order, fetching rows from the cursor in chunks
+    query = select(*[Product.__table__.c[column] for column in EXPORT_COLUMNS]).order_by(Product.id)
+
+    if fmt == 'ndjson':
+        yield from json_lines(iter_chunks(db.session, query), lambda row: dict(row._mapping))
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in iter_chunks(db.session, query):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def import_products():
+    fmt = detect_format(request.args.get('format'), request.mimetype)
+    if fmt is None:
+        return jsonify({"message": "Unsupported import format, use csv or ndjson"}), 400
+
+    try:
+        # Read the request body as it arrives instead of buffering it
+        text = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        return jsonify(import_catalog(text, fmt)), 200
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({"message": "Import must be UTF-8 encoded"}), 400
+    except Exception as e:
+        print(f"Error: {e}")
+        db.session.rollback()
+        return jsonify({"message": "Failed to import products"}), 500
+
+def export_products():
+    fmt = detect_format(request.args.get('format') or 'csv')
+    if fmt is None:
+        return jsonify({"message": "Unsupported export format, use csv or ndjson"}), 400
+
+    mimetype = 'text/csv' if fmt == 'csv' else NDJSON_MIMETYPE
+    response = current_app.response_class(stream_with_context(export_catalog(fmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+    return response
@@ -0,0 +1,128 @@
+import gzip
+import zlib
+
+from flask import current_app, request
+
+# Content codings the app can produce, preferred first when the client accepts several equally
+CODINGS = ('br', 'gzip')
+
+# Negotiated response compression: JSON (and the other text types) at least COMPRESSION_MIN_SIZE bytes long
+# are sent as brotli (when the brotli package is installed) or gzip, whichever the client's Accept-Encoding
+# prefers. Streamed listings are compressed chunk by chunk, each chunk flushed so it still goes out at once.
+# A compressed response gets its own ETag (<etag>-gzip), as a different representation of the same resource.
+class Compression:
+    def init_app(self, app):
+        app.config.setdefault('COMPRESSION_ENABLED', True)
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)      # bytes, smaller bodies gain less than they cost
+        app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 4)
+        app.config.setdefault('COMPRESSION_MIMETYPES', (
+            'application/json', 'application/x-ndjson', 'text/csv', 'text/plain'
+        ))
+        app.extensions['compression'] = {name: coder for name, coder in _coders(app.config).items() if coder}
+
+        if app.config['COMPRESSION_ENABLED']:
+            app.after_request(self._after_request)
+
+    def _after_request(self, response):
+        config = current_app.config
+        if (response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in config['COMPRESSION_MIMETYPES']
+                or response.status_code < 200 or response.status_code in (204, 304)):
+            return response
+        if not response.is_streamed and response.content_length is not None \
+                and response.content_length < config['COMPRESSION_MIN_SIZE']:
+            return response
+
+        # The body depends on Accept-Encoding from here on, even when it is sent uncompressed
+        response.vary.add('Accept-Encoding')
+        coding = negotiate(current_app, request.accept_encodings)
+        if coding is None:
+            return response
+
+        coder = current_app.extensions['compression'][coding]
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, coder.stream())
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(coder.compress(response.get_data()))
+        response.headers['Content-Encoding'] = coding
+
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{coding}", weak)
+        return response
+
+compression = Compression()
+
+def negotiate(app, accept_encodings):
+    # Coding the client prefers among those available, None to send the body as it is
+    coders = app.extensions['compression']
+    return accept_encodings.best_match([name for name in CODINGS if name in coders])
+
+def etag_variants(etag):
+    # Every ETag a client may hold for a response: the identity one and one per content coding
+    return [etag] + [f"{etag}-{coding}" for coding in CODINGS]
+
+def _compress_stream(chunks, stream):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = stream.send(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+def _coders(config):
+    return {'br': _BrotliCoder.create(config['COMPRESSION_BROTLI_QUALITY']),
+            'gzip': _GzipCoder(config['COMPRESSION_GZIP_LEVEL'])}
+
+class _GzipCoder:
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def stream(self):
+        return _GzipStream(zlib.compressobj(self.level, zlib.DEFLATED, 31))
+
+class _GzipStream:
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def send(self, chunk):
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+# Brotli compresses JSON tighter than gzip at a similar cost; it is optional, gzip is used without it
+class _BrotliCoder:
+    def __init__(self, brotli, quality):
+        self.brotli = brotli
+        self.quality = quality
+
+    @classmethod
+    def create(cls, quality):
+        try:
+            import brotli
+        except ImportError:
+            return None
+        return cls(brotli, quality)
+
+    def compress(self, data):
+        return self.brotli.compress(data, quality=self.quality)
+
+    def stream(self):
+        return _BrotliStream(self.brotli.Compressor(quality=self.quality))
+
+class _BrotliStream:
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def send(self, chunk):
+        return self.compressor.process(chunk) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
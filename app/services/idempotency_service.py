@@ -0,0 +1,193 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from app.models import IdempotencyKey, db
+
+MAX_KEY_LENGTH = 255
+# Responses worth running the request again for instead of replaying: conflicts, throttling, server errors
+RETRYABLE_STATUSES = {409, 429}
+
+# A key this request holds; locked_until tells it apart from a later request that took the key over
+Claim = namedtuple('Claim', 'id user_id key locked_until')
+
+# Requests sent with an Idempotency-Key header run once per user and key: the response is stored, and a
+# retry with the same key gets it back instead of running the request again. A duplicate arriving while
+# the first request still runs waits for its response. Keys expire after IDEMPOTENCY_TTL seconds.
+class Idempotency:
+    def init_app(self, app):
+        app.config.setdefault('IDEMPOTENCY_TTL', 24 * 3600)          # seconds a stored response is replayed
+        app.config.setdefault('IDEMPOTENCY_WAIT_SECONDS', 10)        # how long a duplicate waits for the first request
+        app.config.setdefault('IDEMPOTENCY_LOCK_SECONDS', 60)        # after this a crashed request's key is taken over
+        app.config.setdefault('IDEMPOTENCY_PURGE_INTERVAL', 300)     # seconds between purges of expired keys
+        app.extensions['idempotency'] = _InFlight()
+
+    @property
+    def in_flight(self):
+        return current_app.extensions['idempotency']
+
+    def begin(self, user_id, key, fingerprint):
+        # Returns (action, record): 'run' with the claimed record, 'replay' with the stored one,
+        # 'mismatch' when the key was used for another request, 'busy' when waiting timed out
+        config = current_app.config
+        deadline = time.monotonic() + config['IDEMPOTENCY_WAIT_SECONDS']
+        while True:
+            now = datetime.utcnow()
+            locked_until = now + timedelta(seconds=config['IDEMPOTENCY_LOCK_SECONDS'])
+            try:
+                record = IdempotencyKey(user_id=user_id, key=key, fingerprint=fingerprint,
+                                        locked_until=locked_until,
+                                        expires_at=now + timedelta(seconds=config['IDEMPOTENCY_TTL']))
+                db.session.add(record)
+                db.session.flush()
+                claim = Claim(record.id, user_id, key, locked_until)
+                db.session.commit()
+                return 'run', self.in_flight.claim(claim)
+            except IntegrityError:
+                db.session.rollback()
+
+            record = db.session.execute(
+                select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            ).scalar_one_or_none()
+            if record is None:
+                continue  # purged in between, insert again
+
+            expired = record.expires_at <= now
+            if not expired and record.fingerprint != fingerprint:
+                return 'mismatch', record
+            if not expired and record.response_status is not None:
+                return 'replay', record
+            if expired or record.locked_until <= now:
+                # Reuse the expired key, or take over from a request that died holding it
+                claim = Claim(record.id, user_id, key, locked_until)
+                if self._take_over(record, fingerprint, locked_until, now, config['IDEMPOTENCY_TTL']):
+                    return 'run', self.in_flight.claim(claim)
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return 'busy', record
+            db.session.rollback()
+            self.in_flight.wait((user_id, key), remaining)
+
+    def finish(self, claim, status, body):
+        # Stores the response, or frees the key so a retry runs the request again
+        condition = (IdempotencyKey.id == claim.id, IdempotencyKey.locked_until == claim.locked_until)
+        try:
+            if status >= 500 or status in RETRYABLE_STATUSES:
+                db.session.execute(delete(IdempotencyKey).where(*condition))
+            else:
+                db.session.execute(update(IdempotencyKey).where(*condition)
+                                   .values(response_status=status, response_body=body)
+                                   .execution_options(synchronize_session=False))
+            db.session.commit()
+        except Exception as e:
+            print(f"Error: {e}")
+            db.session.rollback()
+        finally:
+            self.in_flight.release((claim.user_id, claim.key))
+
+    def purge_expired(self):
+        result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow()))
+        db.session.commit()
+        return result.rowcount
+
+    def purge_if_due(self):
+        # Expired keys are purged at most once per interval per process
+        if not self.in_flight.purge_due(current_app.config['IDEMPOTENCY_PURGE_INTERVAL']):
+            return 0
+        return self.purge_expired()
+
+    def _take_over(self, record, fingerprint, locked_until, now, ttl):
+        result = db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == record.id, IdempotencyKey.locked_until == record.locked_until,
+                   IdempotencyKey.expires_at == record.expires_at)
+            .values(fingerprint=fingerprint, response_status=None, response_body=None,
+                    locked_until=locked_until, expires_at=now + timedelta(seconds=ttl))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+# Events of the keys this process is running, so local duplicates wake up as soon as the response is stored
+# (duplicates sent to another process poll the table instead)
+class _InFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+        self._last_purge = 0.0
+
+    def claim(self, claim):
+        with self._lock:
+            self._events[(claim.user_id, claim.key)] = threading.Event()
+        return claim
+
+    def wait(self, key, timeout, poll_interval=0.05):
+        with self._lock:
+            event = self._events.get(key)
+        if event is None:
+            time.sleep(min(timeout, poll_interval))
+        else:
+            event.wait(timeout)
+
+    def release(self, key):
+        with self._lock:
+            event = self._events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def purge_due(self, interval):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_purge < interval:
+                return False
+            self._last_purge = now
+            return True
+
+idempotency = Idempotency()
+
+def request_fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+# Makes a view safe to retry with an Idempotency-Key header; use after login_required (keys are per user)
+def idempotent(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({"message": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"}), 400
+
+        idempotency.purge_if_due()
+        action, record = idempotency.begin(g.user_id, key, request_fingerprint())
+        if action == 'replay':
+            response = current_app.response_class(record.response_body, record.response_status,
+                                                  mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if action == 'mismatch':
+            return jsonify({"message": "Idempotency-Key was already used for a different request"}), 422
+        if action == 'busy':
+            response = jsonify({"message": "A request with this Idempotency-Key is still in progress"})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency.finish(record, 500, None)
+            raise
+        idempotency.finish(record, response.status_code, response.get_data(as_text=True))
+        return response
+    return wrapper
@@ -0,0 +1,48 @@
+from flask.json.provider import DefaultJSONProvider
+
+# JSON encoder of the app: orjson when installed (JSON_ENCODER=auto, the default), the standard library
+# otherwise. orjson encodes straight to bytes several times faster; dates, decimals and other types it
+# doesn't handle the way Flask does go through Flask's default() so responses keep the same values.
+class OrjsonProvider(DefaultJSONProvider):
+    # Keys keep their insertion order (the order the services build them in), sorting them costs CPU
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+        self._orjson = orjson
+
+    def dumps_bytes(self, obj, **kwargs):
+        orjson = self._orjson
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+
+    def dumps(self, obj, **kwargs):
+        # The output is always compact, so separators=(',', ':') is what every caller gets anyway
+        return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Bytes go into the response as they are, no str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+def init_json(app):
+    encoder = app.config.setdefault('JSON_ENCODER', 'auto')   # auto, orjson or std
+    if encoder not in ('auto', 'orjson', 'std'):
+        raise ValueError(f"Unknown JSON_ENCODER {encoder!r}, expected auto, orjson or std")
+    if encoder == 'std':
+        return
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        if encoder == 'orjson':
+            raise RuntimeError("The orjson package is required for JSON_ENCODER=orjson")
+        return
+    app.json = OrjsonProvider(app)
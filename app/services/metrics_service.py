@@ -0,0 +1,217 @@
+import bisect
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from app.services.password_service import passwords
+from app.services.product_cache import product_cache
+
+# Latency buckets in seconds, from a warm cache hit to a slow checkout
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger('app.slow_queries')
+
+# Per-endpoint request metrics and per-request SQL counters, exported in the Prometheus text format.
+# Every update is a dict lookup and an increment under one lock, cheap enough to leave on in production.
+class Registry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.latency = {}      # (endpoint, method) -> [count per bucket..., +Inf, sum]
+        self.statuses = {}     # (endpoint, method, status) -> requests
+        self.db = {}           # endpoint -> [queries, seconds]
+        self.in_flight = 0
+        self.slow_queries = 0
+        self.collectors = []   # callables returning extra metric families, see add_collector
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def observe(self, endpoint, method, status, seconds, queries, db_seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self.latency.get((endpoint, method))
+            if histogram is None:
+                histogram = self.latency[(endpoint, method)] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+            key = (endpoint, method, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+            if queries:
+                totals = self.db.setdefault(endpoint, [0, 0.0])
+                totals[0] += queries
+                totals[1] += db_seconds
+
+    def slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def families(self):
+        # [(name, type, help, samples)] for every metric; samples are (labels, value),
+        # or (suffix, labels, value) for the _bucket/_sum/_count series of a histogram
+        with self._lock:
+            latency = {key: list(values) for key, values in self.latency.items()}
+            statuses = dict(self.statuses)
+            db = {key: list(values) for key, values in self.db.items()}
+            in_flight, slow_queries = self.in_flight, self.slow_queries
+
+        histogram = []
+        for (endpoint, method), values in sorted(latency.items()):
+            labels = {"endpoint": endpoint, "method": method}
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                histogram.append(('_bucket', {**labels, "le": _format_bound(bound)}, cumulative))
+            histogram.append(('_sum', labels, values[-1]))
+            histogram.append(('_count', labels, cumulative))
+
+        families = [
+            ('http_request_duration_seconds', 'histogram', "Request latency by endpoint", histogram),
+            ('http_requests_total', 'counter', "Requests by endpoint and status", [
+                ({"endpoint": endpoint, "method": method, "status": str(status)}, count)
+                for (endpoint, method, status), count in sorted(statuses.items())
+            ]),
+            ('http_requests_in_flight', 'gauge', "Requests being handled", [({}, in_flight)]),
+            ('db_queries_total', 'counter', "SQL statements by endpoint", [
+                ({"endpoint": endpoint}, totals[0]) for endpoint, totals in sorted(db.items())
+            ]),
+            ('db_query_duration_seconds_total', 'counter', "Time spent in SQL by endpoint", [
+                ({"endpoint": endpoint}, totals[1]) for endpoint, totals in sorted(db.items())
+            ]),
+            ('db_slow_queries_total', 'counter', "Statements slower than SLOW_QUERY_MS", [({}, slow_queries)])
+        ]
+        for collector in self.collectors:
+            families.extend(collector())
+        return families
+
+    def render(self):
+        lines = []
+        for name, kind, description, samples in self.families():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                suffix, labels, value = sample if len(sample) == 3 else ('', *sample)
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+class Metrics:
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_BUCKETS', DEFAULT_BUCKETS)
+        app.config.setdefault('SERVER_TIMING', True)
+        app.config.setdefault('SLOW_QUERY_MS', 0)   # 0 disables the slow query log
+        app.config.setdefault('METRICS_TOKEN', None)  # /metrics requires "Authorization: Bearer <token>"
+        app.extensions['metrics'] = Registry(app.config['METRICS_BUCKETS'])
+
+        if app.config['METRICS_ENABLED']:
+            app.before_request(self._before_request)
+            app.after_request(self._after_request)
+            app.teardown_request(self._teardown_request)
+        self.add_collector(app, cache_collector)
+
+    @property
+    def registry(self):
+        return current_app.extensions['metrics']
+
+    def add_collector(self, app, collector):
+        # collector() returns [(name, type, help, [(labels, value)])], read on every scrape
+        app.extensions['metrics'].collectors.append(collector)
+
+    def instrument_engine(self, app, engine):
+        # Counts statements and their time for the current request, logs the slow ones
+        if not app.config['METRICS_ENABLED']:
+            return
+        registry = app.extensions['metrics']
+        slow_seconds = app.config['SLOW_QUERY_MS'] / 1000
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info['query_started'].pop()
+            if has_request_context() and 'metrics_started' in g:
+                g.db_queries += 1
+                g.db_seconds += elapsed
+            if slow_seconds and elapsed >= slow_seconds:
+                registry.slow_query()
+                # Without the parameters, which can hold password hashes and other personal data
+                slow_query_log.warning("%.1f ms %s", elapsed * 1000, statement)
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(context):
+            # Failed statements never reach after_cursor_execute
+            if context.connection is not None and context.connection.info.get('query_started'):
+                context.connection.info['query_started'].pop()
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+        self.registry.started()
+
+    def _after_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        self._record(response.status_code, elapsed)
+
+        if current_app.config['SERVER_TIMING']:
+            response.headers.add('Server-Timing', (
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={g.db_seconds * 1000:.1f};desc="{g.db_queries} queries"'
+            ))
+        return response
+
+    def _teardown_request(self, exc):
+        # Popping the start time makes this run once even if the context is torn down twice
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        if 'metrics_recorded' not in g:
+            # An unhandled exception skipped after_request
+            self._record(500, time.perf_counter() - started)
+        self.registry.finished()
+
+    def _record(self, status, elapsed):
+        g.metrics_recorded = True
+        # Route templates keep the label set bounded (/orders/<int:order_id>, not one label per order)
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        self.registry.observe(endpoint, request.method, status, elapsed, g.db_queries, g.db_seconds)
+
+metrics = Metrics()
+
+def cache_collector():
+    # Product cache and password pool counters, next to the request metrics
+    families = []
+    for name, value in product_cache.stats().items():
+        if isinstance(value, (int, float)):
+            families.append((f"product_cache_{name}", 'gauge', f"Product cache {name}", [({}, value)]))
+    for name, value in passwords.stats().items():
+        families.append((f"password_pool_{name}", 'gauge', f"Password hashing pool {name}", [({}, value)]))
+    return families
@@ -1,47 +1,238 @@
-from app.models import Order, OrderItem, Product, Cart, db
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, tuple_
+from app.models import Order, OrderItem, Product, Cart, StockReservation, db
+from app.services.pagination import parse_limit, decode_cursor, build_page
+from app.services.reservation_service import ReservationService
+from app.services.streaming import stream_response
+from app.services.outbox_service import outbox
+from app.services.analytics_service import AnalyticsService
 from flask import jsonify
 
+logger = logging.getLogger('app.orders')
+
 class OrderService:
     @staticmethod
     def place_order(user_id):
         try:
-            # Search for user itens in cart
-            cart_items = Cart.query.filter_by(user_id=user_id).all()
-            if not cart_items:
+            # Give expired reservations back to stock before checking availability
+            ReservationService.sweep_if_due()
+
+            # Search for user itens in cart (one line per product)
+            cart_lines = db.session.query(Cart.product_id, Cart.quantity) \
+                .filter(Cart.user_id == user_id) \
+                .order_by(Cart.product_id) \
+                .all()
+            if not cart_lines:
                 return {"message": "Cart is empty"}, 404
 
-            # Calculate the total price
-            total_price = sum(item.quantity * item.product.price for item in cart_items)
+            # Load every product in the cart with a single IN query
+            products = OrderService._load_products(cart_lines)
+
+            for line in cart_lines:
+                if line.product_id not in products:
+                    db.session.rollback()
+                    return {"message": f"Product with ID {line.product_id} not found"}, 404
+
+            # Stock reserved by the cart is claimed first, only the rest is taken from the product stock
+            reserved = ReservationService.claim_for_user(user_id)
+
+            # Report every line that can't be fulfilled instead of failing on the first one
+            oversold = ReservationService.oversell_report(
+                OrderService._requested(cart_lines), OrderService._stock(products), reserved
+            )
+            if oversold:
+                db.session.rollback()
+                return {"message": "Not enough stock available", "oversold": oversold}, 400
+
+            # Adjust stock with one conditional UPDATE per line, sent as a single executemany
+            taken = ReservationService.take_stock({
+                line.product_id: line.quantity - reserved.get(line.product_id, 0) for line in cart_lines
+            })
+            if not taken:
+                # Another checkout took the stock between our read and the update
+                db.session.rollback()
+                return OrderService._stock_conflict(user_id, cart_lines)
 
-            # Create a new order
+            # Reservations for products no longer in the cart go back to stock
+            cart_product_ids = {line.product_id for line in cart_lines}
+            ReservationService.restock({
+                product_id: quantity for product_id, quantity in reserved.items()
+                if product_id not in cart_product_ids
+            })
+
+            # Calculate the total price from the prices loaded above
+            total_price = sum(line.quantity * products[line.product_id].price for line in cart_lines)
+
+            # Create the order and bulk insert its items in the same transaction
             order = Order(user_id=user_id, total=total_price)
             db.session.add(order)
-            db.session.commit()
+            db.session.flush()
+
+            db.session.execute(insert(OrderItem), [{
+                "order_id": order.id,
+                "product_id": line.product_id,
+                "quantity": line.quantity,
+                "price": products[line.product_id].price
+            } for line in cart_lines])
+
+            # Sales rollups behind the admin reports, kept in step with the order
+            AnalyticsService.record_sale(order.order_date.date(), [
+                (line.product_id, line.quantity, products[line.product_id].price) for line in cart_lines
+            ])
+
+            # Post-checkout work (confirmation, ...) is queued in the same transaction and runs after the response
+            outbox.enqueue('order_placed', {"order_id": order.id, "user_id": user_id, "total": total_price},
+                           idempotency_key=f"order_placed:{order.id}")
 
-            # add item on the order
-            for item in cart_items:
-                product = Product.query.get(item.product_id)
-                if product is None:
-                    return {"message": f"Product with ID {item.product_id} not found"}, 404
-
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price=product.price
-                )
-                db.session.add(order_item)
-
-                # Update the stock 
-                product.stock -= item.quantity
-                db.session.add(product)
-
-            # clean the cart
+            # clean the cart and commit everything at once
             Cart.query.filter_by(user_id=user_id).delete()
             db.session.commit()
+            outbox.notify()
 
             return {"message": "Order placed successfully!", "order_id": order.id}, 200
         except Exception as e:
             print(f"Error: {e}")
-            db.session.rollback()  # Rollback if error
+            db.session.rollback()  # Rollback if error, nothing was written
             return {"message": "Failed to place order"}, 500
+
+    @staticmethod
+    def list_orders(user_id, limit=None, after=None, columnar=False):
+        try:
+            limit = parse_limit(limit)
+            cursor = OrderService._decode_cursor(after)
+        except (TypeError, ValueError):
+            return {"message": "Invalid pagination parameters"}, 400
+
+        try:
+            rows = db.session.execute(OrderService._order_summaries(user_id, cursor, limit + 1)).all()
+            return build_page(rows, limit, OrderService._order_summary,
+                              lambda order: (order.order_date.isoformat(), order.id), columnar), 200
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve orders"}, 500
+
+    @staticmethod
+    def stream_orders(user_id, after=None, fmt='ndjson'):
+        # Every order after the cursor, written to the response as it is read
+        try:
+            cursor = OrderService._decode_cursor(after)
+        except (TypeError, ValueError):
+            return {"message": "Invalid pagination parameters"}, 400
+        query = OrderService._order_summaries(user_id, cursor)
+        return stream_response(db.session, query, OrderService._order_summary, fmt), 200
+
+    @staticmethod
+    def get_order(user_id, order_id):
+        try:
+            rows = db.session.execute(OrderService._order_lines(user_id, order_id)).all()
+            return OrderService._order_detail(rows)
+        except Exception as e:
+            print(f"Error: {e}")
+            return {"message": "Failed to retrieve order"}, 500
+
+    @staticmethod
+    def _order_lines(user_id, order_id):
+        # Order, items and product names in a single joined query
+        return select(
+            Order.id, Order.order_date, Order.total,
+            OrderItem.product_id, OrderItem.quantity, OrderItem.price,
+            Product.name.label('product_name')
+        ).join(OrderItem, OrderItem.order_id == Order.id) \
+         .outerjoin(Product, Product.id == OrderItem.product_id) \
+         .where(Order.id == order_id, Order.user_id == user_id) \
+         .order_by(OrderItem.id)
+
+    @staticmethod
+    def _order_detail(rows):
+        if not rows:
+            return {"message": "Order not found"}, 404
+
+        items = [{
+            "product_id": row.product_id,
+            "product_name": row.product_name,
+            "quantity": row.quantity,
+            "price": row.price,
+            "total_price": row.quantity * row.price
+        } for row in rows]
+        return {
+            "order_id": rows[0].id,
+            "order_date": rows[0].order_date.isoformat(),
+            "total": rows[0].total,
+            "item_count": len(items),
+            "units": sum(item["quantity"] for item in items),
+            "items": items
+        }, 200
+
+    @staticmethod
+    def _decode_cursor(after):
+        cursor = decode_cursor(after, size=2)
+        if cursor:
+            cursor = (datetime.fromisoformat(cursor[0]), int(cursor[1]))
+        return cursor
+
+    @staticmethod
+    def _order_summaries(user_id, cursor, limit=None):
+        # Seek the user's orders first (newest first, on the user/date index), then aggregate only those
+        page = select(Order.id, Order.order_date, Order.total) \
+            .where(Order.user_id == user_id) \
+            .order_by(Order.order_date.desc(), Order.id.desc())
+        if cursor:
+            page = page.where(tuple_(Order.order_date, Order.id) < cursor)
+        if limit is not None:
+            page = page.limit(limit)
+        page = page.subquery()
+
+        return select(
+            page.c.id, page.c.order_date, page.c.total,
+            func.count(OrderItem.id).label('item_count'),
+            func.coalesce(func.sum(OrderItem.quantity), 0).label('units')
+        ).outerjoin(OrderItem, OrderItem.order_id == page.c.id) \
+         .group_by(page.c.id, page.c.order_date, page.c.total) \
+         .order_by(page.c.order_date.desc(), page.c.id.desc())
+
+    @staticmethod
+    def _order_summary(order):
+        return {
+            "order_id": order.id,
+            "order_date": order.order_date.isoformat(),
+            "total": order.total,
+            "item_count": order.item_count,
+            "units": order.units
+        }
+
+    @staticmethod
+    def _load_products(cart_lines):
+        product_ids = [line.product_id for line in cart_lines]
+        return {
+            p.id: p for p in db.session.query(Product.id, Product.price, Product.stock)
+            .filter(Product.id.in_(product_ids))
+        }
+
+    @staticmethod
+    def _requested(cart_lines):
+        return {line.product_id: line.quantity for line in cart_lines}
+
+    @staticmethod
+    def _stock(products):
+        return {product_id: product.stock for product_id, product in products.items()}
+
+    @staticmethod
+    def _stock_conflict(user_id, cart_lines):
+        # Re-read stock and reservations after the rollback so the report reflects the winning checkout
+        products = OrderService._load_products(cart_lines)
+        reserved = dict(
+            db.session.query(StockReservation.product_id, StockReservation.quantity)
+            .filter(StockReservation.user_id == user_id)
+            .all()
+        )
+        oversold = ReservationService.oversell_report(
+            OrderService._requested(cart_lines), OrderService._stock(products), reserved
+        )
+        return {"message": "Not enough stock available", "oversold": oversold}, 409
+
+# Runs after checkout commits; safe to repeat, the idempotency key identifies the order
+@outbox.task('order_placed')
+def order_placed(payload, idempotency_key):
+    logger.info("Order %s confirmed for user %s (total %.2f)", payload["order_id"], payload["user_id"], payload["total"])
@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, update
+from app.models import OutboxJob, db
+from app.services.metrics_service import metrics
+
+PENDING, DONE, FAILED = 'pending', 'done', 'failed'
+
+logger = logging.getLogger('app.outbox')
+
+# Registered task handlers: name -> function(payload, idempotency_key)
+_handlers = {}
+
+# Transactional outbox: jobs are inserted in the same transaction as the change that needs them, so
+# they exist exactly when that change is committed. Worker threads run them after the response,
+# retrying with exponential backoff. A claimed job is leased (available_at moves forward), so a job
+# whose worker died runs again once the lease expires.
+class Outbox:
+    def init_app(self, app):
+        app.config.setdefault('OUTBOX_WORKERS', 1)            # background threads per process, 0 disables them
+        app.config.setdefault('OUTBOX_POLL_INTERVAL', 1.0)    # seconds between polls when nothing wakes the workers
+        app.config.setdefault('OUTBOX_BATCH_SIZE', 20)
+        app.config.setdefault('OUTBOX_MAX_ATTEMPTS', 5)
+        app.config.setdefault('OUTBOX_RETRY_BACKOFF', 2.0)    # seconds before the first retry, doubled on each one
+        app.config.setdefault('OUTBOX_LEASE_SECONDS', 60)     # how long a claimed job is hidden from other workers
+        app.extensions['outbox'] = _Workers(app)
+        metrics.add_collector(app, outbox_collector)
+
+    @property
+    def workers(self):
+        return current_app.extensions['outbox']
+
+    def task(self, name):
+        # Registers a handler; it must be idempotent, a retried job runs again with the same idempotency key
+        def register(handler):
+            _handlers[name] = handler
+            return handler
+        return register
+
+    def enqueue(self, task, payload, idempotency_key):
+        # Adds the job to the current transaction, the caller commits
+        job = OutboxJob(task=task, payload=json.dumps(payload), idempotency_key=idempotency_key,
+                        status=PENDING, attempts=0)
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        # Call after committing new jobs so an idle worker picks them up without waiting for the next poll
+        self.workers.wake.set()
+
+    def run_pending(self, limit=None):
+        # Runs the due jobs in the calling thread, returns how many were run
+        config = current_app.config
+        jobs = self._claim(limit or config['OUTBOX_BATCH_SIZE'], config['OUTBOX_LEASE_SECONDS'])
+        for job in jobs:
+            self._run(job, config)
+        return len(jobs)
+
+    def start(self, app):
+        app.extensions['outbox'].start()
+
+    def stop(self, app, timeout=5):
+        app.extensions['outbox'].stop(timeout)
+
+    def stats(self):
+        now = datetime.utcnow()
+        counts = dict(db.session.query(OutboxJob.status, func.count()).group_by(OutboxJob.status).all())
+        oldest = db.session.query(func.min(OutboxJob.created_at)).filter(OutboxJob.status == PENDING).scalar()
+        return {
+            "pending": counts.get(PENDING, 0),
+            "failed": counts.get(FAILED, 0),
+            "lag_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+            **self.workers.counters()
+        }
+
+    def _claim(self, limit, lease_seconds):
+        # A plain SELECT first: an idle poll only reads, it never takes the write lock away from checkouts
+        now = datetime.utcnow()
+        due = db.session.scalars(
+            select(OutboxJob.id)
+            .where(OutboxJob.status == PENDING, OutboxJob.available_at <= now)
+            .order_by(OutboxJob.available_at, OutboxJob.id)
+            .limit(limit)
+        ).all()
+        if not due:
+            db.session.rollback()  # ends the read transaction
+            return []
+
+        # Then one conditional UPDATE ... RETURNING, so concurrent workers never claim the same job
+        jobs = db.session.execute(
+            update(OutboxJob)
+            .where(OutboxJob.id.in_(due), OutboxJob.status == PENDING, OutboxJob.available_at <= now)
+            .values(available_at=now + timedelta(seconds=lease_seconds), attempts=OutboxJob.attempts + 1)
+            .returning(OutboxJob.id, OutboxJob.task, OutboxJob.payload, OutboxJob.idempotency_key, OutboxJob.attempts)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+        return sorted(jobs, key=lambda job: job.id)
+
+    def _run(self, job, config):
+        handler = _handlers.get(job.task)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for task {job.task!r}")
+            handler(json.loads(job.payload), job.idempotency_key)
+
+            # Marked done in the handler's transaction, unless another worker took over after our lease expired
+            finished = self._finish(job, status=DONE, processed_at=datetime.utcnow())
+            if finished:
+                db.session.commit()
+                self.workers.count('processed')
+            else:
+                db.session.rollback()
+            return
+        except Exception as e:
+            print(f"Error: {e}")
+            db.session.rollback()
+            error = f"{type(e).__name__}: {e}"
+
+        if job.attempts >= config['OUTBOX_MAX_ATTEMPTS'] or handler is None:
+            self._finish(job, status=FAILED, processed_at=datetime.utcnow(), last_error=error)
+            self.workers.count('given_up')
+            logger.error("Outbox job %s (%s) failed after %s attempts: %s", job.id, job.task, job.attempts, error)
+        else:
+            delay = config['OUTBOX_RETRY_BACKOFF'] * 2 ** (job.attempts - 1)
+            self._finish(job, available_at=datetime.utcnow() + timedelta(seconds=delay), last_error=error)
+            self.workers.count('retried')
+        db.session.commit()
+
+    def _finish(self, job, **values):
+        result = db.session.execute(
+            update(OutboxJob)
+            .where(OutboxJob.id == job.id, OutboxJob.status == PENDING, OutboxJob.attempts == job.attempts)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+# Worker threads of one process. Only the serving entry points start them (app.py, the server's post_fork
+# hook, the ASGI lifespan), so CLI commands and the pre-fork master never run a poller.
+class _Workers:
+    def __init__(self, app):
+        self.app = app
+        self.wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counters = {"processed": 0, "retried": 0, "given_up": 0}
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid() and any(thread.is_alive() for thread in self._threads):
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._loop, name=f"outbox-worker-{index}", daemon=True)
+                for index in range(self.app.config['OUTBOX_WORKERS'])
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout):
+        self._stopping.set()
+        self.wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def _loop(self):
+        interval = self.app.config['OUTBOX_POLL_INTERVAL']
+        while not self._stopping.is_set():
+            self.wake.clear()
+            ran = 0
+            try:
+                with self.app.app_context():
+                    ran = outbox.run_pending()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Error: {e}")
+            if not ran:
+                # Nothing due: sleep until the next poll or until a checkout wakes us
+                self.wake.wait(interval)
+
+outbox = Outbox()
+
+def outbox_collector():
+    stats = outbox.stats()
+    return [
+        ('outbox_jobs_pending', 'gauge', "Outbox jobs waiting to run", [({}, stats["pending"])]),
+        ('outbox_jobs_failed', 'gauge', "Outbox jobs that ran out of attempts", [({}, stats["failed"])]),
+        ('outbox_lag_seconds', 'gauge', "Age of the oldest pending outbox job", [({}, stats["lag_seconds"])]),
+        ('outbox_jobs_processed_total', 'counter', "Jobs completed by this process", [({}, stats["processed"])]),
+        ('outbox_jobs_retried_total', 'counter', "Failed runs scheduled for a retry", [({}, stats["retried"])]),
+        ('outbox_jobs_failed_total', 'counter', "Jobs given up by this process", [({}, stats["given_up"])])
+    ]
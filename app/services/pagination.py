@@ -0,0 +1,65 @@
+import base64
+import json
+
+# Default and maximum page sizes for keyset-paginated listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    # Missing limit falls back to the default page size
+    if value is None or value == '':
+        return default
+
+    limit = int(value)
+    if limit <= 0:
+        raise ValueError("limit must be a positive integer")
+
+    # Large limits are clamped instead of rejected so clients can't request full-table dumps
+    return min(limit, maximum)
+
+def encode_cursor(*values):
+    # Opaque cursor: the last row's sort key, serialized and base64 encoded
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size=1):
+    # Missing cursor means "start from the beginning"
+    if not token:
+        return None
+
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return tuple(values)
+
+def build_page(rows, limit, serialize, cursor_key, columnar=False):
+    # Queries fetch limit + 1 rows so we know whether another page exists
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(*cursor_key(rows[-1])) if has_more else None
+    return envelope([serialize(row) for row in rows], limit, next_cursor, columnar)
+
+def envelope(items, limit, next_cursor, columnar=False):
+    # Response shape shared by every paginated listing
+    if columnar:
+        # ?format=columnar: the field names once, then each item as an array of values in that order
+        return {
+            "fields": list(items[0]) if items else [],
+            "rows": [list(item.values()) for item in items],
+            "limit": limit,
+            "next_cursor": next_cursor
+        }
+    return {
+        "items": items,
+        "limit": limit,
+        "next_cursor": next_cursor
+    }
+
+def columnar_requested(args):
+    return args.get('format') == 'columnar'
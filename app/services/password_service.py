@@ -0,0 +1,98 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import current_app, jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Raised when too many hashes are already queued; callers answer 503 instead of piling up requests
+class PasswordPoolBusy(Exception):
+    pass
+
+# Runs the CPU-heavy password KDF on a bounded pool instead of the request thread.
+# hashlib releases the GIL while hashing, so a thread pool keeps the other routes responsive;
+# PASSWORD_POOL_KIND=process moves the work to separate processes instead.
+class PasswordHasher:
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')   # any werkzeug method, e.g. pbkdf2:sha256:600000
+        app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_POOL_KIND', 'thread')
+        app.config.setdefault('PASSWORD_POOL_WORKERS', min(4, os.cpu_count() or 1))  # 0 hashes inline
+        app.config.setdefault('PASSWORD_POOL_MAX_PENDING', 4 * max(1, app.config['PASSWORD_POOL_WORKERS']))
+        app.config.setdefault('PASSWORD_POOL_TIMEOUT', 2.0)       # seconds to wait for a free slot
+        app.extensions['password_hasher'] = _HashPool(app.config)
+
+    @property
+    def pool(self):
+        return current_app.extensions['password_hasher']
+
+    def hash(self, password):
+        config = current_app.config
+        return self.pool.run(generate_password_hash, password,
+                             config['PASSWORD_HASH_METHOD'], config['PASSWORD_SALT_LENGTH'])
+
+    def verify(self, stored_hash, password):
+        return self.pool.run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        # Hashes created with other parameters (older method or iteration count) get upgraded on login
+        return stored_hash.split('$', 1)[0] != self.pool.method_prefix()
+
+    def stats(self):
+        return self.pool.stats()
+
+class _HashPool:
+    def __init__(self, config):
+        self.method = config['PASSWORD_HASH_METHOD']
+        self.kind = config['PASSWORD_POOL_KIND']
+        self.workers = config['PASSWORD_POOL_WORKERS']
+        self.timeout = config['PASSWORD_POOL_TIMEOUT']
+        self.max_pending = config['PASSWORD_POOL_MAX_PENDING']
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None   # created on first use, so forked workers never inherit it
+        self._prefix = None
+        self.pending = 0
+        self.rejected = 0
+
+    def run(self, function, *args):
+        if self.workers <= 0:
+            return function(*args)
+
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy()
+        try:
+            with self._lock:
+                self.pending += 1
+            return self._get_executor().submit(function, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+    def method_prefix(self):
+        # Werkzeug fills in default parameters (e.g. pbkdf2:sha256 -> pbkdf2:sha256:1000000), so ask it once
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._prefix
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "pending": self.pending,
+                    "max_pending": self.max_pending, "rejected": self.rejected}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                executor_class = ProcessPoolExecutor if self.kind == 'process' else ThreadPoolExecutor
+                self._executor = executor_class(max_workers=self.workers)
+            return self._executor
+
+passwords = PasswordHasher()
+
+def busy_response():
+    response = jsonify({"message": "Server is busy, please retry"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
@@ -0,0 +1,93 @@
+from flask import current_app
+from app.services.cache import LRUCache, RedisCache
+
+# Read-through cache for catalog data.
+#
+#   product:<id>                       static product fields, dropped precisely on edit/delete
+#   ids:<generation>:<after>:<limit>   product IDs of a catalog page, a new generation on add/delete
+#   stock:<generation>:<after>:<limit> stock of a catalog page, kept only for a few seconds since carts change it
+#   catalog_state                      catalog version and last write time, dropped on every write
+class ProductCache:
+    def init_app(self, app):
+        app.config.setdefault('PRODUCT_CACHE_BACKEND', 'memory')
+        app.config.setdefault('PRODUCT_CACHE_MAXSIZE', 10000)
+        app.config.setdefault('PRODUCT_CACHE_TTL', 300)
+        app.config.setdefault('PRODUCT_CACHE_STOCK_TTL', 2)
+        app.config.setdefault('PRODUCT_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        if app.config['PRODUCT_CACHE_BACKEND'] == 'redis':
+            backend = RedisCache.from_url(
+                app.config['PRODUCT_CACHE_REDIS_URL'], prefix='products:', ttl=app.config['PRODUCT_CACHE_TTL']
+            )
+        else:
+            backend = LRUCache(maxsize=app.config['PRODUCT_CACHE_MAXSIZE'], ttl=app.config['PRODUCT_CACHE_TTL'])
+        app.extensions['product_cache'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions['product_cache']
+
+    def get_products(self, product_ids, loader):
+        # Returns {id: product} for the given IDs, loading only the misses (with one call to loader)
+        keys = {product_id: f"product:{product_id}" for product_id in product_ids}
+        cached = self.backend.get_many(keys.values())
+        products = {product_id: cached[key] for product_id, key in keys.items() if key in cached}
+
+        missing = [product_id for product_id in product_ids if product_id not in products]
+        if missing:
+            loaded = loader(missing)
+            self.backend.set_many({f"product:{product['id']}": product for product in loaded})
+            products.update((product['id'], product) for product in loaded)
+        return products
+
+    def get_page_ids(self, last_id, limit, loader):
+        # Returns (ids, has_more) for the catalog page that starts after last_id
+        key = f"ids:{self.generation()}:{last_id}:{limit}"
+        page = self.backend.get(key)
+        if page is None:
+            ids, has_more = loader(last_id, limit)
+            page = {"ids": ids, "has_more": has_more}
+            self.backend.set(key, page)
+        return page["ids"], page["has_more"]
+
+    def get_page_stock(self, last_id, limit, ids, loader):
+        # Returns the stock of each ID on the page, in the same order
+        key = f"stock:{self.generation()}:{last_id}:{limit}"
+        stock = self.backend.get(key)
+        if stock is None or len(stock) != len(ids):
+            stock = loader(ids)
+            self.backend.set(key, stock, ttl=current_app.config['PRODUCT_CACHE_STOCK_TTL'])
+        return stock
+
+    def get_catalog_state(self, loader):
+        # Catalog version and last modification time, so conditional requests can be answered without queries
+        state = self.backend.get('catalog_state')
+        if state is None:
+            state = loader()
+            self.backend.set('catalog_state', state)
+        return state
+
+    def generation(self):
+        return self.backend.counter('generation')
+
+    def invalidate_product(self, product_id):
+        # Product fields changed, pages still hold the same IDs
+        self.backend.delete(f"product:{product_id}", 'catalog_state')
+
+    def invalidate_products(self, product_ids):
+        # Bulk imports drop every product they touched with one delete
+        self.backend.delete(*[f"product:{product_id}" for product_id in product_ids], 'catalog_state')
+
+    def invalidate_catalog(self, product_id=None):
+        # The set of products changed (add/delete), start a new page generation
+        self.backend.delete('catalog_state')
+        if product_id is not None:
+            self.invalidate_product(product_id)
+        self.backend.incr('generation')
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats["generation"] = self.generation()
+        return stats
+
+product_cache = ProductCache()
@@ -1,38 +1,34 @@
-from flask import jsonify
-from app.models import Product, db
+import json
+import math
+import zlib
+from datetime import datetime, timezone
 
-def add_product(data):
-    name = data.get('name').lower()  # Convert product name to lowercase to avoid case conflicts
-    description = data.get('description')
-    price = data.get('price')
-    stock = data.get('stock')
+from flask import current_app, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
+from app.models import CatalogState, Product, db
+from app.services.sql_helpers import upsert
+from app.services.pagination import parse_limit, encode_cursor, decode_cursor, envelope, columnar_requested
+from app.services.compression_service import etag_variants
+from app.services.product_cache import product_cache
+from app.services.streaming import stream_format, stream_response
 
-    # Missing values output
-    if not name or price is None or stock is None:
-        return jsonify({"message": "Name, price, and stock are required"}), 400
+def add_product(data):
+    values, error = validate_product(data)
+    if error:
+        return jsonify({"message": error}), 400
 
     # Check if product already exists
-    existing_product = Product.query.filter_by(name=name).first()
+    existing_product = Product.query.filter_by(name=values['name']).first()
     if existing_product:
         return jsonify({"message": "Product with this name already exists"}), 400
-    
-    # Validate price and stock are numeric
-    try:
-        price = float(price)
-        stock = int(stock)
-    except ValueError:
-        return jsonify({"message": "Price and stock must be numeric values"}), 400
-
-    # Validate price and stock are not negative
-    if price < 0:
-        return jsonify({"message": "Price cannot be negative"}), 400
-    if stock < 0:
-        return jsonify({"message": "Stock cannot be negative"}), 400
 
     try:
-        new_product = Product(name=name, description=description, price=price, stock=stock)
+        new_product = Product(**values)
         db.session.add(new_product)
+        bump_catalog_version()
         db.session.commit()
+        product_cache.invalidate_catalog()
         return jsonify({"message": "Product added successfully!"}), 201
     except Exception as e:
         print(f"Error: {e}")
@@ -41,10 +37,6 @@ def add_product(data):
 
 def edit_product(data):
     product_id = data.get('product_id')
-    name = data.get('name').lower() if data.get('name') else None  # Convert name to lowercase to avoid case conflicts
-    description = data.get('description')
-    price = data.get('price')
-    stock = data.get('stock')
 
     if not product_id:
         return jsonify({"message": "Product ID is required"}), 400
@@ -52,40 +44,29 @@ def edit_product(data):
     product = Product.query.get(product_id)
     if not product:
         return jsonify({"message": "Product not found"}), 404
+    product_id = product.id
 
-    if not name and price is None and stock is None:
-        return jsonify({"message": "At least one field (name, price, or stock) must be provided for update"}), 400
+    values, error = validate_product(data, partial=True)
+    if error:
+        return jsonify({"message": error}), 400
 
-    if name:
-        existing_product = Product.query.filter_by(name=name).first()
+    if 'name' in values:
+        existing_product = Product.query.filter_by(name=values['name']).first()
         if existing_product and existing_product.id != product_id:
             return jsonify({"message": "Product with this name already exists"}), 400
 
-    try:
-        if price is not None:
-            price = float(price)
-        if stock is not None:
-            stock = int(stock)
-    except ValueError:
-        return jsonify({"message": "Price and stock must be numeric values"}), 400
-
-    if price is not None and price < 0:
-        return jsonify({"message": "Price cannot be negative"}), 400
-    if stock is not None and stock < 0:
-        return jsonify({"message": "Stock cannot be negative"}), 400
-
-    if name is not None:
-        product.name = name
-    if description is not None:
-        product.description = description
-    if price is not None:
-        product.price = price
-    if stock is not None:
-        product.stock = stock
+    for field, value in values.items():
+        setattr(product, field, value)
 
     try:
+        bump_catalog_version()
         db.session.commit()
+        product_cache.invalidate_product(product_id)
         return jsonify({"message": "Product updated successfully!"}), 200
+    except StaleDataError:
+        # The product (e.g. its stock) changed while we were editing it
+        db.session.rollback()
+        return jsonify({"message": "Product was modified by another request, please retry"}), 409
     except Exception as e:
         print(f"Error: {e}")
         db.session.rollback()
@@ -95,36 +76,191 @@ def delete_product(product_id):
     product = Product.query.get(product_id)
     if not product:
         return jsonify({"message": "Product not found"}), 404
+    product_id = product.id
 
     try:
         db.session.delete(product)
+        bump_catalog_version()
         db.session.commit()
+        product_cache.invalidate_catalog(product_id)
         return jsonify({"message": "Product deleted successfully!"}), 200
     except Exception as e:
         print(f"Error: {e}")
         db.session.rollback()
         return jsonify({"message": "Failed to delete product"}), 500
 
-def list_products():
+def validate_product(data, partial=False):
+    # Rules shared by add, edit and bulk import. Returns (values, error message);
+    # with partial=True only the fields present are validated and returned.
+    name = data.get('name')
+    description = data.get('description')
+    price = data.get('price')
+    stock = data.get('stock')
+
+    if name is not None and not isinstance(name, str):
+        return None, "Name must be a string"
+    name = name.lower() if name else None  # Convert product name to lowercase to avoid case conflicts
+
+    # Missing values output
+    if partial and not name and price is None and stock is None:
+        return None, "At least one field (name, price, or stock) must be provided for update"
+    if not partial and (not name or price is None or stock is None):
+        return None, "Name, price, and stock are required"
+
+    # Validate price and stock are numeric
     try:
-        products = Product.query.all()
-        if not products:
-            return jsonify({"message": "No products available"}), 404
+        if price is not None:
+            price = float(price)
+            if not math.isfinite(price):
+                raise ValueError(price)
+        if stock is not None:
+            stock = int(stock)
+    except (TypeError, ValueError):
+        return None, "Price and stock must be numeric values"
 
-        product_list = [{"name": p.name, "stock": p.stock} for p in products]
-        return jsonify(product_list), 200
-    except Exception as e:
-        print(f"Error: {e}")
-        return jsonify({"message": "Failed to retrieve products"}), 500
+    # Validate price and stock are not negative
+    if price is not None and price < 0:
+        return None, "Price cannot be negative"
+    if stock is not None and stock < 0:
+        return None, "Stock cannot be negative"
+
+    values = {"name": name, "description": description, "price": price, "stock": stock}
+    if partial:
+        values = {field: value for field, value in values.items() if value is not None}
+    return values, None
+
+def bump_catalog_version():
+    # Called inside the transaction of every catalog write, so the version changes exactly when the catalog does
+    statement = upsert(CatalogState, ['id'], {
+        'version': lambda excluded: CatalogState.__table__.c.version + 1,
+        'updated_at': lambda excluded: excluded.updated_at
+    })
+    db.session.execute(statement.values(id=1, version=1, updated_at=datetime.utcnow()))
+
+def catalog_state(row):
+    if row is None:
+        return {"version": 0, "updated_at": None}
+    return {"version": row.version, "updated_at": row.updated_at.isoformat()}
+
+def _load_catalog_state():
+    return catalog_state(db.session.get(CatalogState, 1))
+
+# Validators of a catalog page, shared with the ASGI mode so both send (and revalidate) the same ETags
+def page_etag(kind, state, last_id, limit, columnar=False):
+    return f"{kind}-{state['version']}-{last_id or 0}-{limit}" + ('-columnar' if columnar else '')
+
+def stock_etag(etag, stock):
+    # Stock changes with every cart, so list pages also hash the stock they show
+    return f"{etag}-{zlib.crc32(json.dumps(stock).encode()):08x}"
+
+def catalog_last_modified(state):
+    if not state["updated_at"]:
+        return None
+    return datetime.fromisoformat(state["updated_at"]).replace(tzinfo=timezone.utc)
+
+def _not_modified(etag, last_modified):
+    # Answers a conditional request before any product row is read or any JSON is built
+    if request.if_none_match:
+        # A client that got the page compressed holds that representation's ETag (<etag>-gzip)
+        matched = next((variant for variant in etag_variants(etag) if request.if_none_match.contains(variant)), None)
+        if matched:
+            etag = matched
+    else:
+        matched = bool(last_modified and request.if_modified_since and
+                       request.if_modified_since >= last_modified.replace(microsecond=0))
+    if not matched:
+        return None
+
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+def _load_page_ids(last_id, limit):
+    # Keyset (seek) pagination on the primary key, fetching one extra ID to know if there is a next page
+    query = db.session.query(Product.id)
+    if last_id is not None:
+        query = query.filter(Product.id > last_id)
+    ids = [row.id for row in query.order_by(Product.id).limit(limit + 1)]
+    return ids[:limit], len(ids) > limit
+
+def _load_products(product_ids):
+    rows = db.session.query(Product.id, Product.name, Product.description, Product.price) \
+        .filter(Product.id.in_(product_ids))
+    return [{"id": p.id, "name": p.name, "description": p.description, "price": p.price} for p in rows]
+
+def _load_stock(product_ids):
+    stock = dict(db.session.query(Product.id, Product.stock).filter(Product.id.in_(product_ids)).all())
+    return [stock.get(product_id, 0) for product_id in product_ids]
+
+def _product_page(kind, serialize, limit, after, with_stock=False):
+    try:
+        limit = parse_limit(limit)
+        cursor = decode_cursor(after)
+        last_id = int(cursor[0]) if cursor else None
+    except (TypeError, ValueError):
+        return jsonify({"message": "Invalid pagination parameters"}), 400
+
+    # Streamed listings read every product after the cursor straight from the database
+    fmt = stream_format()
+    if fmt:
+        query = select(Product.id, Product.name, Product.description, Product.price, Product.stock).order_by(Product.id)
+        if last_id is not None:
+            query = query.where(Product.id > last_id)
+        return stream_response(db.session, query, lambda row: serialize(row._mapping, row.stock), fmt)
 
-def details_products():
     try:
-        products = Product.query.all()
-        if not products:
+        # Details pages only change with the catalog version, so that is all we need for their ETag
+        state = product_cache.get_catalog_state(_load_catalog_state)
+        last_modified = None if with_stock else catalog_last_modified(state)
+        columnar = columnar_requested(request.args)
+        etag = page_etag(kind, state, last_id, limit, columnar)
+        if not with_stock:
+            not_modified = _not_modified(etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+        # Page IDs, product fields and stock all come from the cache when it is warm
+        ids, has_more = product_cache.get_page_ids(last_id, limit, _load_page_ids)
+        if not ids and last_id is None:
             return jsonify({"message": "No products available"}), 404
 
-        product_list = [{"name": p.name, "description": p.description, "price": p.price} for p in products]
-        return jsonify(product_list), 200
+        stock = None
+        if with_stock:
+            stock = product_cache.get_page_stock(last_id, limit, ids, _load_stock)
+            etag = stock_etag(etag, stock)
+            not_modified = _not_modified(etag, None)
+            if not_modified is not None:
+                return not_modified
+
+        products = product_cache.get_products(ids, _load_products)
+        items = [
+            serialize(products[product_id], stock[index] if with_stock else None)
+            for index, product_id in enumerate(ids) if product_id in products
+        ]
+        next_cursor = encode_cursor(ids[-1]) if has_more else None
+
+        response = jsonify(envelope(items, limit, next_cursor, columnar))
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        return response, 200
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"message": "Failed to retrieve products"}), 500
+
+def list_item(p, stock):
+    return {"id": p["id"], "name": p["name"], "stock": stock}
+
+def details_item(p, stock):
+    return {"id": p["id"], "name": p["name"], "description": p["description"], "price": p["price"]}
+
+def list_products(limit=None, after=None):
+    return _product_page('list', list_item, limit, after, with_stock=True)
+
+def details_products(limit=None, after=None):
+    return _product_page('details', details_item, limit, after)
+
+def cache_stats():
+    return jsonify(product_cache.stats()), 200
@@ -0,0 +1,206 @@
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, jsonify, request, session
+from app.services.metrics_service import metrics
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# capacity requests in a burst, refilled at rate tokens per second; target is the blueprint or endpoint
+Limit = namedtuple('Limit', 'target capacity rate')
+
+# Token-bucket rate limits, configured per blueprint (cart) or per endpoint (user_bp.login), the endpoint
+# winning. RATE_LIMITS apply to each client (the logged-in user, or the IP address when logged out),
+# RATE_LIMITS_GLOBAL to all clients of the endpoint together. A request over the limit gets a 429 with
+# Retry-After before the view runs. Endpoints without a limit cost one dict lookup.
+class RateLimiter:
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMITS', '')
+        app.config.setdefault('RATE_LIMITS_GLOBAL', '')
+        app.config.setdefault('RATE_LIMIT_BACKEND', 'memory')         # memory (per process) or redis (shared)
+        app.config.setdefault('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('RATE_LIMIT_SHARDS', 16)                # independent locks of the memory buckets
+        app.config.setdefault('RATE_LIMIT_MAXSIZE', 100000)           # buckets kept in memory, least recently used go first
+
+        if app.config['RATE_LIMIT_BACKEND'] == 'redis':
+            buckets = RedisBuckets.from_url(app.config['RATE_LIMIT_REDIS_URL'])
+        else:
+            buckets = MemoryBuckets(shards=app.config['RATE_LIMIT_SHARDS'], maxsize=app.config['RATE_LIMIT_MAXSIZE'])
+        app.extensions['rate_limiter'] = _Limits(
+            buckets, parse_limits(app.config['RATE_LIMITS']), parse_limits(app.config['RATE_LIMITS_GLOBAL'])
+        )
+
+        if app.config['RATE_LIMIT_ENABLED']:
+            app.before_request(self._before_request)
+        metrics.add_collector(app, rate_limit_collector)
+
+    @property
+    def limits(self):
+        return current_app.extensions['rate_limiter']
+
+    def retry_after(self, limits, endpoint, identify):
+        # Takes a token from every bucket the endpoint has; None when the request may run, else the seconds
+        # until it could. identify() names the client, it is only called for endpoints with a per-client limit.
+        per_client, overall = limits.for_endpoint(endpoint)
+        if per_client is not None:
+            wait = limits.buckets.take(f"{per_client.target}:{identify()}", per_client.capacity, per_client.rate)
+            if wait > 0:
+                return limits.rejected(per_client.target, wait)
+        if overall is not None:
+            wait = limits.buckets.take(f"{overall.target}:*", overall.capacity, overall.rate)
+            if wait > 0:
+                return limits.rejected(overall.target, wait)
+        return None
+
+    def _before_request(self):
+        if request.endpoint is None:
+            return None
+        wait = self.retry_after(self.limits, request.endpoint, client_identity)
+        if wait is not None:
+            return too_many_requests(wait)
+
+rate_limiter = RateLimiter()
+
+def client_identity():
+    user_id = session.get('user_id')
+    return f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+
+def too_many_requests(wait):
+    response = jsonify({"message": "Too many requests, please retry later"})
+    response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response, 429
+
+def parse_limits(text):
+    # "cart=120/minute, user_bp.login=10/minute" -> {target: Limit}
+    limits = {}
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        target, _, spec = item.partition('=')
+        count, _, unit = spec.partition('/')
+        try:
+            count, period = int(count), PERIODS[unit.strip()]
+            if count < 1:
+                raise ValueError(count)
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid rate limit {item!r}, expected target=N/second|minute|hour|day")
+        limits[target.strip()] = Limit(target.strip(), count, count / period)
+    return limits
+
+# Configured limits of one app, resolved once per endpoint, and the rejection counters
+class _Limits:
+    def __init__(self, buckets, per_client, overall):
+        self.buckets = buckets
+        self.per_client = per_client
+        self.overall = overall
+        self._endpoints = {}   # endpoint -> (per-client limit, global limit)
+        self._lock = threading.Lock()
+        self._rejected = {}    # target -> requests turned away
+
+    def for_endpoint(self, endpoint):
+        found = self._endpoints.get(endpoint)
+        if found is None:
+            blueprint = endpoint.rpartition('.')[0]
+            found = self._endpoints[endpoint] = (
+                self.per_client.get(endpoint) or self.per_client.get(blueprint),
+                self.overall.get(endpoint) or self.overall.get(blueprint)
+            )
+        return found
+
+    def rejected(self, target, wait):
+        with self._lock:
+            self._rejected[target] = self._rejected.get(target, 0) + 1
+        return wait
+
+    def rejections(self):
+        with self._lock:
+            return dict(self._rejected)
+
+# In-process buckets, split into shards with a lock each so concurrent requests rarely wait on one another.
+# Every shard is an LRU; evicting a bucket refills it, so maxsize must cover the clients active in a period.
+class MemoryBuckets:
+    def __init__(self, shards=16, maxsize=100000):
+        self._shards = [_Shard(max(1, maxsize // shards)) for _ in range(shards)]
+
+    def take(self, key, capacity, rate):
+        # Returns 0 when a token was taken, else the seconds until one is available
+        return self._shards[hash(key) % len(self._shards)].take(key, capacity, rate, time.monotonic())
+
+    def stats(self):
+        return {"backend": "memory", "buckets": sum(len(shard.buckets) for shard in self._shards)}
+
+class _Shard:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()   # key -> [tokens, updated_at], least recently used first
+
+    def take(self, key, capacity, rate, now):
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [capacity, now]
+                if len(self.buckets) > self.maxsize:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+# Buckets shared by every process, in Redis. Refill and take run in one script on the server clock,
+# so concurrent requests from several workers can't both take the last token.
+class RedisBuckets:
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = capacity
+if bucket[1] then
+    tokens = math.min(capacity, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+end
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for the redis rate limit backend")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def take(self, key, capacity, rate):
+        return float(self._script(keys=[self.prefix + key], args=[capacity, rate]))
+
+    def stats(self):
+        return {"backend": "redis"}
+
+def rate_limit_collector():
+    limits = rate_limiter.limits
+    families = [('rate_limit_rejected_total', 'counter', "Requests turned away with a 429, by limit", [
+        ({"limit": target}, count) for target, count in sorted(limits.rejections().items())
+    ])]
+    buckets = limits.buckets.stats().get('buckets')
+    if buckets is not None:
+        families.append(('rate_limit_buckets', 'gauge', "Token buckets held in memory", [({}, buckets)]))
+    return families
@@ -0,0 +1,169 @@
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam, delete, update
+from app.models import Product, StockReservation, db
+from app.services.sql_helpers import upsert
+
+# Outcomes of a stock decrement
+RESERVED = 'reserved'
+NOT_FOUND = 'not_found'
+INSUFFICIENT_STOCK = 'insufficient_stock'
+CONFLICT = 'conflict'
+
+# Compare-and-swap attempts before giving up on a heavily contended product
+MAX_CAS_RETRIES = 8
+
+products = Product.__table__
+reservations = StockReservation.__table__
+
+class ReservationService:
+    _last_sweep = 0.0
+
+    @staticmethod
+    def decrement_stock(product_id, quantity, retries=MAX_CAS_RETRIES):
+        for attempt in range(retries):
+            row = db.session.query(Product.stock, Product.version).filter(Product.id == product_id).first()
+            if row is None:
+                return NOT_FOUND
+            if row.stock < quantity:
+                return INSUFFICIENT_STOCK
+
+            # Only succeeds if nobody changed the product since we read it
+            result = db.session.execute(
+                update(products)
+                .where(products.c.id == product_id, products.c.version == row.version)
+                .values(stock=products.c.stock - quantity, version=products.c.version + 1)
+            )
+            if result.rowcount == 1:
+                return RESERVED
+
+            # Lost the race, back off briefly before re-reading the stock
+            time.sleep(random.uniform(0, 0.002 * (attempt + 1)))
+        return CONFLICT
+
+    @staticmethod
+    def reserve(user_id, product_id, quantity):
+        # Moves quantity out of the product stock into the user's reservation (caller commits)
+        status = ReservationService.decrement_stock(product_id, quantity)
+        if status != RESERVED:
+            return status
+
+        ttl = current_app.config['RESERVATION_TTL_SECONDS']
+        statement = upsert(StockReservation, ['user_id', 'product_id'], {
+            'quantity': lambda excluded: reservations.c.quantity + excluded.quantity,
+            'expires_at': lambda excluded: excluded.expires_at
+        })
+        db.session.execute(statement.values(
+            user_id=user_id,
+            product_id=product_id,
+            quantity=quantity,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+        ))
+        return RESERVED
+
+    @staticmethod
+    def oversell_report(requested, stock, reserved):
+        # Lines whose requested quantity exceeds the free stock plus what the user already holds
+        report = []
+        for product_id, quantity in requested.items():
+            available = stock.get(product_id, 0) + reserved.get(product_id, 0)
+            if product_id not in stock or available < quantity:
+                report.append({"product_id": product_id, "requested": quantity, "available": available})
+        return report
+
+    @staticmethod
+    def take_stock(quantities):
+        # Conditional UPDATE ... WHERE stock >= qty for every product, sent as a single executemany.
+        # Negative quantities give stock back. Returns False if any product lacked stock (caller rolls back).
+        if not quantities:
+            return True
+        statement = update(products) \
+            .where(products.c.id == bindparam('pid'), products.c.stock >= bindparam('qty')) \
+            .values(stock=products.c.stock - bindparam('qty'), version=products.c.version + 1)
+        rows = [{"pid": product_id, "qty": quantity} for product_id, quantity in quantities.items()]
+
+        # The summed rowcount of an executemany is only reliable on some drivers; elsewhere check each row
+        if db.session.get_bind().dialect.supports_sane_multi_rowcount:
+            return db.session.execute(statement, rows).rowcount == len(rows)
+        return all(db.session.execute(statement, row).rowcount == 1 for row in rows)
+
+    @staticmethod
+    def hold(user_id, quantities):
+        # Sets the user's reservation of each product to exactly the given quantity, 0 removes it (caller commits)
+        expires_at = datetime.utcnow() + timedelta(seconds=current_app.config['RESERVATION_TTL_SECONDS'])
+        kept = [{
+            "user_id": user_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at
+        } for product_id, quantity in quantities.items() if quantity > 0]
+        dropped = [product_id for product_id, quantity in quantities.items() if quantity <= 0]
+
+        if kept:
+            db.session.execute(upsert(StockReservation, ['user_id', 'product_id'], {
+                'quantity': lambda excluded: excluded.quantity,
+                'expires_at': lambda excluded: excluded.expires_at
+            }), kept)
+        if dropped:
+            db.session.execute(
+                delete(reservations)
+                .where(reservations.c.user_id == user_id, reservations.c.product_id.in_(dropped))
+            )
+
+    @staticmethod
+    def claim_for_user(user_id):
+        # Removes every reservation of the user and returns {product_id: quantity}.
+        # Expired rows that haven't been swept yet still hold stock, so they are claimed too.
+        rows = db.session.execute(
+            delete(reservations)
+            .where(reservations.c.user_id == user_id)
+            .returning(reservations.c.product_id, reservations.c.quantity)
+        ).all()
+
+        claimed = defaultdict(int)
+        for product_id, quantity in rows:
+            claimed[product_id] += quantity
+        return dict(claimed)
+
+    @staticmethod
+    def release_for_user(user_id):
+        # Gives all of the user's reserved stock back (caller commits)
+        ReservationService.restock(ReservationService.claim_for_user(user_id))
+
+    @staticmethod
+    def release_expired(now=None):
+        # DELETE ... RETURNING claims each expired row exactly once, even with concurrent sweepers
+        rows = db.session.execute(
+            delete(reservations)
+            .where(reservations.c.expires_at <= (now or datetime.utcnow()))
+            .returning(reservations.c.product_id, reservations.c.quantity)
+        ).all()
+
+        released = defaultdict(int)
+        for product_id, quantity in rows:
+            released[product_id] += quantity
+        ReservationService.restock(released)
+        db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def sweep_if_due():
+        # Expired reservations are swept at most once per interval per process
+        interval = current_app.config['RESERVATION_SWEEP_INTERVAL']
+        now = time.monotonic()
+        if now - ReservationService._last_sweep < interval:
+            return 0
+        ReservationService._last_sweep = now
+        return ReservationService.release_expired()
+
+    @staticmethod
+    def restock(quantities):
+        if not quantities:
+            return
+        db.session.execute(
+            update(products)
+            .where(products.c.id == bindparam('pid'))
+            .values(stock=products.c.stock + bindparam('qty'), version=products.c.version + 1),
+            [{"pid": product_id, "qty": quantity} for product_id, quantity in quantities.items()]
+        )
@@ -0,0 +1,98 @@
+import re
+
+from flask import current_app, jsonify
+from sqlalchemy import and_, column, func, inspect, literal_column, or_, select, table, tuple_
+from app.models import Product, db
+from app.services.pagination import parse_limit, decode_cursor, build_page, columnar_requested
+
+# Name matches weigh more than description matches in the bm25 ranking
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_TERMS = 8
+
+# FTS5 index created by migration m0005 (SQLite only)
+products_fts = table('products_fts', column('rowid'))
+_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def parse_terms(query):
+    # Words of the query, lowercased; every one must match, the last as a prefix of a word
+    return [term.lower() for term in _TERM_PATTERN.findall(query or '')][:MAX_TERMS]
+
+def fts_available():
+    # Checked once per app, the index only exists on SQLite builds with FTS5
+    if 'products_fts' not in current_app.extensions:
+        current_app.extensions['products_fts'] = inspect(db.engine).has_table('products_fts')
+    return current_app.extensions['products_fts']
+
+def _match_expression(terms):
+    # Terms are quoted so FTS5 operators in the input are literal text; the last one is still being typed
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def _filters(min_price, max_price, min_stock):
+    conditions = []
+    if min_price is not None:
+        conditions.append(Product.price >= min_price)
+    if max_price is not None:
+        conditions.append(Product.price <= max_price)
+    if min_stock is not None:
+        conditions.append(Product.stock >= min_stock)
+    return conditions
+
+def _fts_query(terms, conditions, cursor, limit):
+    score = func.bm25(literal_column('products_fts'), NAME_WEIGHT, DESCRIPTION_WEIGHT).label('score')
+    query = select(Product.id, Product.name, Product.description, Product.price, Product.stock, score) \
+        .select_from(products_fts) \
+        .join(Product, Product.id == products_fts.c.rowid) \
+        .where(literal_column('products_fts').match(_match_expression(terms)), *conditions)
+    if cursor:
+        query = query.where(tuple_(score, Product.id) > cursor)
+    # bm25 scores are negative, lower is a better match
+    return query.order_by(score, Product.id).limit(limit + 1)
+
+def _like_query(terms, conditions, cursor, limit):
+    # Fallback without a full-text index: every term appears in the name or description, ordered by ID
+    for term in terms:
+        pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append(or_(Product.name.ilike(pattern, escape='\\'),
+                              Product.description.ilike(pattern, escape='\\')))
+    query = select(Product.id, Product.name, Product.description, Product.price, Product.stock,
+                   literal_column('0.0').label('score')) \
+        .where(and_(*conditions))
+    if cursor:
+        query = query.where(Product.id > cursor[1])
+    return query.order_by(Product.id).limit(limit + 1)
+
+def search_products(params):
+    terms = parse_terms(params.get('q'))
+    if not terms:
+        return jsonify({"message": "Search query (q) is required"}), 400
+
+    try:
+        limit = parse_limit(params.get('limit'))
+        cursor = decode_cursor(params.get('after'), size=2)
+        if cursor:
+            cursor = (float(cursor[0]), int(cursor[1]))
+        min_price = float(params['min_price']) if params.get('min_price') else None
+        max_price = float(params['max_price']) if params.get('max_price') else None
+        min_stock = int(params['min_stock']) if params.get('min_stock') else None
+    except (TypeError, ValueError):
+        return jsonify({"message": "Invalid search parameters"}), 400
+
+    try:
+        conditions = _filters(min_price, max_price, min_stock)
+        build = _fts_query if fts_available() else _like_query
+        rows = db.session.execute(build(terms, conditions, cursor, limit)).all()
+
+        # Pages continue from the (score, id) of the last row
+        return jsonify(build_page(rows, limit, lambda p: {
+            "id": p.id,
+            "name": p.name,
+            "description": p.description,
+            "price": p.price,
+            "stock": p.stock
+        }, lambda p: (p.score, p.id), columnar_requested(params))), 200
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"message": "Failed to search products"}), 500
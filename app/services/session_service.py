@@ -0,0 +1,258 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+from sqlalchemy import delete, insert, select, update
+from app.models import UserSession, db
+
+# Server-side sessions (SESSION_BACKEND=memory or sql). The cookie carries only a random session ID and the
+# contents stay on the server: a request costs one store lookup instead of verifying and decoding a signed
+# cookie, the cookie is only sent again when the ID changes, and all the sessions of a user can be ended at
+# once. Sessions expire after SESSION_TTL idle seconds; the expiry is pushed forward at most once per half
+# TTL, so requests that only read the session don't rewrite it.
+# SESSION_BACKEND=cookie (the default) keeps Flask's signed cookie sessions.
+class ServerSessions:
+    def init_app(self, app):
+        app.config.setdefault('SESSION_BACKEND', 'cookie')
+        app.config.setdefault('SESSION_TTL', 7 * 24 * 3600)      # idle seconds before a session expires
+        app.config.setdefault('SESSION_MAXSIZE', 100000)         # sessions kept by the memory store (LRU)
+        app.config.setdefault('SESSION_PURGE_INTERVAL', 300)     # seconds between purges of expired sql sessions
+
+        backend = app.config['SESSION_BACKEND']
+        if backend == 'memory':
+            store = MemorySessionStore(maxsize=app.config['SESSION_MAXSIZE'], ttl=app.config['SESSION_TTL'])
+        elif backend == 'sql':
+            store = SqlSessionStore(ttl=app.config['SESSION_TTL'], purge_interval=app.config['SESSION_PURGE_INTERVAL'])
+        elif backend == 'cookie':
+            store = None
+        else:
+            raise ValueError(f"Unknown SESSION_BACKEND {backend!r}, expected cookie, memory or sql")
+
+        app.extensions['sessions'] = store
+        if store is not None:
+            app.session_interface = ServerSessionInterface(store)
+
+    @property
+    def store(self):
+        return current_app.extensions['sessions']
+
+    def revoke_user(self, user_id, keep_current=True):
+        # Ends every session of the user (other devices), except the one making the request when keep_current.
+        # Returns how many were ended, or None with cookie sessions, which can't be ended on the server.
+        if self.store is None:
+            return None
+        keep = getattr(session, 'sid', None) if keep_current else None
+        return self.store.revoke_user(user_id, keep)
+
+sessions = ServerSessions()
+
+def new_session_id():
+    # 192 random bits, 32 characters in the cookie
+    return secrets.token_urlsafe(24)
+
+# A session dict that knows its ID and the user it was loaded for
+class ServerSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, refresh=False, stale=False):
+        super().__init__(initial)
+        self.sid = sid
+        self.loaded_user_id = (initial or {}).get('user_id')
+        self.refresh = refresh   # the expiry is due to be pushed forward
+        self.stale = stale       # the cookie named an unknown, expired or revoked session
+
+class ServerSessionInterface(SessionInterface):
+    session_class = ServerSession
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            found = self.store.load(sid) if len(sid) <= 64 else None
+            if found is not None:
+                data, seconds_left = found
+                return self.session_class(data, sid=sid, refresh=seconds_left < self.store.ttl / 2)
+        return self.session_class(stale=bool(sid))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        cookie = {
+            "domain": self.get_cookie_domain(app),
+            "path": self.get_cookie_path(app),
+            "secure": self.get_cookie_secure(app),
+            "partitioned": self.get_cookie_partitioned(app),
+            "samesite": self.get_cookie_samesite(app),
+            "httponly": self.get_cookie_httponly(app)
+        }
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        # Emptied (logout) or never used; stored sessions are never empty
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+            if session.sid is not None or session.stale:
+                response.delete_cookie(name, **cookie)
+            return
+
+        # A new ID whenever the user changes (login), so an ID known before logging in is useless after it
+        user_id = session.get('user_id')
+        new_id = session.sid is None or user_id != session.loaded_user_id
+        if new_id:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+            session.sid = new_session_id()
+
+        if new_id or session.modified or session.refresh:
+            # An existing session is only updated, never recreated: if it was revoked while this request
+            # ran, it stays ended and the client loses its cookie
+            if not self.store.save(session.sid, dict(session), user_id, new=new_id):
+                response.delete_cookie(name, **cookie)
+                return
+            # Permanent cookies carry an expiry, so they are sent again whenever it moves
+            if new_id or session.permanent:
+                response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session), **cookie)
+
+# In-process store: an LRU bounded by maxsize with an idle TTL per session, plus the IDs of each user's
+# sessions for revocation. Every process has its own, use the sql store behind several workers.
+class MemorySessionStore:
+    def __init__(self, maxsize=100000, ttl=7 * 24 * 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # session ID -> (expires_at, user_id, data), least recently used first
+        self._by_user = {}             # user ID -> session IDs
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def load(self, sid):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._remove(sid)
+                return None
+            self._entries.move_to_end(sid)
+            return dict(entry[2]), entry[0] - now
+
+    def save(self, sid, data, user_id, new):
+        # Returns False for an existing session that is gone (revoked, expired or evicted)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if not new and (entry is None or entry[0] <= now):
+                self._remove(sid)
+                return False
+            self._remove(sid)
+            self._entries[sid] = (time.monotonic() + self.ttl, user_id, data)
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(sid)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def delete(self, sid):
+        with self._lock:
+            self._remove(sid)
+
+    def revoke_user(self, user_id, keep=None):
+        now = time.monotonic()
+        with self._lock:
+            sids = [sid for sid in self._by_user.get(user_id, ()) if sid != keep]
+            revoked = sum(1 for sid in sids if self._entries[sid][0] > now)
+            for sid in sids:
+                self._remove(sid)
+        return revoked
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "size": len(self._entries), "maxsize": self.maxsize,
+                    "users": len(self._by_user), "evictions": self.evictions}
+
+    def _remove(self, sid):
+        entry = self._entries.pop(sid, None)
+        if entry is not None and entry[1] is not None:
+            sids = self._by_user[entry[1]]
+            sids.discard(sid)
+            if not sids:
+                del self._by_user[entry[1]]
+
+# Sessions in the user_sessions table, shared by every process on the database. Rows are keyed by a hash of
+# the session ID, so reading the table gives no usable session. Each call runs in its own short transaction,
+# independent of the request's db.session.
+class SqlSessionStore:
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, ttl=7 * 24 * 3600, purge_interval=300):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        now = datetime.utcnow()
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(UserSession.data, UserSession.expires_at)
+                .where(UserSession.id == _session_key(sid), UserSession.expires_at > now)
+            ).first()
+        if row is None:
+            return None
+        return self.serializer.loads(row.data), (row.expires_at - now).total_seconds()
+
+    def save(self, sid, data, user_id, new):
+        # New sessions are inserted; existing ones are updated only while their row is live, so a session
+        # revoked during a request isn't revived by it. Returns False when the row is gone.
+        now = datetime.utcnow()
+        key = _session_key(sid)
+        values = {
+            "user_id": user_id,
+            "data": self.serializer.dumps(data),
+            "expires_at": now + timedelta(seconds=self.ttl)
+        }
+        with db.engine.begin() as connection:
+            if new:
+                connection.execute(insert(UserSession).values(id=key, **values))
+            elif not connection.execute(
+                update(UserSession).where(UserSession.id == key, UserSession.expires_at > now).values(**values)
+            ).rowcount:
+                return False
+            self._purge_if_due(connection)
+        return True
+
+    def delete(self, sid):
+        with db.engine.begin() as connection:
+            connection.execute(delete(UserSession).where(UserSession.id == _session_key(sid)))
+
+    def revoke_user(self, user_id, keep=None):
+        # Expired rows are left to the purge, only live sessions are counted
+        statement = delete(UserSession).where(UserSession.user_id == user_id,
+                                              UserSession.expires_at > datetime.utcnow())
+        if keep is not None:
+            statement = statement.where(UserSession.id != _session_key(keep))
+        with db.engine.begin() as connection:
+            return connection.execute(statement).rowcount
+
+    def purge_expired(self, connection):
+        return connection.execute(delete(UserSession).where(UserSession.expires_at <= datetime.utcnow())).rowcount
+
+    def _purge_if_due(self, connection):
+        # Expired sessions are purged at most once per interval per process
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval:
+                return 0
+            self._last_purge = now
+        return self.purge_expired(connection)
+
+def _session_key(sid):
+    return hashlib.sha256(sid.encode('utf-8')).hexdigest()
@@ -0,0 +1,21 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import db
+
+# Dialects that support INSERT ... ON CONFLICT DO UPDATE
+_INSERT_BUILDERS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert
+}
+
+def upsert(model, index_elements, update_columns):
+    # Builds an INSERT ... ON CONFLICT (index_elements) DO UPDATE for the current database.
+    # update_columns maps column names to expressions built from the `excluded` (proposed) row.
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in _INSERT_BUILDERS:
+        raise NotImplementedError(f"Upsert is not supported on {dialect}")
+
+    statement = _INSERT_BUILDERS[dialect](model.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={name: build(statement.excluded) for name, build in update_columns.items()}
+    )
@@ -0,0 +1,55 @@
+from flask import current_app, request, stream_with_context
+
+# Streamed listings: rows are read from a server-side cursor in chunks and written to the response
+# as they arrive, so memory stays flat and the first bytes go out before the query finishes.
+#
+#   ?format=ndjson or Accept: application/x-ndjson   one JSON object per line
+#   ?stream=true                                     the usual {"items": [...]} body, written incrementally
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def stream_format():
+    # None keeps the regular paginated response
+    fmt = request.args.get('format')
+    if fmt == 'ndjson':
+        return 'ndjson'
+    if not fmt and request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return 'ndjson'
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return 'json'
+    return None
+
+def iter_chunks(session, query, chunk_size=None):
+    # Lists of rows, fetched chunk_size at a time instead of loading the whole result
+    chunk_size = chunk_size or current_app.config['STREAM_CHUNK_SIZE']
+    result = session.execute(query.execution_options(yield_per=chunk_size))
+    yield from result.partitions()
+
+def _dumps():
+    # Same encoder as jsonify, with its compact separators
+    return lambda value: current_app.json.dumps(value, separators=(',', ':'))
+
+def json_lines(chunks, serialize):
+    dumps = _dumps()
+    for rows in chunks:
+        yield ''.join(dumps(serialize(row)) + '\n' for row in rows)
+
+def json_array(chunks, serialize):
+    dumps = _dumps()
+    yield '{"items":['
+    separator = ''
+    for rows in chunks:
+        if rows:
+            yield separator + ','.join(dumps(serialize(row)) for row in rows)
+            separator = ','
+    yield '],"next_cursor":null}'
+
+def stream_response(session, query, serialize, fmt, chunk_size=None):
+    chunks = iter_chunks(session, query, chunk_size)
+    if fmt == 'ndjson':
+        body, mimetype = json_lines(chunks, serialize), NDJSON_MIMETYPE
+    else:
+        body, mimetype = json_array(chunks, serialize), 'application/json'
+
+    response = current_app.response_class(stream_with_context(body), mimetype=mimetype)
+    response.headers['X-Accel-Buffering'] = 'no'  # ask proxies to pass chunks through instead of buffering
+    return response
@@ -1,6 +1,8 @@
 from flask import jsonify, session
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.models import User, db
+from app.services.auth_service import principal_cache
+from app.services.password_service import passwords, PasswordPoolBusy, busy_response
+from app.services.session_service import sessions
 
 # Function to register a new user
 def register_user(data):
@@ -21,13 +23,15 @@ def register_user(data):
             return jsonify({"message": "User already exists"}), 400
 
         # Create new user with hashed password
-        hashed_password = generate_password_hash(password)
+        hashed_password = passwords.hash(password)
         new_user = User(username=username, password=hashed_password, is_admin=is_admin)
         db.session.add(new_user)
         db.session.commit()
 
         return jsonify({"message": "User registered successfully!"}), 201
 
+    except PasswordPoolBusy:
+        return busy_response()
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"message": "Failed to register user"}), 400
@@ -37,8 +41,25 @@ def login_user(data):
     username = data.get('username')
     password = data.get('password')
 
+    if not username or not password:
+        return jsonify({"message": "Invalid username or password"}), 401
+
     user = User.query.filter_by(username=username).first()
-    if user and check_password_hash(user.password, password):
+    try:
+        valid = user is not None and passwords.verify(user.password, password)
+    except PasswordPoolBusy:
+        return busy_response()
+
+    # Hashes made with older parameters are upgraded while we still have the plain password. This is best
+    # effort: when the pool is busy the upgrade waits for a later login.
+    if valid and passwords.needs_rehash(user.password):
+        try:
+            user.password = passwords.hash(password)
+            db.session.commit()
+        except PasswordPoolBusy:
+            db.session.rollback()
+
+    if valid:
         session['user_id'] = user.id
         return jsonify({"message": f"Welcome back, {user.username}!"}), 200
     else:
@@ -73,13 +94,18 @@ def manage_account(user_id, data):
         if user:
             if new_username:
                 user.username = new_username
-                session['username'] = new_username  # Update username in session
             if new_password:
-                user.password = generate_password_hash(new_password)
+                user.password = passwords.hash(new_password)
             db.session.commit()
+            principal_cache.invalidate(user_id)  # Drop the cached username/role
+            if new_password:
+                sessions.revoke_user(user_id)  # Log out the other devices, this one stays logged in
             return jsonify({"message": "Account updated successfully!"})
         else:
             return jsonify({"message": "User not found"}), 404
+    except PasswordPoolBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"message": "Failed to update account"}), 500
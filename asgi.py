@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# ASGI entry point for the async serving mode, e.g. `uvicorn asgi:app` (needs aiosqlite and greenlet)
+app = create_asgi_app()
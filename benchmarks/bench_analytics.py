@@ -0,0 +1,80 @@
+# Admin reports served from the daily rollups against the same reports computed from order_items joined to
+# orders, as the order history grows, and the cost of `flask analytics rebuild`.
+#
+#   python -m benchmarks.bench_analytics --orders 200000 --items 3 --days 365
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import desc, func, insert, select
+from app.models import Order, OrderItem, db
+from app.services.analytics_service import AnalyticsService
+from benchmarks.common import benchmark_app, seed_products, seed_users, summarize, timer
+
+PRODUCTS = 5000
+
+def seed_orders(count, items, days, rng):
+    now = datetime.utcnow()
+    for start in range(0, count, 10000):
+        batch = range(start + 1, min(start + 10000, count) + 1)
+        db.session.execute(insert(Order), [{
+            "id": order_id, "user_id": 1, "total": 0.0,
+            "order_date": now - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400))
+        } for order_id in batch])
+        db.session.execute(insert(OrderItem), [{
+            "order_id": order_id, "product_id": product_id, "quantity": rng.randint(1, 5), "price": 9.99
+        } for order_id in batch for product_id in rng.sample(range(1, PRODUCTS + 1), items)])
+        db.session.commit()
+
+def raw_reports(first):
+    # What the reports would run without rollups
+    day = func.date(Order.order_date)
+    db.session.execute(
+        select(day, func.count(func.distinct(Order.id)), func.sum(OrderItem.quantity),
+               func.sum(OrderItem.quantity * OrderItem.price))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.order_date >= datetime.combine(first, datetime.min.time()))
+        .group_by(day).order_by(day)
+    ).all()
+    db.session.execute(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity * OrderItem.price).label('revenue'))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.order_date >= datetime.combine(first, datetime.min.time()))
+        .group_by(OrderItem.product_id).order_by(desc('revenue')).limit(20)
+    ).all()
+
+def rollup_reports(first):
+    AnalyticsService.revenue_by_day({'from': first.isoformat()})
+    AnalyticsService.product_sales({'from': first.isoformat()})
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--items', type=int, default=3)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    with benchmark_app(OUTBOX_WORKERS=0) as app:
+        with app.app_context():
+            seed_users(1)
+            seed_products(PRODUCTS)
+            seed_orders(args.orders, args.items, args.days, random.Random(1))
+
+            report = AnalyticsService.rebuild()
+            print(f"rebuild: {report['orders']} orders, {report['days']} days, {report['chunks']} chunk(s) "
+                  f"in {report['elapsed_ms']} ms")
+
+            for window in (30, args.days):
+                first = datetime.utcnow().date() - timedelta(days=window - 1)
+                for name, run in (('raw joins', raw_reports), ('rollups', rollup_reports)):
+                    samples = []
+                    for _ in range(args.rounds):
+                        with timer(samples):
+                            run(first)
+                    stats = summarize(samples)
+                    print(f"last {window:>3} days  {name:<10} p50 {stats['p50_ms']:>10} ms  max {max(samples) * 1000:>10.1f} ms")
+            db.session.remove()
+
+if __name__ == '__main__':
+    main()
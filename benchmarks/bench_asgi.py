@@ -0,0 +1,151 @@
+# Sync (a thread per in-flight request, as a threaded WSGI server runs the app) against the ASGI mode
+# (a coroutine per in-flight request on one event loop) at increasing concurrency: throughput, latency and
+# resident memory added per concurrent connection. Needs the ASGI mode dependencies (greenlet, aiosqlite).
+#
+#   python -m benchmarks.bench_asgi --concurrency 10 100 1000 --requests 20
+import argparse
+import asyncio
+import os
+import resource
+import threading
+import time
+
+from app.asgi import AsyncApp
+from app.models import db
+from benchmarks.common import benchmark_app, seed_cart, seed_products, seed_users, summarize
+
+PATHS = ['/products/details', '/products/list', '/cart/view', '/orders']
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class PeakMemory:
+    # Samples the resident set size while the clients run
+    def __init__(self):
+        self.base = rss_bytes()
+        self.peak = self.base
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_sync(app, concurrency, requests):
+    samples, statuses = [], []
+    barrier = threading.Barrier(concurrency)
+
+    def client_thread(index):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = index % 50 + 1
+        barrier.wait()
+        for number in range(requests):
+            start = time.perf_counter()
+            response = client.get(PATHS[number % len(PATHS)])
+            samples.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=client_thread, args=(index,)) for index in range(concurrency)]
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    return samples, statuses, elapsed, memory
+
+def run_async(asgi_app, concurrency, requests):
+    flask_app = asgi_app.flask_app
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    samples, statuses = [], []
+
+    async def request(path, cookie):
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi_app({'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'root_path': '',
+                        'headers': [cookie], 'http_version': '1.1', 'scheme': 'http'}, receive, send)
+        return sent[0]['status']
+
+    async def client(index):
+        cookie = (b'cookie', f"session={serializer.dumps({'user_id': index % 50 + 1})}".encode())
+        for number in range(requests):
+            start = time.perf_counter()
+            statuses.append(await request(PATHS[number % len(PATHS)], cookie))
+            samples.append(time.perf_counter() - start)
+
+    async def main():
+        await request(PATHS[0], (b'cookie', b''))  # opens the async engine outside the measurement
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            await asyncio.gather(*[client(index) for index in range(concurrency)])
+            elapsed = time.perf_counter() - start
+        await asgi_app.aclose()
+        return memory, elapsed
+
+    memory, elapsed = asyncio.run(main())
+    return samples, statuses, elapsed, memory
+
+def async_available():
+    try:
+        import aiosqlite  # noqa: F401
+        import sqlalchemy.ext.asyncio  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--requests', type=int, default=20, help="requests per client")
+    parser.add_argument('--products', type=int, default=1000)
+    args = parser.parse_args()
+
+    modes = ('sync', 'async')
+    if not async_available():
+        print("greenlet/aiosqlite are not installed, measuring the sync mode only")
+        modes = ('sync',)
+
+    print(f"{'mode':<6} {'clients':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7} {'KiB/conn':>9}")
+    for concurrency in args.concurrency:
+        for mode in modes:
+            with benchmark_app(OUTBOX_WORKERS=0, DB_POOL_SIZE=20, DB_MAX_OVERFLOW=10, DB_POOL_TIMEOUT=120) as app:
+                with app.app_context():
+                    seed_users(50)
+                    seed_products(args.products)
+                    for user_id in range(1, 51):
+                        seed_cart(user_id, [user_id, user_id + 50])
+                    db.session.remove()
+
+                if mode == 'sync':
+                    samples, statuses, elapsed, memory = run_sync(app, concurrency, args.requests)
+                else:
+                    samples, statuses, elapsed, memory = run_async(AsyncApp(app), concurrency, args.requests)
+
+            stats = summarize(samples)
+            errors = sum(status >= 500 for status in statuses)
+            per_connection = (memory.peak - memory.base) / concurrency / 1024
+            print(f"{mode:<6} {concurrency:>7} {len(samples) / elapsed:>8.1f} {stats['p50_ms']:>9} "
+                  f"{stats['p95_ms']:>9} {errors:>7} {per_connection:>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# Measures the cost of authorizing admin requests: a User lookup per request (PRINCIPAL_CACHE_TTL=0,
+# the old behaviour) against the principal cache.
+#
+#   python -m benchmarks.bench_auth --requests 2000
+import argparse
+import time
+
+from flask import session
+from app.models import db
+from app.services.auth_service import admin_required
+from benchmarks.common import benchmark_app, seed_users, summarize
+
+def run(ttl, requests):
+    with benchmark_app(PRINCIPAL_CACHE_TTL=ttl) as app:
+        with app.app_context():
+            seed_users(1, is_admin=True)
+            db.session.remove()
+
+        # A no-op admin view isolates the authorization overhead from any endpoint work
+        check = admin_required(lambda: 'ok')
+        samples = []
+        with app.test_request_context('/'):
+            session['user_id'] = 1
+            for _ in range(requests):
+                start = time.perf_counter()
+                check()
+                samples.append(time.perf_counter() - start)
+        return summarize(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Admin authorization overhead, with and without the principal cache")
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, ttl in (('before (User lookup per request)', 0), ('after (principal cache)', 60)):
+        stats = run(ttl, args.requests)
+        print(f"{name:<35} mean {stats['mean_ms']:>7} ms  p99 {stats['p99_ms']:>7} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Rows/second for loading a catalog one POST /products/add at a time against the bulk import,
+# and for the streaming export (CSV and JSON Lines).
+#
+#   python -m benchmarks.bench_catalog_sync --rows 100000
+import argparse
+import time
+
+from app.models import db
+from benchmarks.common import benchmark_app, seed_users
+
+def csv_body(rows, offset=0):
+    lines = ["name,description,price,stock"]
+    lines.extend(f"sku {offset + i},Synthetic product {offset + i},{i % 100}.99,{i % 500}" for i in range(rows))
+    return "\n".join(lines) + "\n"
+
+def one_by_one(app, rows):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    start = time.perf_counter()
+    for i in range(rows):
+        client.post('/products/add', json={"name": f"single {i}", "description": "Synthetic product",
+                                           "price": 9.99, "stock": 10})
+    return rows / (time.perf_counter() - start)
+
+def bulk_import(app, body):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    start = time.perf_counter()
+    report = client.post('/products/import', data=body, content_type='text/csv').get_json()
+    return report["upserted"] / (time.perf_counter() - start), report
+
+def export(app, fmt):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    start = time.perf_counter()
+    response = client.get(f'/products/export?format={fmt}')
+    lines = sum(chunk.count(b'\n') for chunk in response.response)
+    return lines / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog import/export throughput")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--single-rows', type=int, default=500, help="rows loaded through /products/add")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with benchmark_app(PRODUCT_IMPORT_BATCH_SIZE=args.batch_size) as app:
+        with app.app_context():
+            seed_users(1, is_admin=True)
+            db.session.remove()
+
+        rate = one_by_one(app, args.single_rows)
+        print(f"POST /products/add   {rate:>10.1f} rows/s  ({args.single_rows} rows)")
+
+        body = csv_body(args.rows)
+        rate, report = bulk_import(app, body)
+        print(f"import (insert)      {rate:>10.1f} rows/s  ({report['upserted']} rows, {report['failed']} failed)")
+        rate, report = bulk_import(app, body)
+        print(f"import (update)      {rate:>10.1f} rows/s  ({report['upserted']} rows)")
+
+        for fmt in ('csv', 'ndjson'):
+            print(f"export {fmt:<13} {export(app, fmt):>10.1f} rows/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# Measures OrderService.place_order latency against cart size.
+#
+#   python -m benchmarks.bench_checkout --sizes 1,10,50,200 --rounds 20
+import argparse
+
+from app.models import db
+from app.services.order_service import OrderService
+from benchmarks.common import benchmark_app, seed_users, seed_products, seed_cart, summarize, timer
+
+def run(sizes, rounds):
+    results = {}
+    with benchmark_app() as app:
+        with app.app_context():
+            seed_users(1)
+            seed_products(max(sizes))
+
+            for size in sizes:
+                samples = []
+                for _ in range(rounds):
+                    seed_cart(1, range(1, size + 1))
+                    with timer(samples):
+                        _, status = OrderService.place_order(1)
+                    assert status == 200, f"checkout failed with status {status}"
+                    db.session.remove()
+                results[size] = summarize(samples)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkout latency against cart size")
+    parser.add_argument('--sizes', default='1,10,50,200', help="comma separated cart sizes")
+    parser.add_argument('--rounds', type=int, default=20, help="checkouts per cart size")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"{'cart lines':>10} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for size, stats in run(sizes, args.rounds).items():
+        print(f"{size:>10} {stats['mean_ms']:>10} {stats['p50_ms']:>10} {stats['p95_ms']:>10} {stats['p99_ms']:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Compares requests/sec for a concurrent cart workload with the old SQLite defaults
+# (rollback journal, synchronous=FULL) and the tuned configuration (WAL, synchronous=NORMAL).
+# Then every thread adds the same product to its cart, to measure stock reservations under contention.
+#
+#   python -m benchmarks.bench_concurrency --threads 8 --requests 200
+import argparse
+import threading
+import time
+
+from app.models import db
+from benchmarks.common import benchmark_app, seed_users, seed_products
+
+PROFILES = {
+    'before (DELETE journal, synchronous=FULL)': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'after (WAL, synchronous=NORMAL)': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'}
+}
+
+def shopper(app, user_id, requests, product_count, errors):
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+        for i in range(requests):
+            # Mixed workload: mostly reads, a write every few requests and a checkout now and then
+            if i % 10 == 9:
+                response = client.post('/orders/checkout')
+            elif i % 3 == 0:
+                response = client.post('/cart/add', json={'product_id': (user_id + i) % product_count + 1, 'quantity': 1})
+            else:
+                response = client.get('/cart/view')
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+
+def run(config, threads, requests):
+    with benchmark_app(**config) as app:
+        with app.app_context():
+            seed_users(threads)
+            seed_products(100)
+            db.session.remove()
+
+        errors = []
+        workers = [
+            threading.Thread(target=shopper, args=(app, user_id, requests, 100, errors))
+            for user_id in range(1, threads + 1)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        return threads * requests / elapsed, len(errors)
+
+def contended(threads, requests):
+    # One product with less stock than requested: each unit is reserved once, the rest get 400 or 409
+    with benchmark_app() as app:
+        with app.app_context():
+            seed_users(threads)
+            seed_products(1, stock=threads * requests // 2)
+            db.session.remove()
+
+        statuses = []
+
+        def hot_shopper(user_id):
+            with app.test_client() as client:
+                with client.session_transaction() as session:
+                    session['user_id'] = user_id
+                for _ in range(requests):
+                    statuses.append(client.post('/cart/add', json={'product_id': 1, 'quantity': 1}).status_code)
+
+        workers = [threading.Thread(target=hot_shopper, args=(user_id,)) for user_id in range(1, threads + 1)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        return len(statuses) / elapsed, statuses.count(201), statuses.count(409)
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent cart workload, SQLite defaults vs tuned pragmas")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="requests per thread")
+    args = parser.parse_args()
+
+    for name, config in PROFILES.items():
+        throughput, errors = run(config, args.threads, args.requests)
+        print(f"{name:<45} {throughput:>8.0f} req/s  {errors} errors")
+
+    throughput, reserved, conflicts = contended(args.threads, args.requests)
+    print(f"{'one hot product (add to cart)':<45} {throughput:>8.0f} req/s  {reserved} reserved, {conflicts} conflicts")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# What a client retry costs: a checkout with no key, a first checkout with an Idempotency-Key (one extra
+# insert and update) and a retry of it, which replays the stored response instead of checking out again.
+#
+#   python -m benchmarks.bench_idempotency --checkouts 200 --cart-size 10
+import argparse
+
+from app.models import Order, db
+from benchmarks.common import benchmark_app, seed_cart, seed_products, seed_users, summarize, timer
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checkouts', type=int, default=200)
+    parser.add_argument('--cart-size', type=int, default=10)
+    args = parser.parse_args()
+
+    with benchmark_app(OUTBOX_WORKERS=0) as app:
+        with app.app_context():
+            seed_users(1)
+            seed_products(1000)
+            db.session.remove()
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+
+        samples = {'no key': [], 'first request': [], 'retry': []}
+        for index in range(args.checkouts):
+            for name, headers in (('no key', {}), ('first request', {'Idempotency-Key': f"checkout-{index}"})):
+                with app.app_context():
+                    seed_cart(1, [(index * args.cart_size + line) % 1000 + 1 for line in range(args.cart_size)])
+                    db.session.remove()
+                with timer(samples[name]):
+                    assert client.post('/orders/checkout', headers=headers).status_code == 200
+            with timer(samples['retry']):
+                response = client.post('/orders/checkout', headers={'Idempotency-Key': f"checkout-{index}"})
+            assert response.headers.get('Idempotent-Replayed') == 'true'
+
+        with app.app_context():
+            orders = db.session.query(Order).count()
+            db.session.remove()
+
+    for name, values in samples.items():
+        stats = summarize(values)
+        print(f"{name:<14} p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms")
+    print(f"orders created: {orders} (expected {2 * args.checkouts})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# Overhead of the request metrics: warm-cache catalog reads (the cheapest endpoint, so the
+# instrumentation is the largest share of the request) and an order history page with metrics off and on.
+#
+#   python -m benchmarks.bench_metrics --requests 5000
+import argparse
+
+from app.models import db
+from benchmarks.common import benchmark_app, seed_products, seed_users, summarize, timer
+
+def run(enabled, path, requests):
+    with benchmark_app(METRICS_ENABLED=enabled) as app:
+        with app.app_context():
+            seed_users(1)
+            seed_products(100)
+            db.session.remove()
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+        client.get(path)  # warm the cache
+
+        samples = []
+        for _ in range(requests):
+            with timer(samples):
+                client.get(path)
+        return summarize(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Request metrics overhead")
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    for path in ('/products/details?limit=20', '/orders'):
+        for name, enabled in (('metrics off', False), ('metrics on', True)):
+            stats = run(enabled, path, args.requests)
+            print(f"{path:<28} {name:<12} mean {stats['mean_ms']:>7} ms  p99 {stats['p99_ms']:>7} ms")
+
+if __name__ == '__main__':
+    main()
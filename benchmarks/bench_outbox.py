@@ -0,0 +1,64 @@
+# Checkout latency when post-checkout work runs inside the request (what place_order would have to do
+# without a queue) against the outbox, where worker threads run it after the response. The order_placed
+# handler is replaced by one that sleeps, standing in for a confirmation email or an inventory sync.
+#
+#   python -m benchmarks.bench_outbox --checkouts 200 --side-effect-ms 20
+import argparse
+import time
+
+from app.models import OutboxJob, db
+from app.services.outbox_service import outbox
+from benchmarks.common import benchmark_app, seed_cart, seed_products, seed_users, summarize
+
+def run(mode, checkouts, side_effect_ms):
+    @outbox.task('order_placed')
+    def slow_side_effect(payload, idempotency_key):
+        time.sleep(side_effect_ms / 1000)
+
+    workers = 1 if mode == 'outbox' else 0
+    with benchmark_app(OUTBOX_WORKERS=workers, OUTBOX_POLL_INTERVAL=0.05) as app:
+        with app.app_context():
+            seed_users(1)
+            seed_products(100)
+            db.session.remove()
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+
+        samples = []
+        start = time.perf_counter()
+        for index in range(checkouts):
+            with app.app_context():
+                seed_cart(1, [index % 100 + 1])
+                db.session.remove()
+            began = time.perf_counter()
+            client.post('/orders/checkout')
+            if mode == 'inline':
+                with app.app_context():
+                    outbox.run_pending()
+                    db.session.remove()
+            samples.append(time.perf_counter() - began)
+
+        # Time until the workers caught up with the last checkout
+        with app.app_context():
+            while db.session.query(OutboxJob).filter_by(status='pending').count():
+                db.session.remove()
+                time.sleep(0.01)
+            db.session.remove()
+        drained = time.perf_counter() - start
+    return {**summarize(samples), "drained_s": round(drained, 2)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checkouts', type=int, default=200)
+    parser.add_argument('--side-effect-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    for mode in ('inline', 'outbox'):
+        stats = run(mode, args.checkouts, args.side_effect_ms)
+        print(f"{mode:<7} p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  "
+              f"p99 {stats['p99_ms']:>8} ms  all jobs done after {stats['drained_s']} s")
+
+if __name__ == '__main__':
+    main()
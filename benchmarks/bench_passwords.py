@@ -0,0 +1,96 @@
+# Password hashing cost per method, and a login storm: logins on several threads while another thread
+# reads the catalog. Compares hashing on the request thread (PASSWORD_POOL_WORKERS=0, the old behaviour)
+# against the bounded pool.
+#
+#   python -m benchmarks.bench_passwords --method scrypt --logins 64 --threads 16
+import argparse
+import threading
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.models import db
+from benchmarks.common import benchmark_app, seed_products, seed_users, summarize
+
+METHODS = ('pbkdf2:sha256:1000', 'pbkdf2:sha256:600000', 'pbkdf2:sha256', 'scrypt')
+
+def hash_cost(method, rounds):
+    stored = generate_password_hash('benchmark-password', method)
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        check_password_hash(stored, 'benchmark-password')
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def login_storm(method, workers, logins, threads, reads):
+    config = {'PASSWORD_HASH_METHOD': method, 'PASSWORD_POOL_WORKERS': workers,
+              'PASSWORD_POOL_MAX_PENDING': logins, 'PASSWORD_POOL_TIMEOUT': 60}
+    with benchmark_app(**config) as app:
+        with app.app_context():
+            seed_users(threads, password=generate_password_hash('benchmark-password', method))
+            seed_products(100)
+            db.session.remove()
+
+        login_samples, read_samples, statuses = [], [], []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def login_worker(index):
+            client = app.test_client()
+            for _ in range(logins // threads):
+                start = time.perf_counter()
+                response = client.post('/user/login', json={'username': f"benchuser{index}",
+                                                            'password': 'benchmark-password'})
+                with lock:
+                    login_samples.append(time.perf_counter() - start)
+                    statuses.append(response.status_code)
+
+        def read_worker():
+            client = app.test_client()
+            while not done.is_set() and len(read_samples) < reads:
+                start = time.perf_counter()
+                client.get('/products/list?limit=20')
+                read_samples.append(time.perf_counter() - start)
+
+        reader = threading.Thread(target=read_worker)
+        loggers = [threading.Thread(target=login_worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        reader.start()
+        for thread in loggers:
+            thread.start()
+        for thread in loggers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        reader.join()
+
+        return {
+            "logins": summarize(login_samples),
+            "reads": summarize(read_samples),
+            "reads_per_s": round(len(read_samples) / elapsed, 1),
+            "ok": statuses.count(200)
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing cost and login storm latency")
+    parser.add_argument('--method', default='scrypt', help="hash method used for the login storm")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--reads', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=1, help="pool size for the 'after' run")
+    args = parser.parse_args()
+
+    for method in METHODS:
+        stats = hash_cost(method, args.rounds)
+        print(f"verify {method:<22} p50 {stats['p50_ms']:>9} ms")
+
+    print(f"\nlogin storm: {args.logins} logins on {args.threads} threads, method {args.method}")
+    for name, workers in (('before (inline)', 0), (f"after (pool of {args.workers})", args.workers)):
+        stats = login_storm(args.method, workers, args.logins, args.threads, args.reads)
+        print(f"{name:<20} login p50 {stats['logins']['p50_ms']:>9} ms  p99 {stats['logins']['p99_ms']:>9} ms  "
+              f"catalog p99 {stats['reads']['p99_ms']:>8} ms  {stats['reads_per_s']:>7} reads/s  "
+              f"({stats['ok']} logins ok)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# Microbenchmark of the rate limiter: the cost of the check a request pays (limited and unlimited endpoints)
+# and the throughput of the memory buckets from several threads, with one lock against sharded locks.
+#
+#   python -m benchmarks.bench_rate_limit --calls 200000 --threads 1 4 16
+import argparse
+import threading
+import time
+
+from app.services.rate_limit_service import MemoryBuckets, parse_limits, rate_limiter, _Limits
+
+def per_call_ns(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e9
+
+def check_cost(calls):
+    # One client hitting a limited endpoint (bucket never empties) and an endpoint without limits
+    limits = _Limits(MemoryBuckets(), parse_limits('cart=1000000000/second'), {})
+
+    def identify():
+        return 'user:1'
+    return {
+        'limited endpoint': per_call_ns(lambda: rate_limiter.retry_after(limits, 'cart.view_cart', identify), calls),
+        'unlimited endpoint': per_call_ns(lambda: rate_limiter.retry_after(limits, 'order.list_orders', identify), calls)
+    }
+
+def contended(shards, threads, calls):
+    # Every thread takes tokens for its own clients, as concurrent requests from different users do
+    buckets = MemoryBuckets(shards=shards)
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        keys = [f"cart:user:{index * 1000 + number}" for number in range(64)]
+        barrier.wait()
+        for number in range(calls):
+            buckets.take(keys[number & 63], 1e9, 1e9)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return threads * calls / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter overhead and bucket throughput")
+    parser.add_argument('--calls', type=int, default=200000, help="calls per measurement (per thread)")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    for name, ns in check_cost(args.calls).items():
+        print(f"{name:<20} {ns:>8.0f} ns per request")
+
+    print(f"\n{'threads':>7} {'1 lock takes/s':>15} {'16 shards takes/s':>18}")
+    for threads in args.threads:
+        calls = max(1, args.calls // threads)
+        single, sharded = contended(1, threads, calls), contended(16, threads, calls)
+        print(f"{threads:>7} {single:>15,.0f} {sharded:>18,.0f}")
+
+if __name__ == '__main__':
+    main()
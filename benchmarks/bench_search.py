@@ -0,0 +1,67 @@
+# /products/search latency at several catalog sizes, with the FTS5 index and with the LIKE fallback
+# used on databases without it.
+#
+#   python -m benchmarks.bench_search --sizes 10000 100000 1000000
+import argparse
+import random
+
+from sqlalchemy import insert
+from app.models import Product, db
+from benchmarks.common import benchmark_app, seed_users, summarize, timer
+
+ADJECTIVES = ['blue', 'red', 'green', 'large', 'small', 'wooden', 'steel', 'leather', 'organic', 'vintage',
+              'portable', 'wireless', 'classic', 'deluxe', 'compact', 'heavy', 'light', 'smart', 'quiet', 'rapid']
+NOUNS = ['pen', 'pencil', 'notebook', 'chair', 'desk', 'lamp', 'cable', 'keyboard', 'mouse', 'monitor',
+         'bottle', 'backpack', 'jacket', 'speaker', 'charger', 'mug', 'kettle', 'blender', 'drill', 'tent']
+
+QUERIES = {
+    'rare word': {'q': 'kettle deluxe'},
+    'common prefix': {'q': 'pen'},
+    'prefix + filters': {'q': 'ch', 'max_price': 20, 'min_stock': 1},
+    'no match': {'q': 'submarine'}
+}
+
+def seed_catalog(count, chunk=50000):
+    rng = random.Random(42)
+    for start in range(0, count, chunk):
+        db.session.execute(insert(Product), [{
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+            "description": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} for the {rng.choice(NOUNS)}",
+            "price": round(rng.uniform(1, 100), 2),
+            "stock": rng.randint(0, 50)
+        } for i in range(start, min(count, start + chunk))])
+        db.session.commit()
+
+def run(app, params, requests):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    samples = []
+    for _ in range(requests):
+        with timer(samples):
+            response = client.get('/products/search', query_string={**params, 'limit': 20})
+        assert response.status_code == 200, response.get_json()
+    return summarize(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Product search latency, FTS5 index against LIKE scans")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with benchmark_app() as app:
+            with app.app_context():
+                seed_users(1)
+                seed_catalog(size)
+                db.session.remove()
+
+            print(f"\n{size} products")
+            for backend, fts in (('fts5', True), ('like', False)):
+                app.extensions['products_fts'] = fts
+                for name, params in QUERIES.items():
+                    stats = run(app, params, args.requests)
+                    print(f"  {backend:<5} {name:<17} p50 {stats['p50_ms']:>9} ms  p99 {stats['p99_ms']:>9} ms")
+
+if __name__ == '__main__':
+    main()
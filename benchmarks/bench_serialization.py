@@ -0,0 +1,82 @@
+# Bytes on the wire and server time of the big JSON listings with each encoder (std, orjson) and
+# representation: plain JSON, columnar (?format=columnar), gzip and brotli (when the brotli package is
+# installed). Also times the encoder alone on a 200 item page, without the request around it.
+#
+#   python -m benchmarks.bench_serialization --requests 500 --products 1000
+import argparse
+import time
+
+from app.models import db
+from app.services.pagination import envelope
+from benchmarks.common import benchmark_app, seed_cart, seed_products, seed_users, summarize
+
+PATHS = ['/products/details?limit=200', '/products/list?limit=200', '/orders?limit=100']
+VARIANTS = {
+    'json': ('', None),
+    'columnar': ('&format=columnar', None),
+    'gzip': ('', 'gzip'),
+    'br': ('', 'br'),
+    'columnar+gzip': ('&format=columnar', 'gzip')
+}
+
+def run(encoder, args):
+    results = {}
+    with benchmark_app(JSON_ENCODER=encoder, OUTBOX_WORKERS=0) as app:
+        with app.app_context():
+            seed_users(1)
+            seed_products(args.products)
+            db.session.remove()
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+        # 100 orders for the order history, each placed through the API
+        for _ in range(100):
+            with app.app_context():
+                seed_cart(1, [1, 2, 3])
+                db.session.remove()
+            client.post('/orders/checkout')
+
+        available = app.extensions['compression']
+        for path in PATHS:
+            for variant, (query, coding) in VARIANTS.items():
+                if coding and coding not in available:
+                    continue
+                headers = {'Accept-Encoding': coding} if coding else {}
+                url = path + query
+                client.get(url, headers=headers)  # warms the product cache
+                samples, size = [], 0
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    response = client.get(url, headers=headers)
+                    samples.append(time.perf_counter() - start)
+                    size = len(response.data)
+                results[(path, variant)] = (size, summarize(samples)['mean_ms'])
+
+        # The encoder alone on a page of 200 product details
+        items = [{"id": number, "name": f"product {number}", "description": f"Synthetic product number {number}",
+                  "price": 9.99} for number in range(200)]
+        page = envelope(items, 200, 'eyJpZCI6MjAwfQ')
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            app.json.dumps(page)
+        encode_us = (time.perf_counter() - start) / args.requests * 1e6
+    return results, encode_us
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON encoder, columnar format and compression of the listings")
+    parser.add_argument('--requests', type=int, default=500, help="requests per path and variant")
+    parser.add_argument('--products', type=int, default=1000)
+    args = parser.parse_args()
+
+    runs = {encoder: run(encoder, args) for encoder in ('std', 'orjson')}
+    for encoder, (_, encode_us) in runs.items():
+        print(f"{encoder:<7} encodes a 200 item page in {encode_us:>8.1f} us")
+
+    print(f"\n{'path':<30} {'variant':<14} {'bytes':>8} {'std ms':>8} {'orjson ms':>10}")
+    for (path, variant), (size, std_ms) in runs['std'][0].items():
+        orjson_ms = runs['orjson'][0][(path, variant)][1]
+        print(f"{path:<30} {variant:<14} {size:>8} {std_ms:>8.3f} {orjson_ms:>10.3f}")
+
+if __name__ == '__main__':
+    main()
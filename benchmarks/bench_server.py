@@ -0,0 +1,124 @@
+# Throughput of the production server (python -m app.server) as worker processes are added: starts the
+# server on a throwaway database for each worker count and drives catalog, cart and order reads over HTTP
+# from keep-alive client threads. With --hup the workers are restarted half way through each run and every
+# failed request is counted, which should stay at 0. Needs gunicorn.
+#
+#   python -m benchmarks.bench_server --workers 1 2 4 --threads 4 --clients 32 --seconds 10
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from app.models import db
+from benchmarks.common import benchmark_app, seed_cart, seed_products, seed_users, summarize
+
+PATHS = ['/products/details', '/products/list', '/cart/view', '/orders']
+PORT = 8765
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"The server did not start listening on port {port}")
+
+def run_clients(cookies, clients, seconds, on_halfway=None):
+    samples, failures = [], []
+    deadline = time.perf_counter() + seconds
+
+    def client_thread(index):
+        connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+        headers = {'Cookie': cookies[index % len(cookies)]}
+        number = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request('GET', PATHS[number % len(PATHS)], headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    failures.append(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                failures.append(type(e).__name__)
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+            samples.append(time.perf_counter() - start)
+            number += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client_thread, args=(index,)) for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    if on_halfway:
+        time.sleep(seconds / 2)
+        on_halfway()
+    for thread in threads:
+        thread.join()
+    return samples, failures, time.perf_counter() - start
+
+def measure(workers, args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        uri = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        with benchmark_app(SQLALCHEMY_DATABASE_URI=uri) as app:
+            with app.app_context():
+                seed_users(50)
+                seed_products(args.products)
+                for user_id in range(1, 51):
+                    seed_cart(user_id, [user_id, user_id + 50])
+                db.session.remove()
+            serializer = app.session_interface.get_signing_serializer(app)
+            cookies = [f"session={serializer.dumps({'user_id': user_id})}" for user_id in range(1, 51)]
+
+        env = dict(os.environ, DATABASE_URL=uri, SECRET_KEY=app.config['SECRET_KEY'], OUTBOX_WORKERS='0',
+                   RATE_LIMIT_ENABLED='false')
+        server = subprocess.Popen([
+            sys.executable, '-m', 'app.server', '--bind', f"127.0.0.1:{PORT}",
+            '--workers', str(workers), '--threads', str(args.threads)
+        ], env=env, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(PORT)
+            run_clients(cookies, args.clients, 1)  # warms up every worker's cache and pool
+            restart = (lambda: server.send_signal(signal.SIGHUP)) if args.hup else None
+            return run_clients(cookies, args.clients, args.seconds, restart)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(60)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4, help="threads per worker")
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--hup', action='store_true', help="restart the workers half way through each run")
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        sys.exit("The gunicorn package is required for this benchmark: pip install gunicorn")
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'rps':>8} {'speedup':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'failed':>7}")
+    baseline = None
+    for workers in args.workers:
+        samples, failures, elapsed = measure(workers, args)
+        rps = len(samples) / elapsed
+        baseline = baseline or rps
+        summary = summarize(samples)
+        print(f"{workers:>7} {rps:>8.0f} {rps / baseline:>7.2f}x {summary['p50_ms']:>9.2f} "
+              f"{summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f} {len(failures):>7}")
+
+if __name__ == '__main__':
+    main()
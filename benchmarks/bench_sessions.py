@@ -0,0 +1,48 @@
+# Measures what a logged-in request pays for its session with each backend: opening the session from the
+# cookie, reading user_id and saving it at the end of the request (signed cookie vs memory vs sql store).
+# Also reports the cookie size and how often the cookie is sent back.
+#
+#   python -m benchmarks.bench_sessions --requests 5000
+import argparse
+import time
+
+from app.models import db
+from benchmarks.common import benchmark_app, seed_users, summarize
+
+def run(backend, requests):
+    with benchmark_app(SESSION_BACKEND=backend) as app:
+        with app.app_context():
+            seed_users(1)
+            db.session.remove()
+
+        client = app.test_client()
+        with client.session_transaction() as login:
+            login['user_id'] = 1
+            login['cart_hint'] = 'x' * 40  # something besides the user ID, as a real session would hold
+        cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME']).value
+
+        interface = app.session_interface
+        samples, cookies_sent = [], 0
+        for _ in range(requests):
+            with app.test_request_context('/', headers={'Cookie': f"session={cookie}"}) as context:
+                start = time.perf_counter()
+                opened = interface.open_session(app, context.request)
+                assert opened.get('user_id') == 1
+                response = app.response_class()
+                interface.save_session(app, opened, response)
+                samples.append(time.perf_counter() - start)
+                cookies_sent += 'Set-Cookie' in response.headers
+        return summarize(samples), len(cookie), cookies_sent
+
+def main():
+    parser = argparse.ArgumentParser(description="Session lookup cost per request for each session backend")
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'mean ms':>9} {'p99 ms':>9} {'cookie bytes':>13} {'cookies sent':>13}")
+    for backend in ('cookie', 'memory', 'sql'):
+        stats, size, sent = run(backend, args.requests)
+        print(f"{backend:<8} {stats['mean_ms']:>9} {stats['p99_ms']:>9} {size:>13} {sent:>13}")
+
+if __name__ == '__main__':
+    main()
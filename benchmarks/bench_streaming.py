@@ -0,0 +1,64 @@
+# Whole-catalog listing built as one list + jsonify payload against the streamed response:
+# peak Python memory (tracemalloc), time to first byte and total time.
+#
+#   python -m benchmarks.bench_streaming --products 100000
+import argparse
+import time
+import tracemalloc
+
+from flask import jsonify
+from app.models import Product, db
+from app.services.pagination import envelope
+from benchmarks.common import benchmark_app, seed_products, seed_users
+
+def materialized(app):
+    with app.test_request_context('/products/details'):
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows = db.session.query(Product.id, Product.name, Product.description, Product.price).order_by(Product.id)
+        items = [{"id": p.id, "name": p.name, "description": p.description, "price": p.price} for p in rows]
+        body = jsonify(envelope(items, len(items), None)).get_data()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"ttfb_ms": elapsed * 1000, "total_ms": elapsed * 1000, "peak_mb": peak / 2**20, "bytes": len(body)}
+
+def streamed(app, query_string):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(f'/products/details?{query_string}', buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    ttfb = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    response.close()
+    return {"ttfb_ms": ttfb * 1000, "total_ms": elapsed * 1000, "peak_mb": peak / 2**20, "bytes": size}
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialized vs streamed catalog listing")
+    parser.add_argument('--products', type=int, default=100000)
+    args = parser.parse_args()
+
+    with benchmark_app() as app:
+        with app.app_context():
+            seed_users(1)
+            seed_products(args.products)
+            db.session.remove()
+
+        results = [('list + jsonify', materialized(app)),
+                   ('stream json', streamed(app, 'stream=true')),
+                   ('stream ndjson', streamed(app, 'format=ndjson'))]
+        for name, stats in results:
+            print(f"{name:<15} ttfb {stats['ttfb_ms']:>9.1f} ms  total {stats['total_ms']:>9.1f} ms  "
+                  f"peak {stats['peak_mb']:>8.1f} MB  ({stats['bytes']} bytes)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import insert
+from app import create_app
+from app.models import User, Product, Cart, db
+from app.services.outbox_service import outbox
+
+# Creates an app bound to a throwaway SQLite database so benchmarks never touch app.db
+@contextmanager
+def benchmark_app(**config):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        settings = {
+            'TESTING': True,
+            'RATE_LIMIT_ENABLED': False,  # every benchmark client shares one address
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        }
+        settings.update(config)
+        app = create_app(settings)  # runs the schema migrations on the new database
+        outbox.start(app)           # as a serving process would, OUTBOX_WORKERS=0 starts nothing
+        yield app
+        outbox.stop(app)
+        with app.app_context():
+            db.engine.dispose()
+
+def seed_users(count, is_admin=False, password='benchmark-password'):
+    db.session.execute(insert(User), [
+        {"username": f"benchuser{i}", "password": password, "is_admin": is_admin}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+def seed_products(count, stock=1_000_000, price=9.99):
+    db.session.execute(insert(Product), [
+        {"name": f"product {i}", "description": f"Synthetic product number {i}", "price": price, "stock": stock}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+def seed_cart(user_id, product_ids, quantity=1):
+    db.session.execute(insert(Cart), [
+        {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+        for product_id in product_ids
+    ])
+    db.session.commit()
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples):
+    # Latencies are collected in seconds and reported in milliseconds
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3)
+    }
+
+@contextmanager
+def timer(samples):
+    start = time.perf_counter()
+    yield
+    samples.append(time.perf_counter() - start)
@@ -0,0 +1,62 @@
+# Diffs two load-test result files (benchmarks.loadtest --output) endpoint by endpoint.
+# Exits with status 1 when an endpoint's p95 or throughput regressed by more than --threshold percent.
+#
+#   python -m benchmarks.compare results/main.json results/branch.json --threshold 20
+import argparse
+import json
+import sys
+
+METRICS = (('p50_ms', 'lower'), ('p95_ms', 'lower'), ('p99_ms', 'lower'), ('throughput_rps', 'higher'))
+GATED = ('p95_ms', 'throughput_rps')
+
+def change(before, after):
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+def compare(baseline, candidate, threshold):
+    rows, regressions = [], []
+    for name in sorted(set(baseline["endpoints"]) | set(candidate["endpoints"])):
+        before, after = baseline["endpoints"].get(name), candidate["endpoints"].get(name)
+        if before is None or after is None:
+            rows.append((name, 'only in ' + ('candidate' if before is None else 'baseline'), '', '', ''))
+            continue
+        cells = []
+        for metric, better in METRICS:
+            delta = change(before[metric], after[metric])
+            worse = delta > threshold if better == 'lower' else delta < -threshold
+            if worse and metric in GATED:
+                regressions.append(f"{name} {metric} {before[metric]} -> {after[metric]} ({delta:+.1f}%)")
+            cells.append(f"{after[metric]:>9} ({delta:+6.1f}%){' !' if worse else '  '}")
+        rows.append((name, *cells))
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two load-test result files")
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=20.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+
+    print(f"baseline  {baseline['meta'].get('commit')}  {baseline['meta'].get('timestamp')}")
+    print(f"candidate {candidate['meta'].get('commit')}  {candidate['meta'].get('timestamp')}")
+    if baseline['meta'].get('params') != candidate['meta'].get('params'):
+        print("warning: the runs used different parameters")
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"\n{'endpoint':<12}" + ''.join(f"{metric:>22}" for metric, _ in METRICS))
+    for name, *cells in rows:
+        print(f"{name:<12}" + ''.join(f"{cell:>22}" for cell in cells))
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+if __name__ == '__main__':
+    main()
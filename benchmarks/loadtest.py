@@ -0,0 +1,217 @@
+# Load-test harness: seeds users, products and carts at a configurable scale, drives a weighted mix of
+# requests through the WSGI app from several threads and reports throughput and latency per endpoint.
+# Results are written as JSON so two runs (e.g. two commits) can be diffed with benchmarks.compare.
+#
+#   python -m benchmarks.loadtest --users 50 --products 10000 --cart-size 5 --concurrency 8 \
+#       --requests 500 --mix details=40,list=15,cart_view=15,cart_add=15,checkout=5,orders=10 \
+#       --output results/main.json
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from werkzeug.security import generate_password_hash
+from app.models import db
+from benchmarks.common import benchmark_app, seed_cart, seed_products, seed_users, summarize
+
+DEFAULT_MIX = 'details=35,list=15,search=10,cart_view=15,cart_add=15,checkout=5,orders=5'
+PASSWORD = 'benchmark-password'
+
+# Scenario name -> function(client, worker) returning the response; worker holds the user and its rng
+def details(client, worker):
+    return client.get('/products/details', query_string={'limit': 20, 'after': worker.cursor('details')})
+
+def product_list(client, worker):
+    return client.get('/products/list', query_string={'limit': 20, 'after': worker.cursor('list')})
+
+def search(client, worker):
+    return client.get('/products/search', query_string={'q': f"product {worker.rng.randint(1, 999)}", 'limit': 20})
+
+def cart_view(client, worker):
+    return client.get('/cart/view')
+
+def cart_add(client, worker):
+    return client.post('/cart/add', json={'product_id': worker.random_product(), 'quantity': 1})
+
+def checkout(client, worker):
+    response = client.post('/orders/checkout')
+    # Keep the cart from emptying out, so later checkouts still have something to buy
+    client.post('/cart/add', json={'product_id': worker.random_product(), 'quantity': 1})
+    return response
+
+def orders(client, worker):
+    return client.get('/orders', query_string={'limit': 20})
+
+def login(client, worker):
+    return client.post('/user/login', json={'username': worker.username, 'password': PASSWORD})
+
+SCENARIOS = {
+    'details': details,
+    'list': product_list,
+    'search': search,
+    'cart_view': cart_view,
+    'cart_add': cart_add,
+    'checkout': checkout,
+    'orders': orders,
+    'login': login
+}
+
+class Worker:
+    def __init__(self, app, user_id, product_count, seed):
+        self.app = app
+        self.user_id = user_id
+        self.username = f"benchuser{user_id - 1}"
+        self.product_count = product_count
+        self.rng = random.Random(seed)
+        self.cursors = {}
+        self.samples = {}   # scenario -> [seconds]
+        self.statuses = {}  # scenario -> {status: count}
+
+    def random_product(self):
+        return self.rng.randint(1, self.product_count)
+
+    def cursor(self, name):
+        return self.cursors.get(name)
+
+    def run(self, names, weights, requests, deadline):
+        with self.app.test_client() as client:
+            with client.session_transaction() as session:
+                session['user_id'] = self.user_id
+            for _ in range(requests):
+                if deadline and time.perf_counter() >= deadline:
+                    break
+                name = self.rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                response = SCENARIOS[name](client, self)
+                elapsed = time.perf_counter() - start
+
+                self.samples.setdefault(name, []).append(elapsed)
+                statuses = self.statuses.setdefault(name, {})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if name in ('details', 'list') and response.status_code == 200:
+                    # Walk the catalog page by page, starting over at the end
+                    self.cursors[name] = response.get_json().get('next_cursor')
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}, choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def parse_config(pairs):
+    # KEY=VALUE app config overrides, values parsed as JSON when possible (numbers, booleans)
+    config = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return config
+
+def seed(app, users, products, cart_size, rng):
+    with app.app_context():
+        seed_users(users, password=generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD']))
+        seed_products(products)
+        for user_id in range(1, users + 1):
+            if cart_size:
+                seed_cart(user_id, rng.sample(range(1, products + 1), min(cart_size, products)))
+        db.session.remove()
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def report(workers, elapsed):
+    endpoints = {}
+    for name in sorted({name for worker in workers for name in worker.samples}):
+        samples = [sample for worker in workers for sample in worker.samples.get(name, [])]
+        statuses = {}
+        for worker in workers:
+            for status, count in worker.statuses.get(name, {}).items():
+                statuses[str(status)] = statuses.get(str(status), 0) + count
+        endpoints[name] = {
+            **summarize(samples),
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "errors": sum(count for status, count in statuses.items() if int(status) >= 500),
+            "statuses": statuses
+        }
+    total = sum(endpoint["count"] for endpoint in endpoints.values())
+    return {
+        "total": {"requests": total, "elapsed_s": round(elapsed, 3), "throughput_rps": round(total / elapsed, 1)},
+        "endpoints": endpoints
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-workload load test through the WSGI app")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--cart-size', type=int, default=3, help="lines seeded in every user's cart")
+    parser.add_argument('--concurrency', type=int, default=4, help="threads, each logged in as its own user")
+    parser.add_argument('--requests', type=int, default=250, help="requests per thread")
+    parser.add_argument('--duration', type=float, default=0, help="stop after this many seconds (0: no limit)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="scenario=weight pairs: " + ', '.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--config', nargs='*', default=[], metavar='KEY=VALUE', help="app config overrides")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.concurrency > args.users:
+        parser.error("--concurrency cannot exceed --users, every thread needs its own user")
+    weights = parse_mix(args.mix)
+    config = parse_config(args.config)
+
+    with benchmark_app(**config) as app:
+        seed(app, args.users, args.products, args.cart_size, random.Random(args.seed))
+
+        workers = [Worker(app, user_id, args.products, args.seed * 1000 + user_id)
+                   for user_id in range(1, args.concurrency + 1)]
+        names, values = list(weights), list(weights.values())
+        start = time.perf_counter()
+        deadline = start + args.duration if args.duration else None
+        threads = [threading.Thread(target=worker.run, args=(names, values, args.requests, deadline))
+                   for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {**{key: value for key, value in vars(args).items() if key not in ('output', 'config')},
+                       "mix": weights, "config": config}
+        },
+        **report(workers, elapsed)
+    }
+
+    print(f"{'endpoint':<12} {'count':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, stats in results["endpoints"].items():
+        print(f"{name:<12} {stats['count']:>7} {stats['throughput_rps']:>8} {stats['p50_ms']:>9} "
+              f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>7}")
+    print(f"{'total':<12} {results['total']['requests']:>7} {results['total']['throughput_rps']:>8}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
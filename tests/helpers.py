@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# Records every SQL statement sent through the engine while the block runs
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+# Fails the test if the block runs more than `limit` queries (catches N+1 regressions)
+@contextmanager
+def assert_max_queries(engine, limit):
+    with count_queries(engine) as statements:
+        yield statements
+    assert len(statements) <= limit, (
+        f"Expected at most {limit} queries, got {len(statements)}:\n" + "\n".join(statements)
+    )
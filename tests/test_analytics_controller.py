@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app import create_app, db
+from app.models import User, Product, Cart, Order, OrderItem, SalesDaily, ProductSalesDaily
+from app.services.analytics_service import AnalyticsService
+from tests.helpers import assert_max_queries
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                User(username='admin', password='admin123', is_admin=True),
+                User(username='customer', password='customer123'),
+                Product(name='pen', price=1.5, stock=100, description='Blue pen'),
+                Product(name='notebook', price=4.0, stock=8, description='A5 notebook'),
+                Product(name='eraser', price=0.5, stock=3, description='White eraser')
+            ])
+            db.session.commit()
+
+            yield client
+
+            db.drop_all()
+
+def simulate_user_session(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+def buy(client, lines):
+    simulate_user_session(client, user_id=2)
+    db.session.add_all([Cart(user_id=2, product_id=product_id, quantity=quantity) for product_id, quantity in lines])
+    db.session.commit()
+    assert client.post('/orders/checkout').status_code == 200
+
+def add_past_order(days_ago, lines):
+    # An order placed before the rollups existed
+    order = Order(user_id=2, total=sum(quantity * price for _, quantity, price in lines),
+                  order_date=datetime.utcnow() - timedelta(days=days_ago))
+    db.session.add(order)
+    db.session.flush()
+    db.session.add_all([OrderItem(order_id=order.id, product_id=product_id, quantity=quantity, price=price)
+                        for product_id, quantity, price in lines])
+    db.session.commit()
+
+def rollups():
+    return (
+        sorted((row.day, row.orders, row.units, round(row.revenue, 2)) for row in SalesDaily.query.all()),
+        sorted((row.day, row.product_id, row.orders, row.units, round(row.revenue, 2))
+               for row in ProductSalesDaily.query.all())
+    )
+
+def test_checkout_updates_the_rollups(client):
+    buy(client, [(1, 2), (2, 1)])
+    buy(client, [(1, 4)])
+
+    today = datetime.utcnow().date()
+    daily, per_product = rollups()
+    assert daily == [(today, 2, 7, 13.0)]
+    assert per_product == [(today, 1, 2, 6, 9.0), (today, 2, 1, 1, 4.0)]
+
+def test_reports_are_admin_only(client):
+    for url in ('/analytics/revenue', '/analytics/products', '/analytics/low-stock'):
+        assert client.get(url).status_code == 401
+        simulate_user_session(client, user_id=2)
+        assert client.get(url).status_code == 403
+        simulate_user_session(client, user_id=1)
+        assert client.get(url).status_code == 200
+        with client.session_transaction() as session:
+            session.clear()
+
+def test_revenue_by_day(client):
+    buy(client, [(1, 2)])
+    AnalyticsService.record_sale(datetime.utcnow().date() - timedelta(days=2), [(2, 3, 4.0)])
+    db.session.commit()
+
+    simulate_user_session(client, user_id=1)
+    with assert_max_queries(db.engine, 2):
+        response = client.get('/analytics/revenue')
+    data = response.get_json()
+    assert [day['revenue'] for day in data['days']] == [12.0, 3.0]
+    assert data['total'] == {"orders": 2, "units": 5, "revenue": 15.0}
+
+    today = datetime.utcnow().date().isoformat()
+    data = client.get('/analytics/revenue', query_string={'from': today, 'to': today}).get_json()
+    assert [day['day'] for day in data['days']] == [today]
+
+    assert client.get('/analytics/revenue', query_string={'from': 'yesterday'}).status_code == 400
+    assert client.get('/analytics/revenue', query_string={'from': '2024-02-01', 'to': '2024-01-01'}).status_code == 400
+
+def test_product_sales_and_top_sellers(client):
+    buy(client, [(1, 6), (2, 2)])
+    buy(client, [(2, 1), (3, 1)])
+
+    simulate_user_session(client, user_id=1)
+    by_revenue = client.get('/analytics/products').get_json()['items']
+    assert [(item['name'], item['revenue']) for item in by_revenue] == [('notebook', 12.0), ('pen', 9.0), ('eraser', 0.5)]
+    assert by_revenue[0]['orders'] == 2
+
+    top = client.get('/analytics/products', query_string={'sort': 'units', 'limit': 1}).get_json()['items']
+    assert [(item['name'], item['units']) for item in top] == [('pen', 6)]
+
+    assert client.get('/analytics/products', query_string={'sort': 'name'}).status_code == 400
+
+def test_low_stock(client):
+    buy(client, [(2, 7)])
+
+    simulate_user_session(client, user_id=1)
+    items = client.get('/analytics/low-stock').get_json()['items']
+    assert [(item['name'], item['stock']) for item in items] == [('notebook', 1), ('eraser', 3)]
+    assert items[0]['sold_last_7_days'] == 7
+    assert items[0]['days_of_stock'] == 1.0
+    assert items[1]['days_of_stock'] is None
+
+    items = client.get('/analytics/low-stock', query_string={'threshold': 1}).get_json()['items']
+    assert [item['name'] for item in items] == ['notebook']
+
+def test_rebuild_matches_the_incremental_rollups(client):
+    buy(client, [(1, 2), (2, 1)])
+    buy(client, [(1, 1), (3, 2)])
+    incremental = rollups()
+
+    # Orders from before the rollups are picked up, in chunks of whole days even when smaller than a day
+    add_past_order(3, [(1, 5, 1.5)])
+    add_past_order(3, [(1, 1, 1.5), (2, 2, 4.0)])
+    report = AnalyticsService.rebuild(chunk_size=1)
+    assert report['orders'] == 4
+    assert report['chunks'] == 2
+
+    daily, per_product = rollups()
+    past = datetime.utcnow().date() - timedelta(days=3)
+    assert daily == [(past, 2, 8, 17.0)] + incremental[0]
+    assert per_product == [(past, 1, 2, 6, 9.0), (past, 2, 1, 2, 8.0)] + incremental[1]
+
+    # Rebuilding again gives the same numbers
+    AnalyticsService.rebuild()
+    assert rollups() == (daily, per_product)
+
+def test_rebuild_replaces_one_day_range_at_a_time(client, monkeypatch):
+    from app.services import analytics_service
+    buy(client, [(1, 2)])
+    add_past_order(3, [(1, 5, 1.5)])
+    # A rollup day whose orders are gone is cleared by the rebuild
+    db.session.add(SalesDaily(day=datetime.utcnow().date() - timedelta(days=10), orders=1, units=1, revenue=1.0))
+    db.session.commit()
+    before = rollups()
+
+    # A failure half way leaves every day with its old numbers or its new ones, never an empty report
+    calls = []
+    rebuild_days = analytics_service._rebuild_days
+
+    def failing(first, end):
+        calls.append(first)
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        rebuild_days(first, end)
+    monkeypatch.setattr(analytics_service, '_rebuild_days', failing)
+    with pytest.raises(RuntimeError):
+        AnalyticsService.rebuild(chunk_size=1)
+    daily, _ = rollups()
+    past = datetime.utcnow().date() - timedelta(days=3)
+    assert daily == [(past, 1, 5, 7.5), before[0][-1]]  # first range rebuilt, today's row untouched
+
+    monkeypatch.undo()
+    AnalyticsService.rebuild(chunk_size=1)
+    assert rollups()[0] == daily
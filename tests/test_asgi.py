@@ -0,0 +1,227 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from app import create_app, db
+from app.asgi import AsyncApp, wsgi_environ
+from app.services.async_services import AsyncCartService
+from app.database import async_database_uri
+from sqlalchemy import update
+from app.models import User, Product, Cart, UserSession
+from app.services.product_service import bump_catalog_version
+
+@pytest.fixture
+def asgi_app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='customer', password='customer123'),
+            Product(name='pen', price=1.5, stock=100, description='Blue pen'),
+            Product(name='notebook', price=4.0, stock=8, description='A5 notebook')
+        ])
+        db.session.add(Cart(user_id=1, product_id=1, quantity=2))
+        db.session.commit()
+        db.session.remove()
+
+    asgi_app = AsyncApp(app)
+    yield asgi_app
+
+    asyncio.run(asgi_app.aclose())
+    with app.app_context():
+        db.drop_all()
+
+def session_cookie(app, user_id):
+    value = app.session_interface.get_signing_serializer(app).dumps({'user_id': user_id})
+    return (b'cookie', f"{app.config['SESSION_COOKIE_NAME']}={value}".encode())
+
+async def call(app, method, path, query=b'', headers=(), body=b''):
+    # Sends one request through the ASGI app and collects the response
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'root_path': '',
+             'headers': list(headers), 'http_version': '1.1', 'scheme': 'http'}
+    await app(scope, receive, send)
+    start = sent[0]
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], {name.decode(): value.decode() for name, value in start['headers']}, body
+
+def requires_async_drivers():
+    pytest.importorskip('greenlet')
+    pytest.importorskip('aiosqlite')
+
+def test_async_database_uri():
+    assert async_database_uri('sqlite:///app.db') == 'sqlite+aiosqlite:///app.db'
+    assert async_database_uri('postgresql://shop:secret@db/shop') == 'postgresql+psycopg://shop:secret@db/shop'
+    with pytest.raises(ValueError):
+        async_database_uri('mysql://db/shop')
+
+def test_wsgi_environ_folds_headers():
+    scope = {'method': 'POST', 'path': '/cart/add', 'query_string': b'a=1',
+             'headers': [(b'content-type', b'application/json'), (b'cookie', b'a=1'), (b'cookie', b'b=2'),
+                         (b'accept', b'text/html'), (b'accept', b'*/*')]}
+    environ = wsgi_environ(scope, b'{}')
+    assert environ['CONTENT_TYPE'] == 'application/json'
+    assert environ['HTTP_COOKIE'] == 'a=1; b=2'
+    assert environ['HTTP_ACCEPT'] == 'text/html,*/*'
+    assert environ['wsgi.input'].read() == b'{}'
+
+def test_writes_run_on_the_flask_app(asgi_app):
+    cookie = session_cookie(asgi_app.flask_app, 1)
+
+    async def scenario():
+        status, headers, body = await call(asgi_app, 'POST', '/cart/add', headers=[
+            cookie, (b'content-type', b'application/json')
+        ], body=json.dumps({'product_id': 2, 'quantity': 1}).encode())
+        assert status == 201, body
+
+        status, _, _ = await call(asgi_app, 'POST', '/cart/add', body=b'{}',
+                                  headers=[(b'content-type', b'application/json')])
+        assert status == 401
+
+        # Streamed listings are sent chunk by chunk
+        status, headers, body = await call(asgi_app, 'GET', '/products/list', query=b'format=ndjson',
+                                           headers=[cookie])
+        assert status == 200
+        assert headers['content-type'].startswith('application/x-ndjson')
+        assert [json.loads(line)['name'] for line in body.splitlines()] == ['pen', 'notebook']
+    asyncio.run(scenario())
+
+    with asgi_app.flask_app.app_context():
+        assert Cart.query.filter_by(user_id=1).count() == 2
+
+def test_async_pages_send_the_sync_validators(asgi_app):
+    requires_async_drivers()
+    flask_app = asgi_app.flask_app
+    with flask_app.app_context():
+        bump_catalog_version()
+        db.session.commit()
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    cookie = session_cookie(flask_app, 1)
+
+    async def scenario():
+        for path in ('/products/details', '/products/list'):
+            status, headers, _ = await call(asgi_app, 'GET', path, headers=[cookie])
+            expected = client.get(path)
+            assert status == 200
+            assert headers['etag'] == expected.headers['ETag'], path
+            assert headers.get('last-modified') == expected.headers.get('Last-Modified'), path
+
+            # Conditional requests are answered by the product cache of the sync app
+            conditional = [cookie, (b'if-none-match', headers['etag'].encode())]
+            status, _, _ = await call(asgi_app, 'GET', path, headers=conditional)
+            assert status == 304
+        status, headers, _ = await call(asgi_app, 'GET', '/products/details', headers=[cookie])
+        assert 'last-modified' in headers
+        assert headers['vary'] == 'Cookie'
+    asyncio.run(scenario())
+
+def test_sql_sessions_are_read_off_the_loop_and_refreshed(tmp_path):
+    requires_async_drivers()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'sessions.db'}", 'SESSION_BACKEND': 'sql',
+                      'SESSION_TTL': 3600}, 'app.config.TestingConfig')
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='customer', password='x'))
+        db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    sid = client.get_cookie('session').value
+    store = app.extensions['sessions']
+
+    # Half the TTL gone, so the next request is due to push the expiry forward
+    with app.app_context():
+        db.session.execute(update(UserSession).values(expires_at=datetime.utcnow() + timedelta(seconds=600)))
+        db.session.commit()
+
+    threads = []
+    load = store.load
+
+    def recording_load(sid):
+        threads.append(threading.current_thread().name)
+        return load(sid)
+    store.load = recording_load
+    asgi_app = AsyncApp(app)
+    try:
+        cookie = (b'cookie', f"session={sid}".encode())
+        status, _, _ = asyncio.run(call(asgi_app, 'GET', '/cart/view', headers=[cookie]))
+        assert status == 404  # empty cart
+    finally:
+        asyncio.run(asgi_app.aclose())
+    assert threads and all(name.startswith('asgi-wsgi') for name in threads)
+    with app.app_context():
+        _, seconds_left = store.load(sid)
+        assert seconds_left > 3500
+        db.drop_all()
+
+def test_async_reads_match_the_sync_app(asgi_app):
+    requires_async_drivers()
+    flask_app = asgi_app.flask_app
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    assert client.post('/orders/checkout').status_code == 200
+    with flask_app.app_context():
+        db.session.add(Cart(user_id=1, product_id=2, quantity=1))
+        db.session.commit()
+        db.session.remove()
+
+    urls = [('/products/list', b'limit=1'), ('/products/details', b''), ('/cart/view', b''),
+            ('/orders', b''), ('/orders/1', b''), ('/orders/99', b''), ('/products/list', b'after=bad')]
+
+    async def scenario():
+        cookie = session_cookie(flask_app, 1)
+        for path, query in urls:
+            status, headers, body = await call(asgi_app, 'GET', path, query=query, headers=[cookie])
+            expected = client.get(path, query_string=query.decode())
+            assert status == expected.status_code, path
+            assert json.loads(body) == expected.get_json(), path
+            assert headers['content-type'] == 'application/json'
+
+        status, _, _ = await call(asgi_app, 'GET', '/cart/view')
+        assert status == 401
+    asyncio.run(scenario())
+
+def test_async_handler_errors_answer_a_json_500(asgi_app, monkeypatch):
+    requires_async_drivers()
+    cookie = session_cookie(asgi_app.flask_app, 1)
+
+    async def broken(session, user_id):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(AsyncCartService, 'view_cart', staticmethod(broken))
+
+    async def scenario():
+        status, headers, body = await call(asgi_app, 'GET', '/cart/view', headers=[cookie])
+        assert status == 500
+        assert headers['content-type'] == 'application/json'
+        assert json.loads(body) == {"message": "Internal server error"}
+
+        # The app keeps serving
+        status, _, _ = await call(asgi_app, 'GET', '/products/details', headers=[cookie])
+        assert status == 200
+    asyncio.run(scenario())
+
+def test_async_reads_are_counted_in_metrics(asgi_app):
+    requires_async_drivers()
+    cookie = session_cookie(asgi_app.flask_app, 1)
+
+    async def scenario():
+        for _ in range(3):
+            await call(asgi_app, 'GET', '/products/details', headers=[cookie])
+        _, _, body = await call(asgi_app, 'GET', '/metrics')
+        return body.decode()
+    text = asyncio.run(scenario())
+    assert 'http_requests_total{endpoint="/products/details",method="GET",status="200"} 3' in text
+    assert 'http_requests_in_flight 1' in text
@@ -1,12 +1,15 @@
+import threading
+from datetime import timedelta
+
 import pytest
 from app import create_app, db
-from app.models import User, Product, Cart, Order, OrderItem
+from app.models import User, Product, Cart, Order, OrderItem, StockReservation
+from app.services.reservation_service import ReservationService
+from tests.helpers import assert_max_queries
 
 @pytest.fixture
-def client():
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
     with app.test_client() as client:
         with app.app_context():
             db.create_all()
@@ -97,3 +100,183 @@ def test_checkout(client):
     cart_items = Cart.query.filter_by(user_id=1).all()
     assert len(cart_items) == 0, "Cart was not cleared after checkout"
 
+
+def test_checkout_reports_oversold_lines_without_writing(client):
+    simulate_user_session(client, user_id=1)
+
+    response = client.post('/cart/add', json={'product_id': 1, 'quantity': 5})
+    assert response.status_code == 201
+
+    # The reservation expires and the stock is sold elsewhere before checkout
+    with client.application.app_context():
+        StockReservation.query.delete()
+        product = db.session.get(Product, 1)
+        product.stock = 3
+        db.session.commit()
+
+    response = client.post('/orders/checkout')
+    assert response.status_code == 400
+    response_json = response.get_json()
+    assert response_json['oversold'] == [{'product_id': 1, 'requested': 5, 'available': 3}]
+
+    # Nothing was written: no orphan order, stock untouched and cart kept
+    with client.application.app_context():
+        assert Order.query.count() == 0, "Orphan order left behind"
+        assert db.session.get(Product, 1).stock == 3
+        assert Cart.query.filter_by(user_id=1).count() == 1
+
+@pytest.mark.parametrize('sane_multi_rowcount', [True, False])
+def test_take_stock_fails_when_any_product_lacks_stock(client, monkeypatch, sane_multi_rowcount):
+    with client.application.app_context():
+        # Without a reliable executemany rowcount every product is updated and checked on its own
+        monkeypatch.setattr(db.engine.dialect, 'supports_sane_multi_rowcount', sane_multi_rowcount)
+        db.session.add(Product(name='Last one', price=1.0, stock=1, description='Scarce'))
+        db.session.commit()
+
+        assert ReservationService.take_stock({1: 5, 2: 2}) is False
+        db.session.rollback()
+        assert ReservationService.take_stock({1: 5, 2: 1}) is True
+        db.session.commit()
+        assert [product.stock for product in Product.query.order_by(Product.id)] == [95, 0]
+
+def test_add_to_cart_reserves_stock_until_expiry(client):
+    simulate_user_session(client, user_id=1)
+
+    response = client.post('/cart/add', json={'product_id': 1, 'quantity': 4})
+    assert response.status_code == 201
+
+    with client.application.app_context():
+        assert db.session.get(Product, 1).stock == 96, "Stock was not reserved"
+        reservation = StockReservation.query.filter_by(user_id=1, product_id=1).one()
+        assert reservation.quantity == 4
+
+        # Once the reservation expires the sweeper gives the quantity back
+        released = ReservationService.release_expired(now=reservation.expires_at + timedelta(seconds=1))
+        assert released == 1
+        assert db.session.get(Product, 1).stock == 100, "Expired reservation was not restocked"
+        assert StockReservation.query.count() == 0
+
+def test_clear_cart_releases_reservations(client):
+    simulate_user_session(client, user_id=1)
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 7})
+
+    response = client.delete('/cart/clear')
+    assert response.status_code == 200
+
+    with client.application.app_context():
+        assert db.session.get(Product, 1).stock == 100
+        assert StockReservation.query.count() == 0
+
+def test_concurrent_add_to_cart_never_oversells(client):
+    app = client.application
+    with app.app_context():
+        product = Product(name='Limited Product', price=5.0, stock=50, description='Contended stock')
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+
+    threads_count, attempts = 8, 10
+    statuses = []
+    lock = threading.Lock()
+
+    def shopper(user_id):
+        # Each thread acts as a different logged-in user with its own client
+        with app.test_client() as shopper_client:
+            simulate_user_session(shopper_client, user_id=user_id)
+            for _ in range(attempts):
+                response = shopper_client.post('/cart/add', json={'product_id': product_id, 'quantity': 1})
+                with lock:
+                    statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=shopper, args=(user_id,)) for user_id in range(100, 100 + threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(statuses) <= {201, 400, 409}, f"Unexpected statuses: {set(statuses)}"
+    successes = statuses.count(201)
+    assert successes == 50, "Stock was left unsold while requests were rejected"
+
+    with app.app_context():
+        stock = db.session.get(Product, product_id).stock
+        reserved = db.session.query(db.func.sum(StockReservation.quantity)) \
+            .filter_by(product_id=product_id).scalar()
+        assert stock == 0, "Product was oversold or lost an update"
+        assert reserved == successes, "Reservations don't match accepted requests"
+
+def test_view_cart_uses_a_single_query(client):
+    simulate_user_session(client, user_id=1)
+    with client.application.app_context():
+        db.session.add_all([
+            Product(name=f'cart product {i}', price=2.5, stock=10, description='Cart product')
+            for i in range(50)
+        ])
+        db.session.commit()
+        db.session.add_all([Cart(user_id=1, product_id=product_id, quantity=2) for product_id in range(2, 52)])
+        db.session.commit()
+
+        # 50 cart lines must still cost one query, regardless of cart size
+        with assert_max_queries(db.engine, 1):
+            response = client.get('/cart/view')
+
+    assert response.status_code == 200
+    response_json = response.get_json()
+    assert len(response_json['items']) == 50
+    assert response_json['items'][0]['product_name'] == 'cart product 0'
+    assert response_json['subtotal'] == 250.0
+
+def test_add_to_cart_merges_lines(client):
+    simulate_user_session(client, user_id=1)
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 2})
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 3})
+
+    with client.application.app_context():
+        cart_items = Cart.query.filter_by(user_id=1).all()
+        assert len(cart_items) == 1, "Repeated adds created duplicate cart lines"
+        assert cart_items[0].quantity == 5
+        assert db.session.get(Product, 1).stock == 95
+
+def test_bulk_update_cart(client):
+    simulate_user_session(client, user_id=1)
+    with client.application.app_context():
+        db.session.add_all([
+            Product(name='Second Product', price=1.0, stock=10, description='Bulk product'),
+            Product(name='Third Product', price=1.0, stock=10, description='Bulk product')
+        ])
+        db.session.commit()
+
+    client.post('/cart/add', json={'product_id': 3, 'quantity': 4})
+    response = client.post('/cart/bulk', json={'operations': [
+        {'op': 'add', 'product_id': 1, 'quantity': 2},
+        {'op': 'add', 'product_id': 1, 'quantity': 1},
+        {'op': 'set', 'product_id': 2, 'quantity': 6},
+        {'op': 'remove', 'product_id': 3}
+    ]})
+    assert response.status_code == 200
+    assert response.get_json()['items'] == [
+        {'product_id': 1, 'quantity': 3},
+        {'product_id': 2, 'quantity': 6}
+    ]
+
+    with client.application.app_context():
+        quantities = dict(db.session.query(Cart.product_id, Cart.quantity).filter_by(user_id=1))
+        assert quantities == {1: 3, 2: 6}
+        # Reserved stock follows the cart, the removed line went back into stock
+        assert [db.session.get(Product, i).stock for i in (1, 2, 3)] == [97, 4, 10]
+
+def test_bulk_update_cart_is_all_or_nothing(client):
+    simulate_user_session(client, user_id=1)
+    response = client.post('/cart/bulk', json={'operations': [
+        {'op': 'add', 'product_id': 1, 'quantity': 2},
+        {'op': 'set', 'product_id': 1, 'quantity': 500}
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['oversold'] == [{'product_id': 1, 'requested': 500, 'available': 100}]
+
+    response = client.post('/cart/bulk', json={'operations': [{'op': 'add', 'product_id': 1, 'quantity': 0}]})
+    assert response.status_code == 400
+
+    with client.application.app_context():
+        assert Cart.query.count() == 0
+        assert db.session.get(Product, 1).stock == 100
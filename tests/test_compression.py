@@ -0,0 +1,91 @@
+import gzip
+import json
+from datetime import date, datetime
+import pytest
+from flask.json.provider import DefaultJSONProvider
+from app import create_app, db
+from app.models import User, Product
+from app.services.json_provider import OrjsonProvider
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='buyer', password='x'))
+            db.session.add_all([
+                Product(name=f"Product {number}", price=number + 0.5, stock=10, description='A useful product ' * 4)
+                for number in range(1, 51)
+            ])
+            db.session.commit()
+            with client.session_transaction() as session:
+                session['user_id'] = 1
+
+            yield client
+            db.drop_all()
+
+def test_large_json_is_gzipped_for_clients_that_accept_it(client):
+    plain = client.get('/products/details?limit=50')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.vary
+
+    response = client.get('/products/details?limit=50', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert int(response.headers['Content-Length']) < len(plain.data) / 3
+    assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+
+def test_small_bodies_and_unaccepted_codings_are_sent_as_is(client):
+    small = client.get('/products/details?limit=1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers and 'Accept-Encoding' not in small.vary
+
+    refused = client.get('/products/details?limit=50', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in refused.headers
+    assert refused.get_json()['items']
+
+def test_compressed_pages_revalidate_with_their_own_etag(client):
+    plain = client.get('/products/details?limit=50')
+    response = client.get('/products/details?limit=50', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+
+    for etag in (plain.headers['ETag'], response.headers['ETag']):
+        again = client.get('/products/details?limit=50', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert again.status_code == 304
+        assert again.headers['ETag'] == etag
+
+def test_streamed_listings_are_compressed_chunk_by_chunk(client):
+    response = client.get('/products/list?format=ndjson', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    lines = gzip.decompress(response.data).decode().splitlines()
+    assert len(lines) == 50 and json.loads(lines[0])['name'] == 'Product 1'
+
+def test_columnar_pages_send_the_field_names_once(client):
+    rows = client.get('/products/details?limit=20').get_json()
+    columnar = client.get('/products/details?limit=20&format=columnar')
+    body = columnar.get_json()
+    assert body['fields'] == ['id', 'name', 'description', 'price']
+    assert [dict(zip(body['fields'], row)) for row in body['rows']] == rows['items']
+    assert body['next_cursor'] == rows['next_cursor']
+    assert columnar.headers['ETag'] != client.get('/products/details?limit=20').headers['ETag']
+
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 1})
+    client.post('/orders/checkout')
+    orders = client.get('/orders?format=columnar').get_json()
+    assert orders['fields'][0] == 'order_id' and len(orders['rows']) == 1
+
+def test_orjson_provider_matches_the_default_encoding(client):
+    app = client.application
+    assert isinstance(app.json, OrjsonProvider)
+    payload = {"b": 1, "a": [1.5, None, True], "when": datetime(2024, 5, 1, 12, 30), "day": date(2024, 5, 1),
+               "text": "café"}
+    default = DefaultJSONProvider(app)
+    assert json.loads(app.json.dumps(payload)) == json.loads(default.dumps(payload))
+    assert app.json.dumps({1: "int key"}) == '{"1":"int key"}'
+    assert app.json.loads(app.json.dumps(payload))['when'] == 'Wed, 01 May 2024 12:30:00 GMT'
+
+    std = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JSON_ENCODER': 'std', 'AUTO_MIGRATE': False},
+                     'app.config.TestingConfig')
+    assert not isinstance(std.json, OrjsonProvider)
+    with pytest.raises(ValueError):
+        create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JSON_ENCODER': 'fast'}, 'app.config.TestingConfig')
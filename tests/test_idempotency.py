@@ -0,0 +1,167 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from app import create_app, db
+from app.models import User, Product, Order, Cart, IdempotencyKey
+from app.services.idempotency_service import idempotency
+from app.services.order_service import OrderService
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='customer', password='customer123'),
+            User(username='other', password='other123'),
+            Product(name='pen', price=1.5, stock=100, description='Blue pen')
+        ])
+        db.session.commit()
+
+        yield app
+
+        db.drop_all()
+
+def logged_in_client(app, user_id=1):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client
+
+def fill_cart(user_id=1, quantity=2):
+    db.session.add(Cart(user_id=user_id, product_id=1, quantity=quantity))
+    db.session.commit()
+
+# Fingerprint of a checkout without a body
+CHECKOUT = hashlib.sha256(b"POST /orders/checkout\n").hexdigest()
+
+def checkout(client, key, **kwargs):
+    return client.post('/orders/checkout', headers={'Idempotency-Key': key}, **kwargs)
+
+def test_retries_replay_the_first_response(app):
+    client = logged_in_client(app)
+    fill_cart()
+
+    first = checkout(client, 'checkout-1')
+    assert first.status_code == 200
+    assert 'Idempotent-Replayed' not in first.headers
+
+    retry = checkout(client, 'checkout-1')
+    assert retry.status_code == 200
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert Order.query.count() == 1
+    assert db.session.get(Product, 1).stock == 98
+
+def test_requests_without_a_key_are_not_stored(app):
+    client = logged_in_client(app)
+    fill_cart()
+
+    assert client.post('/orders/checkout').status_code == 200
+    assert client.post('/orders/checkout').status_code == 404
+    assert IdempotencyKey.query.count() == 0
+
+def test_invalid_and_reused_keys_are_rejected(app):
+    client = logged_in_client(app)
+    fill_cart()
+
+    assert checkout(client, '').status_code == 400
+    assert checkout(client, 'x' * 256).status_code == 400
+
+    assert checkout(client, 'checkout-1').status_code == 200
+    # Same key, different request body
+    response = checkout(client, 'checkout-1', json={'note': 'leave at the door'})
+    assert response.status_code == 422
+    assert Order.query.count() == 1
+
+def test_keys_are_scoped_per_user(app):
+    fill_cart(user_id=1)
+    fill_cart(user_id=2)
+
+    assert checkout(logged_in_client(app, 1), 'checkout-1').status_code == 200
+    response = checkout(logged_in_client(app, 2), 'checkout-1')
+    assert response.status_code == 200
+    assert 'Idempotent-Replayed' not in response.headers
+    assert Order.query.count() == 2
+
+def test_concurrent_duplicates_wait_for_the_first_response(app, monkeypatch):
+    fill_cart()
+    place_order = OrderService.place_order
+    calls = []
+
+    def slow_place_order(user_id):
+        calls.append(user_id)
+        time.sleep(0.3)
+        return place_order(user_id)
+    monkeypatch.setattr(OrderService, 'place_order', staticmethod(slow_place_order))
+
+    responses = []
+    def send():
+        responses.append(checkout(logged_in_client(app), 'checkout-1'))
+
+    threads = [threading.Thread(target=send) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len({response.get_json()['order_id'] for response in responses}) == 1
+    assert sum(response.headers.get('Idempotent-Replayed') == 'true' for response in responses) == 2
+    assert Order.query.count() == 1
+
+def test_duplicates_give_up_waiting(app):
+    app.config['IDEMPOTENCY_WAIT_SECONDS'] = 0
+    now = datetime.utcnow()
+    # A request holding the key is still running
+    db.session.add(IdempotencyKey(user_id=1, key='checkout-1', fingerprint=CHECKOUT,
+                                  locked_until=now + timedelta(minutes=1), expires_at=now + timedelta(hours=1)))
+    db.session.commit()
+
+    response = checkout(logged_in_client(app), 'checkout-1')
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+
+def test_failed_requests_free_the_key(app, monkeypatch):
+    client = logged_in_client(app)
+    fill_cart()
+    place_order = OrderService.place_order
+    monkeypatch.setattr(OrderService, 'place_order', staticmethod(lambda user_id: ({"message": "Failed to place order"}, 500)))
+
+    assert checkout(client, 'checkout-1').status_code == 500
+    assert IdempotencyKey.query.count() == 0
+
+    monkeypatch.setattr(OrderService, 'place_order', staticmethod(place_order))
+    assert checkout(client, 'checkout-1').status_code == 200
+    assert Order.query.count() == 1
+
+def test_keys_held_by_a_crashed_request_are_taken_over(app):
+    fill_cart()
+    client = logged_in_client(app)
+    past = datetime.utcnow() - timedelta(seconds=1)
+    db.session.add(IdempotencyKey(user_id=1, key='checkout-1', fingerprint=CHECKOUT, locked_until=past,
+                                  expires_at=past + timedelta(hours=1)))
+    db.session.commit()
+
+    response = checkout(client, 'checkout-1')
+    assert response.status_code == 200
+    assert checkout(client, 'checkout-1').get_json() == response.get_json()
+
+def test_expired_keys_run_again_and_are_purged(app):
+    app.config['IDEMPOTENCY_TTL'] = 0
+    client = logged_in_client(app)
+    fill_cart()
+
+    assert checkout(client, 'checkout-1').status_code == 200
+    # The stored response expired, so the retry is a new checkout (of an empty cart)
+    response = checkout(client, 'checkout-1')
+    assert response.status_code == 404
+    assert 'Idempotent-Replayed' not in response.headers
+
+    assert idempotency.purge_expired() == 1
+    assert IdempotencyKey.query.count() == 0
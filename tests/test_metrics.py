@@ -0,0 +1,87 @@
+import logging
+
+import pytest
+from app import create_app, db
+from app.models import User, Product
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                User(username='customer', password='customer123'),
+                Product(name='pen', price=1.5, stock=100, description='Blue pen')
+            ])
+            db.session.commit()
+
+        yield client
+
+        with app.app_context():
+            db.drop_all()
+
+def simulate_user_session(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    return response.get_data(as_text=True).splitlines()
+
+def test_metrics_record_latency_status_and_queries(client):
+    simulate_user_session(client, user_id=1)
+    client.get('/products/details')
+    client.get('/products/details')
+    client.get('/orders/12345')
+    client.get('/no/such/route')
+
+    lines = scrape(client)
+    labels = '{endpoint="/products/details",method="GET"'
+    assert f'http_request_duration_seconds_count{labels}}} 2' in lines
+    assert f'http_request_duration_seconds_bucket{labels},le="+Inf"}} 2' in lines
+    assert f'http_requests_total{labels},status="200"}} 2' in lines
+    # Route templates, not raw paths, so the label set stays bounded
+    assert 'http_requests_total{endpoint="/orders/<int:order_id>",method="GET",status="404"} 1' in lines
+    assert 'http_requests_total{endpoint="unmatched",method="GET",status="404"} 1' in lines
+    # The scrape itself is in flight while the page is rendered
+    assert any(line.startswith('http_requests_in_flight ') and int(line.split()[-1]) >= 1 for line in lines)
+
+    queries = next(line for line in lines if line.startswith('db_queries_total{endpoint="/products/details"}'))
+    assert int(queries.split()[-1]) >= 2
+    assert any(line.startswith('product_cache_hits ') for line in lines)
+    assert any(line.startswith('password_pool_rejected ') for line in lines)
+
+def test_server_timing_header(client):
+    simulate_user_session(client, user_id=1)
+    response = client.get('/orders')
+    header = response.headers['Server-Timing']
+    assert header.startswith('app;dur=')
+    assert 'db;dur=' in header and 'desc="1 queries"' in header
+
+def test_slow_query_log(client, caplog):
+    client.application.extensions['metrics'].slow_queries = 0
+    simulate_user_session(client, user_id=1)
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': client.application.config['SQLALCHEMY_DATABASE_URI'],
+                      'SLOW_QUERY_MS': 0.000001, 'AUTO_MIGRATE': False}, 'app.config.TestingConfig')
+    slow_client = app.test_client()
+    with caplog.at_level(logging.WARNING, logger='app.slow_queries'):
+        slow_client.post('/user/login', json={'username': 'customer', 'password': 'wrong-password'})
+    messages = [record.getMessage() for record in caplog.records]
+    assert any('FROM users' in message for message in messages)
+    assert not any("'customer'" in message for message in messages)  # bound parameters are never logged
+    assert 'db_slow_queries_total 0' not in scrape(slow_client)
+    with app.app_context():
+        db.engine.dispose()
+
+def test_metrics_token(client):
+    client.application.config['METRICS_TOKEN'] = 's3cret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+    # Outside debug and testing the endpoint stays closed until a token is set
+    client.application.config.update(METRICS_TOKEN=None, TESTING=False)
+    assert client.get('/metrics').status_code == 403
@@ -0,0 +1,118 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, delete, inspect, select, text, tuple_, update
+from app import migrations
+from app.migrations import m0001_initial_schema
+from app.models import Cart, Order, OrderItem, Product, StockReservation, User, db
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+def test_migrations_build_the_model_schema(engine):
+    migrations.upgrade(engine)
+    inspector = inspect(engine)
+
+    for table in db.metadata.sorted_tables:
+        assert inspector.has_table(table.name), f"{table.name} is not created by any migration"
+        migrated = {column['name'] for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= migrated, f"{table.name} is missing columns"
+
+        # Every index declared on the models exists in the migrated database
+        indexed = [index['column_names'] for index in inspector.get_indexes(table.name)]
+        indexed += [constraint['column_names'] for constraint in inspector.get_unique_constraints(table.name)]
+        for index in table.indexes:
+            assert [column.name for column in index.columns] in indexed, f"{index.name} is missing"
+
+    # Running again is a no-op
+    assert migrations.upgrade(engine) == []
+    assert all(applied for _, _, applied in migrations.status(engine))
+
+def test_migrations_upgrade_a_baseline_database(engine):
+    # Database created by the original db.create_all(): no versions, duplicate cart lines allowed
+    with engine.begin() as connection:
+        m0001_initial_schema.upgrade(connection)
+        connection.execute(text("INSERT INTO users (id, username, password, is_admin) VALUES (1, 'olduser', 'x', 0)"))
+        connection.execute(text("INSERT INTO products (id, name, description, price, stock) VALUES (1, 'pen', 'blue', 1.0, 10)"))
+        connection.execute(text("INSERT INTO cart (user_id, product_id, quantity) VALUES (1, 1, 2), (1, 1, 3)"))
+
+    migrations.upgrade(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT user_id, product_id, quantity FROM cart")).all() == [(1, 1, 5)]
+        assert connection.execute(text("SELECT version FROM products")).scalar() == 0
+
+def hot_queries():
+    now = datetime(2024, 1, 1)
+    return {
+        'cart view': select(Cart.quantity, Product.name, Product.price)
+            .join(Product, Cart.product_id == Product.id).where(Cart.user_id == 1),
+        'cart line lookup': select(Cart.id).where(Cart.user_id == 1, Cart.product_id == 1),
+        'clear cart': delete(Cart).where(Cart.user_id == 1),
+        'products keyset page': select(Product.id).where(Product.id > 10).order_by(Product.id).limit(51),
+        'product by name': select(Product.id).where(Product.name == 'pen'),
+        'product stock update': update(Product).where(Product.id == 1, Product.version == 1).values(stock=1),
+        'user by name': select(User.id).where(User.username == 'someone'),
+        'orders history page': select(Order.id).where(Order.user_id == 1)
+            .where(tuple_(Order.order_date, Order.id) < (now, 100))
+            .order_by(Order.order_date.desc(), Order.id.desc()).limit(51),
+        'order items by order': select(OrderItem.id).where(OrderItem.order_id == 1),
+        'order items by product': select(OrderItem.id).where(OrderItem.product_id == 1),
+        'reservations by user': delete(StockReservation).where(StockReservation.user_id == 1),
+        'expired reservations': delete(StockReservation).where(StockReservation.expires_at <= now),
+        'low stock products': select(Product.id).where(Product.stock <= 10).order_by(Product.stock).limit(50)
+    }
+
+@pytest.mark.parametrize('name', sorted(hot_queries()))
+def test_hot_queries_use_an_index(engine, name):
+    migrations.upgrade(engine)
+    statement = hot_queries()[name]
+    sql = str(statement.compile(engine, compile_kwargs={'literal_binds': True}))
+
+    with engine.connect() as connection:
+        plan = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+    # Every table access must be an index SEARCH, never a full SCAN
+    scans = [step for step in plan if step.startswith('SCAN')]
+    assert not scans, f"{name} scans a table: {plan}"
+    assert any('INDEX' in step or 'PRIMARY KEY' in step for step in plan), f"{name} uses no index: {plan}"
+
+def test_search_index_covers_existing_and_upserted_products(engine):
+    with engine.begin() as connection:
+        m0001_initial_schema.upgrade(connection)
+        connection.execute(text("INSERT INTO products (id, name, description, price, stock) VALUES (1, 'pen', 'blue', 1.0, 10)"))
+
+    migrations.upgrade(engine)
+
+    match = "SELECT rowid FROM products_fts WHERE products_fts MATCH :q"
+    with engine.begin() as connection:
+        assert connection.execute(text(match), {'q': 'blue'}).scalars().all() == [1]
+
+        # Upserts (bulk import) fire the update trigger too
+        connection.execute(text(
+            "INSERT INTO products (name, description, price, stock, version) VALUES ('pen', 'black', 1.0, 5, 0) "
+            "ON CONFLICT (name) DO UPDATE SET description = excluded.description"
+        ))
+        assert connection.execute(text(match), {'q': 'blue'}).all() == []
+        assert connection.execute(text(match), {'q': 'black'}).scalars().all() == [1]
+
+        plan = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {match}"), {'q': 'pen'})]
+        assert any('VIRTUAL TABLE INDEX' in step for step in plan), plan
+
+def test_sales_rollups_are_backfilled_from_existing_orders(engine):
+    with engine.begin() as connection:
+        m0001_initial_schema.upgrade(connection)
+        connection.execute(text("INSERT INTO users (id, username, password, is_admin) VALUES (1, 'olduser', 'x', 0)"))
+        connection.execute(text("INSERT INTO products (id, name, description, price, stock) VALUES (1, 'pen', 'blue', 1.0, 10)"))
+        connection.execute(text("INSERT INTO orders (id, user_id, order_date, total) VALUES "
+                                "(1, 1, '2024-01-01 10:00:00', 2.0), (2, 1, '2024-01-01 18:00:00', 3.0)"))
+        connection.execute(text("INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (1, 1, 2, 1.0), (2, 1, 3, 1.0)"))
+
+    migrations.upgrade(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT day, orders, units, revenue FROM sales_daily")).all() == [('2024-01-01', 2, 5, 5.0)]
+        assert connection.execute(text("SELECT day, product_id, units FROM product_sales_daily")).all() == [('2024-01-01', 1, 5)]
@@ -0,0 +1,109 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from app import create_app, db
+from app.models import User, Product, Order, OrderItem
+from tests.helpers import assert_max_queries
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                User(username='customer', password='customer123'),
+                User(username='another', password='another123'),
+                Product(name='pen', price=1.5, stock=100, description='Blue pen'),
+                Product(name='notebook', price=4.0, stock=100, description='A5 notebook')
+            ])
+            db.session.commit()
+
+            # 5 orders for user 1 (one per day) and 1 order for user 2
+            start = datetime(2024, 1, 1, 12, 0)
+            for day in range(5):
+                order = Order(user_id=1, order_date=start + timedelta(days=day), total=1.5 * (day + 1) + 4.0)
+                db.session.add(order)
+                db.session.flush()
+                db.session.add_all([
+                    OrderItem(order_id=order.id, product_id=1, quantity=day + 1, price=1.5),
+                    OrderItem(order_id=order.id, product_id=2, quantity=1, price=4.0)
+                ])
+            db.session.add(Order(user_id=2, order_date=start, total=1.0))
+            db.session.commit()
+
+        yield client
+
+        with app.app_context():
+            db.drop_all()
+
+def simulate_user_session(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+def test_list_orders_pages_newest_first(client):
+    simulate_user_session(client, user_id=1)
+
+    response = client.get('/orders', query_string={'limit': 2})
+    assert response.status_code == 200
+    page = response.get_json()
+    assert [order['order_id'] for order in page['items']] == [5, 4]
+    assert page['items'][0]['item_count'] == 2, "Item count not aggregated"
+    assert page['items'][0]['units'] == 6, "Units not aggregated"
+
+    seen = [order['order_id'] for order in page['items']]
+    while page['next_cursor']:
+        page = client.get('/orders', query_string={'limit': 2, 'after': page['next_cursor']}).get_json()
+        seen.extend(order['order_id'] for order in page['items'])
+    assert seen == [5, 4, 3, 2, 1], "Pagination skipped or repeated orders"
+
+def test_list_orders_is_one_query(client):
+    simulate_user_session(client, user_id=1)
+    with client.application.app_context():
+        with assert_max_queries(db.engine, 1):
+            response = client.get('/orders')
+    assert response.status_code == 200
+    assert len(response.get_json()['items']) == 5
+
+def test_list_orders_streams_ndjson_and_json(client):
+    simulate_user_session(client, user_id=1)
+    paged = client.get('/orders').get_json()['items']
+
+    response = client.get('/orders', headers={'Accept': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == paged
+
+    response = client.get('/orders', query_string={'stream': 'true'})
+    assert response.is_streamed
+    assert response.get_json() == {'items': paged, 'next_cursor': None}
+
+    # A cursor from a regular page resumes the stream after it
+    cursor = client.get('/orders', query_string={'limit': 2}).get_json()['next_cursor']
+    response = client.get('/orders', query_string={'format': 'ndjson', 'after': cursor})
+    assert [json.loads(line)['order_id'] for line in response.get_data(as_text=True).splitlines()] == [3, 2, 1]
+
+    assert client.get('/orders', query_string={'format': 'ndjson', 'after': 'bogus'}).status_code == 400
+
+def test_get_order_details(client):
+    simulate_user_session(client, user_id=1)
+    with client.application.app_context():
+        with assert_max_queries(db.engine, 1):
+            response = client.get('/orders/3')
+
+    assert response.status_code == 200
+    order = response.get_json()
+    assert order['order_id'] == 3
+    assert [item['product_name'] for item in order['items']] == ['pen', 'notebook']
+    assert order['units'] == 4
+
+def test_get_order_of_another_user(client):
+    simulate_user_session(client, user_id=1)
+    response = client.get('/orders/6')
+    assert response.status_code == 404
+
+def test_orders_require_authentication(client):
+    assert client.get('/orders').status_code == 401
+    assert client.get('/orders/1').status_code == 401
@@ -0,0 +1,170 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from app import create_app, db
+from app.models import User, Product, OutboxJob
+from app.services.outbox_service import outbox
+from tests.helpers import count_queries
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                User(username='customer', password='customer123'),
+                Product(name='pen', price=1.5, stock=100, description='Blue pen')
+            ])
+            db.session.commit()
+
+            yield client
+
+            outbox.stop(app)
+            db.drop_all()
+
+@pytest.fixture
+def flaky_task():
+    # A task that fails a given number of times before succeeding
+    calls = []
+
+    @outbox.task('flaky')
+    def flaky(payload, idempotency_key):
+        calls.append(idempotency_key)
+        if len(calls) <= payload['failures']:
+            raise RuntimeError(f"failure {len(calls)}")
+    return calls
+
+def simulate_user_session(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+def checkout(client):
+    simulate_user_session(client, user_id=1)
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 2})
+    return client.post('/orders/checkout')
+
+def make_due(job_id):
+    # Skip the retry backoff
+    db.session.query(OutboxJob).filter_by(id=job_id).update({'available_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+def test_checkout_queues_a_job_in_the_same_transaction(client, caplog):
+    response = checkout(client)
+    assert response.status_code == 200
+    order_id = response.get_json()['order_id']
+
+    job = OutboxJob.query.one()
+    assert (job.task, job.status, job.idempotency_key) == ('order_placed', 'pending', f"order_placed:{order_id}")
+    assert json.loads(job.payload) == {'order_id': order_id, 'user_id': 1, 'total': 3.0}
+
+    # A failed checkout (empty cart) queues nothing
+    assert client.post('/orders/checkout').status_code == 404
+    assert OutboxJob.query.count() == 1
+
+    with caplog.at_level(logging.INFO, logger='app.orders'):
+        assert outbox.run_pending() == 1
+    assert f"Order {order_id} confirmed" in caplog.text
+    db.session.expire_all()
+    job = OutboxJob.query.one()
+    assert (job.status, job.attempts) == ('done', 1)
+    assert job.processed_at is not None
+    assert outbox.run_pending() == 0
+
+def test_failed_jobs_are_retried_with_backoff(client, flaky_task):
+    outbox.enqueue('flaky', {'failures': 2}, idempotency_key='flaky:1')
+    db.session.commit()
+    job_id = OutboxJob.query.one().id
+
+    assert outbox.run_pending() == 1
+    job = db.session.get(OutboxJob, job_id)
+    db.session.refresh(job)
+    assert (job.status, job.attempts, job.last_error) == ('pending', 1, 'RuntimeError: failure 1')
+    assert job.available_at > datetime.utcnow(), "Retry was not delayed"
+    assert outbox.run_pending() == 0
+
+    make_due(job_id)
+    outbox.run_pending()
+    make_due(job_id)
+    outbox.run_pending()
+    db.session.refresh(job)
+    assert (job.status, job.attempts) == ('done', 3)
+    # Every attempt carried the same idempotency key
+    assert flaky_task == ['flaky:1'] * 3
+
+def test_jobs_give_up_after_max_attempts(client, flaky_task):
+    client.application.config['OUTBOX_MAX_ATTEMPTS'] = 2
+    outbox.enqueue('flaky', {'failures': 10}, idempotency_key='flaky:2')
+    outbox.enqueue('unknown', {}, idempotency_key='unknown:1')
+    db.session.commit()
+
+    for _ in range(2):
+        for job in OutboxJob.query.all():
+            make_due(job.id)
+        outbox.run_pending()
+
+    db.session.expire_all()
+    statuses = {job.task: (job.status, job.attempts) for job in OutboxJob.query.all()}
+    assert statuses == {'flaky': ('failed', 2), 'unknown': ('failed', 1)}
+    assert outbox.stats()['failed'] == 2
+
+def test_claimed_jobs_are_leased(client, flaky_task):
+    outbox.enqueue('flaky', {'failures': 0}, idempotency_key='flaky:3')
+    db.session.commit()
+
+    # A worker claimed the job and died: nobody else runs it until the lease expires
+    claimed = outbox._claim(10, lease_seconds=60)
+    assert len(claimed) == 1
+    assert outbox.run_pending() == 0
+
+    make_due(claimed[0].id)
+    assert outbox.run_pending() == 1
+    # The stale worker can no longer finish the job
+    assert not outbox._finish(claimed[0], status='done')
+    db.session.rollback()
+    assert flaky_task == ['flaky:3']
+
+def test_idempotency_keys_are_unique(client):
+    outbox.enqueue('order_placed', {}, idempotency_key='order_placed:1')
+    db.session.commit()
+    outbox.enqueue('order_placed', {}, idempotency_key='order_placed:1')
+    with pytest.raises(Exception):
+        db.session.commit()
+    db.session.rollback()
+    assert OutboxJob.query.count() == 1
+
+def test_worker_thread_runs_jobs_after_checkout(client):
+    client.application.config['OUTBOX_WORKERS'] = 1
+    outbox.start(client.application)
+    assert checkout(client).status_code == 200
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        if OutboxJob.query.one().status == 'done':
+            break
+        time.sleep(0.02)
+    assert OutboxJob.query.one().status == 'done'
+
+def test_queue_depth_and_lag_in_metrics(client):
+    checkout(client)
+    lines = client.get('/metrics').get_data(as_text=True).splitlines()
+    assert 'outbox_jobs_pending 1' in lines
+    lag = next(line for line in lines if line.startswith('outbox_lag_seconds '))
+    assert float(lag.split()[-1]) >= 0
+
+def test_idle_polls_only_read(client):
+    with count_queries(db.engine) as statements:
+        assert outbox.run_pending() == 0
+    assert len(statements) == 1 and statements[0].lstrip().upper().startswith('SELECT')
+
+def test_create_app_starts_no_worker_threads(tmp_path):
+    # CLI commands and the pre-fork master build the app too; only serving entry points start the workers
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'cli.db'}", 'OUTBOX_WORKERS': 2},
+                     'app.config.TestingConfig')
+    assert app.extensions['outbox']._threads == []
+    with app.app_context():
+        db.engine.dispose()
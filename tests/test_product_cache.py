@@ -0,0 +1,77 @@
+import time
+
+from app.services.cache import LRUCache, RedisCache
+
+class LocalRedis:
+    # Minimal local stand-in for the redis-py client methods RedisCache uses
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+    def execute(self):
+        return []
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match.rstrip('*'))]
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1   # 'a' becomes the most recently used entry
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get_many(['a', 'c']) == {'a': 1, 'c': 3}
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['size'] == 2
+    assert (stats['hits'], stats['misses']) == (3, 1)
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(maxsize=10, ttl=60)
+    cache.set('short', 'value', ttl=0.01)
+    cache.set('long', 'value')
+    time.sleep(0.02)
+
+    assert cache.get('short') is None
+    assert cache.get('long') == 'value'
+    assert cache.stats()['expirations'] == 1
+
+def test_lru_cache_counters_survive_eviction():
+    cache = LRUCache(maxsize=1, ttl=60)
+    cache.incr('generation')
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.counter('generation') == 1
+
+def test_redis_cache_round_trips_json():
+    cache = RedisCache(LocalRedis(), prefix='products:')
+    cache.set_many({'product:1': {'id': 1, 'name': 'pen'}, 'ids:0:None:50': {'ids': [1], 'has_more': False}})
+
+    assert cache.get_many(['product:1', 'product:2']) == {'product:1': {'id': 1, 'name': 'pen'}}
+    assert cache.incr('generation') == 1
+    assert cache.counter('generation') == 1
+
+    cache.delete('product:1')
+    assert cache.get('product:1') is None
+    assert cache.stats()['hits'] == 1
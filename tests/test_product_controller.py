@@ -1,10 +1,12 @@
 import pytest
+import json
 from app import create_app, db
 from app.models import User, Product
+from tests.helpers import assert_max_queries, count_queries
 
 @pytest.fixture
-def client():
-    app = create_app()
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
     with app.test_client() as client:
         with app.app_context():
             db.create_all()
@@ -64,10 +66,64 @@ def test_list_products(client):
     simulate_user_session(client, user_id=1)
     response = client.get('/products/list')
     assert response.status_code == 200
-    response_json = response.get_json()                                    
-    assert response_json is not None, "Response JSON is None"              # Check if response is not None
-    assert isinstance(response_json, list), "Response JSON is not a list"  # Check if it is a list
-    assert len(response_json) > 0, "Product list is empty"                 # Ensure list is not empty
+    response_json = response.get_json()                                        
+    assert response_json is not None, "Response JSON is None"                  # Check if response is not None
+    assert isinstance(response_json['items'], list), "Items is not a list"     # Check the page envelope
+    assert len(response_json['items']) > 0, "Product list is empty"            # Ensure list is not empty
+    assert response_json['next_cursor'] is None, "Unexpected next page"        # A single product fits in one page
+
+def test_list_products_pagination(client):
+    simulate_user_session(client, user_id=1)
+    with client.application.app_context():
+        db.session.add_all([
+            Product(name=f'product {i}', price=1.0, stock=i, description='Paged product')
+            for i in range(5)
+        ])
+        db.session.commit()
+
+    # Walk the catalog two items at a time following the opaque cursor
+    seen, after = [], None
+    while True:
+        query = {'limit': 2} if after is None else {'limit': 2, 'after': after}
+        response = client.get('/products/list', query_string=query)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['items']) <= 2
+        seen.extend(item['id'] for item in page['items'])
+        after = page['next_cursor']
+        if after is None:
+            break
+
+    assert seen == sorted(seen), "Pages are not ordered by product ID"
+    assert len(seen) == 6, "Pagination skipped or repeated products"
+
+def test_list_products_invalid_cursor(client):
+    simulate_user_session(client, user_id=1)
+    response = client.get('/products/list', query_string={'after': 'not-a-cursor'})
+    assert response.status_code == 400
+    response = client.get('/products/details', query_string={'limit': 0})
+    assert response.status_code == 400
+
+def test_products_stream_every_row_in_chunks(client):
+    simulate_user_session(client, user_id=1)
+    for i in range(5):
+        db.session.add(Product(name=f'streamed {i}', price=1.0 + i, stock=i, description='Streamed'))
+    db.session.commit()
+    client.application.config['STREAM_CHUNK_SIZE'] = 2
+
+    response = client.get('/products/list?format=ndjson')
+    assert response.status_code == 200
+    assert response.is_streamed
+    chunks = [chunk for chunk in response.response if chunk]
+    assert len(chunks) == 3, "Rows were not fetched in chunks"
+    rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+    assert [row['name'] for row in rows] == ['Test Product'] + [f'streamed {i}' for i in range(5)]
+    assert rows[1] == {'id': 2, 'name': 'streamed 0', 'stock': 0}
+
+    response = client.get('/products/details?stream=1')
+    body = response.get_json()
+    assert len(body['items']) == 6
+    assert body['items'][0] == {'id': 1, 'name': 'Test Product', 'description': 'Test description', 'price': 10.99}
 
 def test_details_products(client):
     simulate_user_session(client, user_id=1)
@@ -75,3 +131,254 @@ def test_details_products(client):
     assert response.status_code == 200
     response_json = response.get_json()
     assert response_json is not None, "Response JSON is None"
+
+def test_details_products_warm_cache_skips_database(client):
+    simulate_user_session(client, user_id=1)
+    assert client.get('/products/details').status_code == 200
+
+    # Second read is served entirely from the product cache
+    with assert_max_queries(db.engine, 0):
+        response = client.get('/products/details')
+    assert response.status_code == 200
+    assert response.get_json()['items'][0]['name'] == 'Test Product'
+
+def test_product_writes_invalidate_cache(client):
+    simulate_user_session(client, user_id=1)
+    client.get('/products/details')
+
+    client.put('/products/edit', json={'product_id': 1, 'name': 'Renamed Product'})
+    items = client.get('/products/details').get_json()['items']
+    assert [item['name'] for item in items] == ['renamed product']
+
+    client.post('/products/add', json={'name': 'New Product', 'price': 1.5, 'stock': 3, 'description': 'Added'})
+    items = client.get('/products/details').get_json()['items']
+    assert [item['name'] for item in items] == ['renamed product', 'new product']
+
+    client.delete('/products/delete', json={'product_id': 1})
+    items = client.get('/products/details').get_json()['items']
+    assert [item['name'] for item in items] == ['new product']
+
+    stats = client.get('/products/cache/stats').get_json()
+    assert stats['hits'] > 0 and stats['misses'] > 0
+
+def test_details_products_conditional_requests(client):
+    simulate_user_session(client, user_id=1)
+    client.post('/products/add', json={'name': 'Tagged Product', 'price': 2.0, 'stock': 5, 'description': 'ETag'})
+
+    response = client.get('/products/details')
+    etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+
+    # Matching ETag: 304 without touching the database
+    with assert_max_queries(db.engine, 0):
+        response = client.get('/products/details', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    response = client.get('/products/details', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    # Any catalog write changes the ETag
+    client.put('/products/edit', json={'product_id': 1, 'price': 20.0})
+    response = client.get('/products/details', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_catalog_writes_reach_every_process_sharing_the_cache(client):
+    # A second app on the same database and cache backend stands for another worker (PRODUCT_CACHE_BACKEND=redis)
+    other = create_app({'SQLALCHEMY_DATABASE_URI': client.application.config['SQLALCHEMY_DATABASE_URI']},
+                       'app.config.TestingConfig')
+    other.extensions['product_cache'] = client.application.extensions['product_cache']
+    other = other.test_client()
+    simulate_user_session(client, user_id=1)
+    simulate_user_session(other, user_id=1)
+    etag = other.get('/products/details').headers['ETag']
+    assert other.get('/products/details').get_json()['items'][0]['price'] == 10.99
+
+    assert client.put('/products/edit', json={'product_id': 1, 'price': 99.0}).status_code == 200
+    response = other.get('/products/details', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['items'][0]['price'] == 99.0
+
+def test_list_products_etag_follows_stock(client):
+    simulate_user_session(client, user_id=1)
+    etag = client.get('/products/list').headers['ETag']
+    assert client.get('/products/list', headers={'If-None-Match': etag}).status_code == 304
+
+    with client.application.app_context():
+        db.session.get(Product, 1).stock = 42
+        db.session.commit()
+    client.application.extensions['product_cache'].clear()
+
+    response = client.get('/products/list', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['items'][0]['stock'] == 42
+
+def test_admin_role_is_cached_and_invalidated(client):
+    simulate_user_session(client, user_id=1)
+    assert client.get('/products/cache/stats').status_code == 200
+
+    # The role comes from the principal cache, no users query
+    with count_queries(db.engine) as statements:
+        assert client.get('/products/cache/stats').status_code == 200
+    assert not [statement for statement in statements if 'users' in statement]
+
+    # Revoking admin directly in the database is only seen once the cache entry is dropped
+    db.session.get(User, 1).is_admin = False
+    db.session.commit()
+    assert client.get('/products/cache/stats').status_code == 200
+
+    response = client.post('/account', json={'new_username': 'formeradmin'})
+    assert response.status_code == 200
+    assert client.get('/products/cache/stats').status_code == 403
+
+def test_admin_routes_reject_customers_and_anonymous(client):
+    db.session.add(User(username='customer', password='customer123', is_admin=False))
+    db.session.commit()
+
+    assert client.post('/products/add', json={'name': 'x'}).status_code == 401
+    simulate_user_session(client, user_id=2)
+    assert client.post('/products/add', json={'name': 'x'}).status_code == 403
+    simulate_user_session(client, user_id=99)
+    assert client.delete('/products/delete', json={'product_id': 1}).status_code == 404
+
+def test_import_products_csv_upserts_on_name(client):
+    simulate_user_session(client, user_id=1)
+    client.get('/products/details')  # warm the cache
+
+    body = (
+        "name,description,price,stock\n"
+        "Widget,First widget,2.50,10\n"
+        "Gadget,,3.00,5\n"
+        "broken,Bad price,abc,1\n"
+        "negative,Bad stock,1.00,-2\n"
+        "widget,Second widget,2.75,12\n"   # same name in another case, last row wins
+    )
+    response = client.post('/products/import', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['processed'] == 5
+    assert report['upserted'] == 2
+    assert report['failed'] == 2
+    assert [(error['line'], error['message']) for error in report['errors']] == [
+        (4, 'Price and stock must be numeric values'),
+        (5, 'Stock cannot be negative')
+    ]
+
+    widget = Product.query.filter_by(name='widget').one()
+    assert (widget.description, widget.price, widget.stock) == ('Second widget', 2.75, 12)
+    assert Product.query.filter_by(name='gadget').one().description == ''
+
+    # Re-importing updates in place, bumps the row version and keeps a description that is left empty
+    response = client.post('/products/import?format=ndjson',
+                           data='{"name": "widget", "price": 4, "stock": 1}\nnot json\n')
+    report = response.get_json()
+    assert report['upserted'] == 1
+    assert report['errors'] == [{'line': 2, 'name': None, 'message': 'Invalid JSON'}]
+    db.session.expire_all()
+    widget = Product.query.filter_by(name='widget').one()
+    assert (widget.description, widget.price, widget.stock, widget.version) == ('Second widget', 4.0, 1, 1)
+    assert Product.query.count() == 3
+
+    # The catalog cache saw the import
+    names = [item['name'] for item in client.get('/products/details').get_json()['items']]
+    assert names == ['Test Product', 'widget', 'gadget']
+
+def test_import_products_rejects_unknown_format(client):
+    simulate_user_session(client, user_id=1)
+    response = client.post('/products/import', data='name\nx\n', content_type='text/plain')
+    assert response.status_code == 400
+
+def test_export_products_streams_csv_and_ndjson(client):
+    simulate_user_session(client, user_id=1)
+    client.post('/products/import', data='name,price,stock\nalpha,1,1\nbeta,2,2\n', content_type='text/csv')
+
+    response = client.get('/products/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.is_streamed
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == 'id,name,description,price,stock'
+    assert lines[1:] == ['1,Test Product,Test description,10.99,100', '2,alpha,,1.0,1', '3,beta,,2.0,2']
+
+    response = client.get('/products/export?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['name'] for row in rows] == ['Test Product', 'alpha', 'beta']
+
+    # Exported CSV imports back without changes
+    response = client.post('/products/import', data='\n'.join(lines) + '\n', content_type='text/csv')
+    assert response.get_json()['failed'] == 0
+
+def test_products_cli_import_and_export(client, tmp_path):
+    source = tmp_path / 'products.ndjson'
+    source.write_text('{"name": "cli product", "price": 1.5, "stock": 3}\n{"name": "bad"}\n')
+    runner = client.application.test_cli_runner()
+
+    result = runner.invoke(args=['products', 'import', str(source)])
+    assert result.exit_code == 0
+    assert '1 product(s) upserted, 1 row(s) failed' in result.output
+
+    target = tmp_path / 'export.csv'
+    result = runner.invoke(args=['products', 'export', str(target)])
+    assert result.exit_code == 0
+    assert 'cli product,,1.5,3' in target.read_text()
+
+def add_search_products():
+    db.session.add_all([
+        Product(name='blue pen', price=1.5, stock=10, description='Ballpoint pen with blue ink'),
+        Product(name='red pencil', price=0.8, stock=0, description='Graphite pencil'),
+        Product(name='notebook', price=4.0, stock=5, description='A5 notebook, pairs well with a pen'),
+        Product(name='crème brûlée torch', price=25.0, stock=2, description='Kitchen torch')
+    ])
+    db.session.commit()
+
+def test_search_products_ranks_prefix_matches(client):
+    simulate_user_session(client, user_id=1)
+    add_search_products()
+
+    response = client.get('/products/search?q=pen')
+    assert response.status_code == 200
+    names = [item['name'] for item in response.get_json()['items']]
+    # Name matches rank above description-only matches, "pen" also matches "pencil" as a prefix
+    assert set(names[:2]) == {'blue pen', 'red pencil'}
+    assert names[2] == 'notebook'
+
+    assert [item['name'] for item in client.get('/products/search?q=creme').get_json()['items']] == ['crème brûlée torch']
+    assert client.get('/products/search?q=blue%20ink').get_json()['items'][0]['name'] == 'blue pen'
+    assert client.get('/products/search?q=%22OR%20*').status_code == 200  # FTS syntax is treated as text
+    assert client.get('/products/search').status_code == 400
+
+def test_search_products_filters_and_pages(client):
+    simulate_user_session(client, user_id=1)
+    add_search_products()
+
+    response = client.get('/products/search', query_string={'q': 'pen', 'min_stock': 1, 'max_price': 3})
+    assert [item['name'] for item in response.get_json()['items']] == ['blue pen']
+
+    seen = []
+    page = client.get('/products/search', query_string={'q': 'pen', 'limit': 1}).get_json()
+    seen.extend(item['name'] for item in page['items'])
+    while page['next_cursor']:
+        page = client.get('/products/search', query_string={'q': 'pen', 'limit': 1, 'after': page['next_cursor']}).get_json()
+        seen.extend(item['name'] for item in page['items'])
+    assert len(seen) == 3 and len(set(seen)) == 3, "Pagination skipped or repeated results"
+
+def test_search_index_follows_product_writes(client):
+    simulate_user_session(client, user_id=1)
+    client.post('/products/add', json={'name': 'Stapler', 'price': 7.5, 'stock': 3, 'description': 'Desk stapler'})
+    assert len(client.get('/products/search?q=stapler').get_json()['items']) == 1
+
+    client.put('/products/edit', json={'product_id': 2, 'name': 'Hole punch'})
+    assert client.get('/products/search?q=stapler').get_json()['items'][0]['name'] == 'hole punch'
+    assert len(client.get('/products/search?q=hole').get_json()['items']) == 1
+
+    client.delete('/products/delete', json={'product_id': 2})
+    assert client.get('/products/search?q=hole').get_json()['items'] == []
+
+def test_search_products_like_fallback(client):
+    simulate_user_session(client, user_id=1)
+    add_search_products()
+    client.application.extensions['products_fts'] = False  # as on databases without FTS5
+
+    response = client.get('/products/search', query_string={'q': 'PEN', 'min_stock': 1})
+    assert [item['name'] for item in response.get_json()['items']] == ['blue pen', 'notebook']
@@ -0,0 +1,97 @@
+import pytest
+from app import create_app, db
+from app.models import User, Product
+from app.services.rate_limit_service import MemoryBuckets, parse_limits
+
+@pytest.fixture
+def make_client(tmp_path):
+    apps = []
+
+    def make(**config):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+                          'RATE_LIMIT_ENABLED': True, **config}, 'app.config.TestingConfig')
+        with app.app_context():
+            db.create_all()
+            if not User.query.count():
+                db.session.add_all([
+                    User(username='first', password='x'),
+                    User(username='second', password='x'),
+                    Product(name='pen', price=1.5, stock=100, description='Blue pen')
+                ])
+                db.session.commit()
+        apps.append(app)
+        return app
+
+    yield make
+    with apps[0].app_context():
+        db.drop_all()
+
+def logged_in(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client
+
+def test_logged_out_clients_are_limited_by_address(make_client):
+    app = make_client(RATE_LIMITS='user_bp.login=3/minute')
+    client = app.test_client()
+    for _ in range(3):
+        assert client.post('/user/login', json={'username': 'first', 'password': 'wrong'}).status_code == 401
+
+    response = client.post('/user/login', json={'username': 'first', 'password': 'wrong'})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 20  # one token every 20 seconds
+
+    other = client.post('/user/login', json={'username': 'first', 'password': 'wrong'},
+                        environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 401
+
+def test_logged_in_clients_are_limited_per_user(make_client):
+    app = make_client(RATE_LIMITS='cart=2/minute,cart.view_cart=4/minute')
+    first, second = logged_in(app, 1), logged_in(app, 2)
+
+    # The endpoint limit wins over the blueprint one (the carts are empty, a 404 is a request that ran)
+    assert [first.get('/cart/view').status_code for _ in range(5)] == [404] * 4 + [429]
+    assert second.get('/cart/view').status_code == 404
+
+    statuses = [first.post('/cart/add', json={'product_id': 1, 'quantity': 1}).status_code for _ in range(3)]
+    assert statuses == [201, 201, 429]
+
+    # Unlimited blueprints are untouched
+    assert all(first.get('/orders').status_code == 200 for _ in range(10))
+
+def test_global_limits_cover_every_client(make_client):
+    app = make_client(RATE_LIMITS='', RATE_LIMITS_GLOBAL='product_bp.details_products_route=2/minute')
+    first, second = logged_in(app, 1), logged_in(app, 2)
+    assert first.get('/products/details').status_code == 200
+    assert second.get('/products/details').status_code == 200
+    assert first.get('/products/details').status_code == 429
+    assert second.get('/products/details').status_code == 429
+
+    text = first.get('/metrics').get_data(as_text=True)
+    assert 'rate_limit_rejected_total{limit="product_bp.details_products_route"} 2' in text
+
+def test_disabled_limits(make_client):
+    app = make_client(RATE_LIMIT_ENABLED=False, RATE_LIMITS='cart=1/minute')
+    client = logged_in(app, 1)
+    assert [client.get('/cart/view').status_code for _ in range(3)] == [404] * 3
+
+def test_buckets_refill_at_the_configured_rate():
+    buckets = MemoryBuckets(shards=4, maxsize=100)
+    assert buckets.take('burst', 2, 1000.0) == 0
+    assert buckets.take('burst', 2, 1000.0) == 0
+    wait = buckets.take('burst', 2, 1000.0)
+    assert 0 < wait <= 0.001
+
+    limit = parse_limits(' user_bp.login=10/minute,cart = 5/second ')
+    assert limit['user_bp.login'].capacity == 10 and limit['user_bp.login'].rate == pytest.approx(10 / 60)
+    assert limit['cart'].rate == 5
+    for invalid in ('cart=10', 'cart=ten/minute', 'cart=10/week', 'cart=0/minute'):
+        with pytest.raises(ValueError):
+            parse_limits(invalid)
+
+def test_default_limits_name_real_blueprints_and_endpoints(make_client):
+    app = make_client()
+    targets = parse_limits(app.config['RATE_LIMITS'])
+    names = set(app.blueprints) | set(app.view_functions)
+    assert targets and set(targets) <= names
@@ -0,0 +1,78 @@
+import sys
+
+import pytest
+from app import create_app, db
+from app.server import server_options, parse_args, main
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'OUTBOX_WORKERS': 1,
+        'SERVER_WORKERS': 3,
+        'SERVER_MAX_REQUESTS': 1000
+    }, 'app.config.TestingConfig')
+    yield app
+    app.extensions['outbox'].stop(5)
+    with app.app_context():
+        db.engine.dispose()
+
+def outbox_threads(app):
+    return [thread for thread in app.extensions['outbox']._threads if thread.is_alive()]
+
+def test_options_come_from_the_config_and_the_command_line(app):
+    options = server_options(app, parse_args([]))
+    assert options['workers'] == 3
+    assert options['max_requests'] == 1000
+    assert options['max_requests_jitter'] == 100
+    assert options['preload_app'] is True
+    assert options['worker_class'] == 'gthread'
+
+    options = server_options(app, parse_args(['--workers', '8', '--threads', '2', '--bind', '127.0.0.1:9000']))
+    assert (options['workers'], options['threads'], options['bind']) == (8, 2, '127.0.0.1:9000')
+
+def test_fork_hooks_move_the_outbox_and_the_pool_to_the_worker(app):
+    options = server_options(app)
+    assert outbox_threads(app) == []  # the preloaded master never runs the outbox
+
+    # The master forks with no outbox thread and no pooled connection
+    with app.app_context():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.remove()
+        options['pre_fork'](None, None)
+        assert outbox_threads(app) == []
+        assert db.engine.pool.checkedin() == 0
+
+    # The worker starts its own
+    options['post_fork'](None, None)
+    assert len(outbox_threads(app)) == 1
+
+    options['worker_exit'](None, None)
+    assert outbox_threads(app) == []
+
+def test_per_process_backends_are_refused_or_flagged_with_several_workers(app, caplog):
+    app.config.update(SESSION_BACKEND='memory', RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND='memory')
+    with pytest.raises(SystemExit, match="SESSION_BACKEND=memory"):
+        server_options(app)
+    assert server_options(app, parse_args(['--workers', '1']))['workers'] == 1
+
+    app.config['SESSION_BACKEND'] = 'sql'
+    with caplog.at_level('WARNING', logger='app.server'):
+        server_options(app)
+    assert 'PRODUCT_CACHE_BACKEND=memory' in caplog.text
+    assert 'PRINCIPAL_CACHE_BACKEND=memory' in caplog.text
+    assert 'up to 3 times the configured rate' in caplog.text
+    assert '/metrics reports only the worker' in caplog.text
+
+    caplog.clear()
+    app.config.update(PRODUCT_CACHE_BACKEND='redis', PRINCIPAL_CACHE_TTL=0, RATE_LIMIT_BACKEND='redis',
+                      METRICS_ENABLED=False)
+    with caplog.at_level('WARNING', logger='app.server'):
+        server_options(app)
+    assert caplog.text == ''
+
+def test_main_needs_gunicorn(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'gunicorn', None)
+    monkeypatch.setitem(sys.modules, 'gunicorn.app.base', None)
+    with pytest.raises(SystemExit, match="gunicorn package is required"):
+        main([])
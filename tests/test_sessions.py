@@ -0,0 +1,124 @@
+import pytest
+from app import create_app, db
+from app.models import UserSession
+from app.services.session_service import MemorySessionStore
+
+@pytest.fixture(params=['memory', 'sql'])
+def app(request, tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+                      'SESSION_BACKEND': request.param}, 'app.config.TestingConfig')
+    with app.app_context():
+        db.create_all()
+    app.test_client().post('/user/register', json={'username': 'customer', 'password': 'customer123'})
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+def login(app, password='customer123'):
+    client = app.test_client()
+    response = client.post('/user/login', json={'username': 'customer', 'password': password})
+    assert response.status_code == 200
+    return client
+
+def session_id(client):
+    return client.get_cookie('session').value
+
+def test_cookie_carries_only_the_session_id(app):
+    client = login(app)
+    sid = session_id(client)
+    assert len(sid) == 32
+    assert '.' not in sid  # not a signed payload
+
+    # Reads neither rewrite the session nor send the cookie again
+    response = client.get('/account')
+    assert response.status_code == 200
+    assert response.get_json()['username'] == 'customer'
+    assert 'Set-Cookie' not in response.headers
+
+    if app.config['SESSION_BACKEND'] == 'sql':
+        with app.app_context():
+            assert db.session.query(UserSession.id).scalar() != sid  # only a hash is stored
+
+def test_login_issues_a_new_session_id(app):
+    client = login(app)
+    first = session_id(client)
+    client.post('/user/login', json={'username': 'customer', 'password': 'customer123'})
+    assert session_id(client) == first  # same user, same session
+
+    stolen = app.test_client()
+    stolen.set_cookie('session', first)
+    client.get('/user/logout')
+    client = login(app)
+    assert session_id(client) != first
+    assert stolen.get('/account').status_code == 401
+
+def test_logout_ends_the_session_on_the_server(app):
+    client = login(app)
+    copy = app.test_client()
+    copy.set_cookie('session', session_id(client))
+    assert copy.get('/account').status_code == 200
+
+    assert client.get('/user/logout').status_code == 200
+    assert client.get_cookie('session') is None
+    response = copy.get('/account')
+    assert response.status_code == 401
+    assert 'session=;' in response.headers['Set-Cookie']  # the unknown ID is cleared
+
+def test_password_change_logs_out_the_other_devices(app):
+    laptop, phone = login(app), login(app)
+    response = laptop.post('/account', json={'new_password': 'newpassword123'})
+    assert response.status_code == 200
+
+    assert phone.get('/account').status_code == 401
+    assert laptop.get('/account').status_code == 200
+    login(app, 'newpassword123')
+
+def test_revoke_other_sessions(app):
+    laptop, phone, tablet = login(app), login(app), login(app)
+    response = laptop.post('/account/sessions/revoke')
+    assert response.status_code == 200
+    assert response.get_json()['revoked'] == 2
+    assert phone.get('/account').status_code == 401
+    assert tablet.get('/account').status_code == 401
+    assert laptop.get('/account').status_code == 200
+
+def test_requests_in_flight_do_not_revive_revoked_sessions(app):
+    client = login(app)
+    sid = session_id(client)
+    interface = app.session_interface
+    with app.test_request_context('/', headers={'Cookie': f"session={sid}"}) as context:
+        opened = interface.open_session(app, context.request)
+        assert opened['user_id'] == 1
+
+        # Revoked from another device while this request still runs, then the request changes its session
+        assert app.extensions['sessions'].revoke_user(1) == 1
+        opened['cart_hint'] = 'x'
+        response = app.response_class()
+        interface.save_session(app, opened, response)
+
+        assert interface.store.load(sid) is None
+        assert 'session=;' in response.headers['Set-Cookie']
+    assert client.get('/account').status_code == 401
+
+def test_cookie_sessions_cannot_be_revoked(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    assert client.post('/account/sessions/revoke').status_code == 501
+
+def test_memory_store_expiry_and_eviction():
+    store = MemorySessionStore(maxsize=2, ttl=60)
+    store.save('a', {'user_id': 1}, 1, new=True)
+    store.save('b', {'user_id': 1}, 1, new=True)
+    store.save('c', {'user_id': 2}, 2, new=True)
+    assert store.load('a') is None  # least recently used, evicted
+    data, seconds_left = store.load('b')
+    assert data == {'user_id': 1} and 59 < seconds_left <= 60
+    assert store.revoke_user(1) == 1
+    assert store.stats()['users'] == 1
+
+    assert not store.save('a', {'user_id': 1}, 1, new=False)  # evicted sessions aren't recreated
+    store.ttl = 0
+    store.save('d', {'user_id': 3}, 3, new=True)
+    assert store.load('d') is None
@@ -1,12 +1,12 @@
 import pytest
 from app import create_app, db
 from app.models import User
+from app.services.password_service import passwords, PasswordPoolBusy
+from werkzeug.security import generate_password_hash, check_password_hash
 
 @pytest.fixture
-def client():
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"}, 'app.config.TestingConfig')
     with app.test_client() as client:
         with app.app_context():
             db.create_all()
@@ -45,3 +45,61 @@ def test_login_failure(client):
     })
     assert response.status_code == 401
     assert response.json['message'] == 'Invalid username or password'
+
+def test_login_rehashes_outdated_password(client):
+    client.post('/user/register', json={'username': 'testuser', 'password': 'testpassword'})
+
+    # Simulate a hash created under older parameters
+    with client.application.app_context():
+        user = User.query.filter_by(username='testuser').first()
+        user.password = generate_password_hash('testpassword', 'pbkdf2:sha256:500')
+        db.session.commit()
+
+    response = client.post('/user/login', json={'username': 'testuser', 'password': 'testpassword'})
+    assert response.status_code == 200
+
+    with client.application.app_context():
+        stored = User.query.filter_by(username='testuser').first().password
+        assert stored.startswith('pbkdf2:sha256:1000$')
+        assert check_password_hash(stored, 'testpassword')
+
+    # The upgraded hash still logs in
+    response = client.post('/user/login', json={'username': 'testuser', 'password': 'testpassword'})
+    assert response.status_code == 200
+
+def test_login_skips_the_rehash_when_hash_pool_is_busy(client, monkeypatch):
+    client.post('/user/register', json={'username': 'testuser', 'password': 'testpassword'})
+    old_hash = generate_password_hash('testpassword', 'pbkdf2:sha256:500')
+    with client.application.app_context():
+        User.query.filter_by(username='testuser').first().password = old_hash
+        db.session.commit()
+
+    # Verifying gets through, the upgrade finds the pool full
+    def busy(password):
+        raise PasswordPoolBusy()
+    monkeypatch.setattr(passwords, 'hash', busy)
+    response = client.post('/user/login', json={'username': 'testuser', 'password': 'testpassword'})
+    assert response.status_code == 200
+
+    with client.application.app_context():
+        assert User.query.filter_by(username='testuser').first().password == old_hash
+
+def test_login_returns_503_when_hash_pool_is_full(client):
+    client.post('/user/register', json={'username': 'testuser', 'password': 'testpassword'})
+
+    pool = client.application.extensions['password_hasher']
+    pool.timeout = 0.01
+    # Take every slot so the next login can't queue
+    for _ in range(pool.max_pending):
+        pool._slots.acquire()
+    try:
+        response = client.post('/user/login', json={'username': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert pool.stats()['rejected'] == 1
+    finally:
+        for _ in range(pool.max_pending):
+            pool._slots.release()
+
+    response = client.post('/user/login', json={'username': 'testuser', 'password': 'testpassword'})
+    assert response.status_code == 200